@@ -0,0 +1,81 @@
+"""
+호출마다 genai.Client를 새로 만드는 방식과 공유 클라이언트(common.genai_client)를
+로컬 스텁 서버에 대해 비교하는 마이크로 벤치마크.
+
+실행 (llm_final_api 디렉토리에서):
+    python -m bench.bench_client_pool --calls 200
+
+로컬 HTTP라 TLS 핸드셰이크 비용은 포함되지 않으므로,
+실제 Google 엔드포인트에서는 절감 폭이 이보다 더 크다.
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+from google import genai
+from google.genai import types
+
+from bench.fake_gemini import start_fake_server
+from common.genai_client import close_clients, get_client
+
+BENCH_API_KEY = "bench-key"
+BENCH_MODEL = "gemini-2.5-flash"
+
+
+def _call(client: genai.Client) -> None:
+    client.models.generate_content(model=BENCH_MODEL, contents=["ping"])
+
+
+def _measure(calls: int, make_client: Callable[[], genai.Client]) -> List[float]:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        _call(make_client())
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def _summary(name: str, latencies: List[float]) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return (
+        f"{name:<14} mean {statistics.mean(latencies):7.2f} ms | "
+        f"p50 {statistics.median(latencies):7.2f} ms | p95 {p95:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GenAI 클라이언트 재사용 마이크로 벤치마크")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server()
+    try:
+        def fresh_client() -> genai.Client:
+            return genai.Client(api_key=BENCH_API_KEY, http_options=types.HttpOptions(base_url=base_url))
+
+        def shared_client() -> genai.Client:
+            return get_client(BENCH_API_KEY, base_url=base_url)
+
+        # 워밍업 (import, JIT성 초기화 비용 제거)
+        _measure(args.warmup, fresh_client)
+        _measure(args.warmup, shared_client)
+
+        fresh = _measure(args.calls, fresh_client)
+        shared = _measure(args.calls, shared_client)
+
+        print(f"스텁 서버: {base_url}, 호출 수: {args.calls}")
+        print(_summary("fresh client", fresh))
+        print(_summary("shared client", shared))
+        saved = statistics.mean(fresh) - statistics.mean(shared)
+        print(f"호출당 절감: {saved:.2f} ms ({saved / statistics.mean(fresh) * 100:.1f}%)")
+    finally:
+        close_clients()
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+로컬 사전 필터(report.utils.image_prefilter)의 후보 1장당 처리 시간과 판정 결과를 측정한다.
+
+합성 후보: 선명한 사진 / 같은 사진의 흔들린 버전 / 과노출 / 거의 같은 프레임(밝기만 약간 다름) / 다른 각도
+실행 (llm_final_api 디렉토리에서):
+    python -m bench.bench_prefilter                    # 합성 4000x3000 후보로 측정
+    python -m bench.bench_prefilter a.jpg b.jpg ...    # 실제 파일로 측정
+    python -m bench.bench_prefilter --size 1600x1200 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+import config
+from report.utils.image_prefilter import analyze_image, load_gray, prefilter_candidates
+
+
+def make_synthetic_candidates(directory: str, size) -> list:
+    """판정 결과를 미리 알 수 있는 합성 후보들을 만든다."""
+    # 큰 도형(가구) + 가로 그라데이션(조명) + 잔 노이즈(질감)로 방 사진 비슷한 구조를 만든다.
+    noise = Image.effect_noise((size[0] // 8, size[1] // 8), 80).convert("RGB").resize(size, Image.NEAREST)
+    room = Image.linear_gradient("L").rotate(90).resize(size).convert("RGB")
+    draw = ImageDraw.Draw(room)
+    w, h = size
+    for x0, y0, x1, y1, color in [
+        (0.05, 0.55, 0.35, 0.95, (90, 60, 40)),
+        (0.45, 0.20, 0.60, 0.70, (200, 200, 190)),
+        (0.70, 0.60, 0.95, 0.90, (40, 40, 60)),
+    ]:
+        draw.rectangle((int(x0 * w), int(y0 * h), int(x1 * w), int(y1 * h)), fill=color)
+    sharp = Image.blend(room, noise, 0.25)
+    other = sharp.transpose(Image.FLIP_LEFT_RIGHT).rotate(7)
+
+    candidates = {
+        "sharp.jpg": sharp,
+        "blurred.jpg": sharp.filter(ImageFilter.GaussianBlur(radius=max(size) / 150)),
+        "overexposed.jpg": ImageEnhance.Brightness(sharp).enhance(3.0),
+        "near_duplicate.jpg": ImageEnhance.Brightness(sharp).enhance(1.05),
+        "other_angle.jpg": other,
+    }
+    paths = []
+    for name, img in candidates.items():
+        path = os.path.join(directory, name)
+        img.save(path, quality=92)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 사전 필터 벤치마크")
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--size", default="4000x3000", help="합성 후보 크기 (가로x세로)")
+    parser.add_argument("--repeat", type=int, default=10, help="이미지당 반복 측정 횟수")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = args.paths or make_synthetic_candidates(tmp_dir, size)
+
+        print(f"분석 크기: 긴 변 {config.PREFILTER_SIZE}px | 반복 {args.repeat}회")
+        print(f"{'후보':<24} {'디코드+축소':>12} {'지표 계산':>10} {'선명도':>10} {'클리핑':>8} {'평균 밝기':>9}")
+        per_image = []
+        for path in paths:
+            decode, total = [], []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                load_gray(path, config.PREFILTER_SIZE)
+                decode.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                result = analyze_image(path)
+                total.append(time.perf_counter() - start)
+
+            decode_ms = statistics.median(decode) * 1000
+            total_ms = statistics.median(total) * 1000
+            per_image.append(total_ms)
+            print(
+                f"{os.path.basename(path):<24} {decode_ms:10.1f}ms {total_ms - decode_ms:8.1f}ms "
+                f"{result['sharpness']:10.1f} {result['exposure']['clipped']:8.3f} {result['exposure']['mean']:9.1f}"
+            )
+
+        start = time.perf_counter()
+        outcome = prefilter_candidates(paths)
+        elapsed = time.perf_counter() - start
+
+        print(f"\n후보 1장당 중앙값 {statistics.median(per_image):.1f}ms | 전체 필터 {elapsed * 1000:.1f}ms ({len(paths)}장)")
+        print("통과: " + ", ".join(os.path.basename(p) for p in outcome["kept"]))
+        for item in outcome["dropped"]:
+            print(f"제외: {os.path.basename(item['path'])} ({item['reason']})")
+
+
+if __name__ == "__main__":
+    main()
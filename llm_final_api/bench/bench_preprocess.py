@@ -0,0 +1,62 @@
+"""
+업로드 전처리(common.image_preprocess)의 업로드 바이트 절감량과 처리 시간을 측정한다.
+
+실행 (llm_final_api 디렉토리에서):
+    python -m bench.bench_preprocess                 # 합성 4000x3000 사진으로 측정
+    python -m bench.bench_preprocess a.jpg b.png     # 실제 파일로 측정
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+import config
+from common.image_preprocess import prepare_image
+
+
+def _make_synthetic_photo(path: str, size=(4000, 3000)) -> None:
+    # 노이즈 + 그라데이션으로 압축이 잘 안 되는 휴대폰 사진 크기의 이미지 생성
+    noise = Image.effect_noise(size, 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize(size).convert("RGB")
+    Image.blend(noise, gradient, 0.5).save(path, quality=95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="업로드 전처리 벤치마크")
+    parser.add_argument("paths", nargs="*")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = args.paths
+        if not paths:
+            synthetic = os.path.join(tmp_dir, "synthetic_photo.jpg")
+            _make_synthetic_photo(synthetic)
+            paths = [synthetic]
+
+        stages = [
+            ("select", config.UPLOAD_MAX_EDGE_SELECT),
+            ("report", config.UPLOAD_MAX_EDGE_REPORT),
+            ("edit", config.UPLOAD_MAX_EDGE_EDIT),
+        ]
+        for path in paths:
+            raw_size = os.path.getsize(path)
+            print(f"{path}: 원본 {raw_size / 1024:.0f} KB")
+            for stage, max_edge in stages:
+                start = time.perf_counter()
+                data, mime_type = prepare_image(path, max_edge=max_edge, output_format=config.UPLOAD_FORMAT, quality=config.UPLOAD_QUALITY)
+                first = time.perf_counter() - start
+
+                start = time.perf_counter()
+                prepare_image(path, max_edge=max_edge, output_format=config.UPLOAD_FORMAT, quality=config.UPLOAD_QUALITY)
+                memo = time.perf_counter() - start
+
+                print(
+                    f"  {stage:<7} max_edge={str(max_edge):<5} -> {len(data) / 1024:7.0f} KB ({mime_type}, "
+                    f"{len(data) / raw_size * 100:5.1f}%) | 처리 {first * 1000:7.1f} ms | 메모 재사용 {memo * 1000:.3f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+리포트 단계(main_report.generate_report)의 종단 지연 시간을 측정하는 타이밍 벤치마크.
+
+선택/리포트 모델 호출을 고정 지연을 갖는 스텁으로 바꿔서,
+모델 대기 시간 외에 파이프라인이 추가로 쓰는 시간(과거의 time.sleep(10) 같은 죽은 시간)을 확인한다.
+
+오버헤드가 --max-overhead(기본 1초)를 넘는 실행이 있으면 0이 아닌 코드로 종료하므로, 회귀 검사로 바로 쓸 수 있다.
+
+실행 (llm_final_api 디렉토리에서):
+    python -m bench.bench_report_latency --model-latency 0.5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import main_report
+from bench.fake_gemini import CANNED_REPORT
+from common.workspace import Workspace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="리포트 단계 종단 지연 측정")
+    parser.add_argument("--model-latency", type=float, default=0.5, help="스텁 리포트 모델 지연(초)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-overhead", type=float, default=1.0, help="허용하는 파이프라인 오버헤드(초), 넘으면 실패")
+    args = parser.parse_args()
+
+    def stub_select_best_image(api_key, model_name, input_paths, selected_output_path, workspace=None, **kwargs):
+        return workspace.write_bytes(selected_output_path, b"stub-image")
+
+    def stub_run_report_model(api_key, model_name, image_path, prompt, **kwargs):
+        time.sleep(args.model_latency)
+        return CANNED_REPORT
+
+    main_report.select_best_image = stub_select_best_image
+    main_report.run_report_model = stub_run_report_model
+
+    worst_overhead = 0.0
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            for run in range(1, args.runs + 1):
+                start = time.perf_counter()
+                main_report.generate_report("stub-key", ["stub.jpg"], workspace=Workspace(tmp_dir))
+                elapsed = time.perf_counter() - start
+                if not os.path.exists(main_report.PARSED_REPORT_PATH):
+                    raise RuntimeError("parsed_report.json 이 생성되지 않았습니다.")
+                overhead = elapsed - args.model_latency
+                print(f"run {run}: 종단 {elapsed:.3f}s | 모델 {args.model_latency:.3f}s | 파이프라인 오버헤드 {overhead * 1000:.1f} ms")
+                worst_overhead = max(worst_overhead, overhead)
+        finally:
+            os.chdir(original_cwd)
+
+    if worst_overhead > args.max_overhead:
+        raise SystemExit(f"실패: 파이프라인 오버헤드 {worst_overhead:.3f}s 가 허용치 {args.max_overhead:.3f}s 를 넘었습니다.")
+    print(f"통과: 최대 오버헤드 {worst_overhead * 1000:.1f} ms (허용치 {args.max_overhead:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
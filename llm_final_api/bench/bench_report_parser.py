@@ -0,0 +1,330 @@
+"""
+리포트 파서 벤치마크: 합성 리포트 코퍼스에 대해
+단일 패스 섹션 토크나이저(report_parser.parse_report_output)와
+기존 다중 정규식 파서(아래 legacy_parse_report_output, 이전 구현 그대로)를 비교한다.
+
+- 두 파서의 결과(dict)가 같은지 확인하고
+- 스트리밍용 IncrementalReportParser 에 리포트를 임의 크기 조각으로 나눠 넣은 결과가
+  전체 텍스트에 대한 parse_report_output 결과와 같은지 확인하고 (--incremental 개)
+- 코퍼스 전체를 파싱하는 데 걸린 시간을 출력한다.
+
+실행 (llm_final_api 디렉토리에서):
+    python -m bench.bench_report_parser --reports 2000 --incremental 300
+"""
+import argparse
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Union
+
+from report.utils.report_parser import IncrementalReportParser, parse_report_output, split_report_sections
+
+MOODS = ["따뜻", "아늑", "차분", "모던", "내추럴", "깔끔", "화사", "고급스러운", "빈티지", "미니멀"]
+STYLES = ["북유럽", "재팬디", "미드센추리 모던", "인더스트리얼", "프렌치 컨트리", "코스탈", "보헤미안"]
+FURNITURE = ["러그", "소파", "플로어 스탠드", "원목 선반", "패브릭 의자", "거울", "화분", "수납장", "커튼", "협탁"]
+PHRASES = [
+    "공간에 온기를 더해 준다",
+    "동선을 방해하지 않는다",
+    "색감의 통일감을 높인다",
+    "자연광을 잘 활용한다",
+    "시선을 분산시켜 산만해 보인다",
+    "재질의 대비가 공간에 깊이를 준다",
+]
+
+
+def _sentence(rng: random.Random, n: int = 3) -> str:
+    return " ".join(rng.choice(PHRASES) for _ in range(n)) + "."
+
+
+def make_synthetic_report(rng: random.Random) -> str:
+    """report_prompt 템플릿 형식을 따르는 합성 리포트 한 개를 만든다."""
+    moods = rng.sample(MOODS, 3)
+    pcts = sorted(rng.sample(range(5, 70), 2))
+    probabilities = [pcts[0], pcts[1] - pcts[0], 100 - pcts[1]]
+
+    lines = [f"# 전체적인 분위기는 **{moods[0]}하고 {moods[1]}한 {moods[2]} 스타일**입니다.", ""]
+    lines.append("## 1. 분위기 정의 및 유형별 확률")
+    for mood, pct in zip(moods, probabilities):
+        lines.append(f"- {mood}({pct}%): {_sentence(rng, 2)}")
+    lines += ["", "## 2. 분위기 판단 근거"]
+    lines.append(f"- 가구 배치 및 공간 분석 : {_sentence(rng)}")
+    lines.append(f"- 색감 및 질감: {_sentence(rng)}")
+    lines.append(f"- 소재: {_sentence(rng)}")
+    lines += ["", "## 3-1. 현재 분위기에 맞춰 추가하면 좋을 가구 추천"]
+    for item in rng.sample(FURNITURE, rng.randint(1, 3)):
+        lines.append(f"- {item} : {_sentence(rng, 2)}")
+    lines += ["", "## 3-2. 제거하면 좋을 가구 추천 "]
+    for item in rng.sample(FURNITURE, rng.randint(1, 2)):
+        lines.append(f"- {item} : {_sentence(rng, 2)}")
+    lines += ["", "## 3-3. 분위기별 바꿨으면 하는 가구 추천 "]
+    for _ in range(rng.randint(1, 3)):
+        src, dst = rng.sample(FURNITURE, 2)
+        lines.append(f"- {src} -> {dst} : {_sentence(rng, 2)}")
+    lines += ["", "## 4. 이런 스타일 어떠세요? "]
+    for s in rng.sample(STYLES, rng.randint(1, 3)):
+        lines.append(f"- {s} : {_sentence(rng, 2)}")
+    lines += ["", "## 정리"]
+    for _ in range(3):
+        lines.append(f"- {_sentence(rng, 2)}")
+    return "\n".join(lines) + "\n"
+
+
+def feed_in_chunks(text: str, rng: random.Random, max_chunk: int = 64):
+    """스트림처럼 1~max_chunk 글자 조각으로 나눠 IncrementalReportParser 에 넣는다. (파서, 이벤트 목록)"""
+    incremental = IncrementalReportParser()
+    events = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, max_chunk)
+        events.extend(incremental.feed(text[pos:pos + size]))
+        pos += size
+    events.extend(incremental.close())
+    return incremental, events
+
+
+def check_incremental(corpus: List[str], rng: random.Random) -> int:
+    """조각으로 나눠 넣은 결과/이벤트가 전체 파싱과 다른 리포트 수."""
+    mismatches = 0
+    for text in corpus:
+        incremental, events = feed_in_chunks(text, rng)
+        expected_sections = [section_id for section_id, _, _ in split_report_sections(text)]
+        if (
+            incremental.text != text
+            or json.dumps(incremental.result(), ensure_ascii=False) != json.dumps(parse_report_output(text), ensure_ascii=False)
+            or [event["section"] for event in events] != expected_sections
+        ):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="리포트 파서 벤치마크")
+    parser.add_argument("--reports", type=int, default=2000)
+    parser.add_argument("--incremental", type=int, default=300, help="증분 파서 비교에 쓸 리포트 수 (0이면 생략)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [make_synthetic_report(rng) for _ in range(args.reports)]
+
+    mismatches = 0
+    for text in corpus:
+        new = parse_report_output(text)
+        old = legacy_parse_report_output(text)
+        if json.dumps(new, ensure_ascii=False) != json.dumps(old, ensure_ascii=False):
+            mismatches += 1
+    print(f"코퍼스 {len(corpus)}개, 결과 불일치 {mismatches}개")
+
+    if args.incremental > 0:
+        sample = corpus[:args.incremental]
+        print(f"증분 파서 {len(sample)}개, 결과/이벤트 불일치 {check_incremental(sample, rng)}개")
+
+    for name, fn in (("legacy", legacy_parse_report_output), ("tokenizer", parse_report_output)):
+        start = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10} {elapsed * 1000:8.1f} ms 전체 | 리포트당 {elapsed / len(corpus) * 1e6:7.1f} us")
+
+
+# ------ 이전 구현 (비교 기준) ------
+def legacy_parse_report_output(result_text: str) -> Dict[str, Union[str, Dict, List]]:
+    llm_output = result_text
+    parsed_data: Dict[str, Any] = {}
+
+    # ------ 전체적인 분위기 한 줄 ------
+    match_style = re.search(
+        r"#\s*전체적인 분위기는\s*\*\*(.*?)\s*스타일\*\*",
+        llm_output,
+        re.DOTALL, 
+    )
+
+    # 일치하는 경우에만 처리
+    if match_style: 
+        general = match_style.group(1).strip()
+        parsed_data["general_style"] = general
+
+        # {분위기1}, {분위기2} ,{분위기3} 추출 
+        moods = re.findall(r"([가-힣\s]+?)(?:하고|한|\s*$)", general)
+        parsed_data["mood_words"] = [m.strip() for m in moods if m.strip()] # 추출된 단어 리스트는 'mood_words' 저장
+
+    # ------ ## 1. 분위기 정의 및 유형별 확률 ------
+    mood_section_match = re.search(
+        r"##\s*1\. 분위기 정의 및 유형별 확률(.*?)(?=##\s*2\. 분위기 판단 근거)",
+        llm_output,
+        re.DOTALL,
+    )
+
+    if mood_section_match:
+        mood_section = mood_section_match.group(1)
+
+        # {분위기}({확률}%): {설명} 패턴을 정의
+        PATTERN_MOOD_DETAIL = r"-\s*(.*?)\s*\((\d+)%\):\s*(.*)"
+
+        # PATTERN_MOOD_DETAIL에 매칭되는 항목을 찾아 리스트로 변환
+        mood_matches = re.findall(PATTERN_MOOD_DETAIL, mood_section)
+
+        parsed_data["mood_details"] = []
+
+        # 찾은 모든 항목(튜플)을 순회하며, 구조화
+        for mood, pct, desc in mood_matches:
+            parsed_data["mood_details"].append(
+                {
+                    "word": mood.strip(),
+                    "percentage": int(pct),
+                    "description": desc.strip(),
+                }
+            )
+
+    
+    # ------ ## 2. 분위기 판단 근거 -------
+        basis_section_match = re.search(
+        r"##\s*2\. 분위기 판단 근거(.*?)(?=##\s*3-1\. 현재 분위기에 맞춰 추가하면 좋을 가구 추천)",
+        llm_output,
+        re.DOTALL,
+    )
+    if basis_section_match:
+        basis_section = basis_section_match.group(1)
+
+        PATTERN_BASIS = r"-\s*(.*?):\s*(.*)"
+        basis_matches = re.findall(PATTERN_BASIS, basis_section)
+
+        parsed_data["basis"] = {}
+        key_mapping = {
+            "가구 배치 및 공간 분석": "furniture_layout",
+            "색감 및 질감": "color_texture",
+            "소재": "material",
+        }
+
+        # 찾은 모든 (key, value) 쌍
+        for key, value in basis_matches:
+            k = key.strip()
+            v = value.strip()
+            if k in key_mapping:
+                parsed_data["basis"][key_mapping[k]] = v
+            else:
+                # 매핑에 없는 키는 원문 그대로도 보존
+                parsed_data["basis"][k] = v
+
+    # ------ ## 3-1. 현재 분위기에 맞춰 추가하면 좋을 가구 추천 ------
+    add_section_match = re.search(
+        r"##\s*3-1\. 현재 분위기에 맞춰 추가하면 좋을 가구 추천(.*?)(?=##\s*3-2\. 제거하면 좋을 가구 추천)",
+        llm_output,
+        re.DOTALL,
+    )
+    if add_section_match:
+        add_section = add_section_match.group(1)
+
+        # {추가 가구} : {근거}
+        PATTERN_ADD = r"-\s*(.*?):\s*(.*)"
+        add_matches = re.findall(PATTERN_ADD, add_section)
+
+        parsed_data["recommendations_add"] = []
+
+        # 찾은 항목(튜플)을 구조화
+        for item, reason in add_matches:
+            parsed_data["recommendations_add"].append(
+                {
+                    "item": item.strip(),
+                    "reason": reason.strip(),
+                }
+            )
+
+    # ------ ## 3-2. 제거하면 좋을 가구 추천 ------
+    rem_section_match = re.search(
+        r"##\s*3-2\. 제거하면 좋을 가구 추천(.*?)(?=##\s*3-3\. 분위기별 바꿨으면 하는 가구 추천)",
+        llm_output,
+        re.DOTALL,
+    )
+    if rem_section_match:
+        rem_section = rem_section_match.group(1)
+
+        # {제거 가구} : {근거}
+        PATTERN_REM = r"-\s*(.*?):\s*(.*)"
+        rem_matches = re.findall(PATTERN_REM, rem_section)
+
+        # 템플릿 상 한 줄만 나오지만, 혹시 모를 확장을 고려해 리스트로 저장
+        parsed_data["recommendations_remove"] = []
+        for item, reason in rem_matches:
+            parsed_data["recommendations_remove"].append(
+                {
+                    "item": item.strip(),
+                    "reason": reason.strip(),
+                }
+            )
+
+    # ------ ## 3-3. 분위기별 바꿨으면 하는 가구 추천 ------
+    change_section_match = re.search(
+        r"##\s*3-3\. 분위기별 바꿨으면 하는 가구 추천(.*?)(?=#\s*6\. 이런 스타일 어떠세요\?|##\s*정리|$)",
+        llm_output,
+        re.DOTALL,
+    )
+    if change_section_match:
+        change_section = change_section_match.group(1)
+
+        # {변경 가구} -> {추천 가구} : {근거}
+        PATTERN_CHANGE = r"-\s*(.*?)\s*->\s*(.*?)\s*:\s*(.*)"
+        change_matches = re.findall(PATTERN_CHANGE, change_section)
+
+        parsed_data["recommendations_change"] = []
+        for src, dst, reason in change_matches:
+            parsed_data["recommendations_change"].append(
+                {
+                    "from_item": src.strip(),
+                    "to_item": dst.strip(),
+                    "reason": reason.strip(),
+                }
+            )
+
+    # ------ ## 4. 이런 스타일 어떠세요? ------
+    section_pattern = re.compile(
+        r"^##\s*4\.\s*이런 스타일 어떠세요\?\s*$"
+        r"(?P<body>.*?)(?=^##\s*정리|\Z)", 
+        re.MULTILINE | re.DOTALL,
+    )
+
+    m = section_pattern.search(llm_output)
+    
+    parsed_data["recommended_styles"] = [] # 결과 리스트 초기화
+    
+    if m:
+        body = m.group("body").strip()
+        
+        if body:
+            # "{- 스타일} : {이유}" 형식 한 줄씩 파싱
+            bullet_pattern = re.compile(
+                r"^\s*-\s*(?P<style>[^:]+?)\s*:\s*(?P<reason>.+)$",
+                re.MULTILINE,
+            )
+
+            # 본문(body) 내에서 모든 일치 항목을 반복해서 찾음
+            for b in bullet_pattern.finditer(body):
+                style = b.group("style").strip()
+                reason = b.group("reason").strip()
+                parsed_data["recommended_styles"].append(
+                    {
+                        "style": style,
+                        "reason": reason,
+                    }
+                )
+
+    # ------ 정리 ------
+    sum_section_match = re.search(r"##\s*정리(.*)", llm_output, re.DOTALL)
+    if sum_section_match:
+        sum_section = sum_section_match.group(1)
+
+        # " {- 문장}" 형태의 모든 줄을 뽑아온다.
+        lines = re.findall(r"-\s*(.*)", sum_section)
+
+        parsed_data["summary"] = {}
+        for idx, sentence in enumerate(lines):
+            key = f"summary{idx + 1}"
+            parsed_data["summary"][key] = sentence.strip()
+
+    # 최종 결과 반환
+    return parsed_data
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+"""
+Gemini generateContent REST API를 흉내 내는 로컬 스텁 서버.
+
+실제 API 쿼터를 쓰지 않고 클라이언트 계층을 측정/테스트하기 위한 용도.
+- 텍스트 모델: 가구 개수 질문이면 숫자("5")를, 그 외에는 리포트 템플릿을 채운 고정 텍스트를 돌려준다.
+  generationConfig.responseMimeType 이 application/json 이면 같은 리포트를 JSON(응답 스키마 구조)으로 돌려준다.
+- 이미지 모델(모델명에 "image" 포함): 요청에 들어온 첫 번째 이미지를 그대로 돌려준다.
+- streamGenerateContent(SSE)도 지원하며, 텍스트를 여러 줄 단위 조각으로 나눠 보낸다.
+- Files API(재개 가능 업로드, files.get)도 흉내 낸다. 요청의 fileData(URI) 이미지는 올라온 파일로 바꿔 처리한다.
+- 모델 종류(텍스트/이미지)별 응답 지연 분포와 오류율(429/503)을 설정할 수 있다.
+  지연 분포 형식: "0.5"(고정), "uniform:0.2:0.8", "normal:평균:표준편차", "lognormal:중앙값:sigma" (초)
+
+사용 예:
+    python -m bench.fake_gemini --port 8765
+    python -m bench.fake_gemini --text-latency lognormal:1.5:0.3 --image-latency lognormal:8:0.3 --error-rate 0.05
+    # config.GENAI_BASE_URL = "http://127.0.0.1:8765"
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from report.utils.report_parser import parse_report_output
+
+# report_prompt 템플릿을 채운 형태의 고정 리포트 응답
+CANNED_REPORT = """# 전체적인 분위기는 **따뜻하고 아늑한 북유럽 스타일**입니다.
+
+## 1. 분위기 정의 및 유형별 확률
+- 따뜻함(45%): 원목 가구와 노란 조명이 포근한 느낌을 준다.
+- 아늑함(35%): 패브릭 소재가 많아 편안한 분위기를 만든다.
+- 북유럽(20%): 밝은 벽과 단순한 가구 형태가 북유럽 감성을 보여준다.
+
+## 2. 분위기 판단 근거
+- 가구 배치 및 공간 분석 : 침대와 책상이 벽을 따라 배치되어 동선이 넓다.
+- 색감 및 질감: 아이보리와 우드 톤이 주를 이룬다.
+- 소재: 원목, 린넨, 면 소재가 사용되었다.
+
+## 3-1. 현재 분위기에 맞춰 추가하면 좋을 가구 추천
+- 러그 : 바닥에 온기를 더해 아늑함을 강화한다.
+
+## 3-2. 제거하면 좋을 가구 추천 
+- 플라스틱 수납함 : 원목 톤과 어울리지 않아 통일감을 해친다.
+
+## 3-3. 분위기별 바꿨으면 하는 가구 추천 
+- 철제 스탠드 -> 패브릭 플로어 스탠드 : 부드러운 조명이 따뜻한 분위기를 살린다.
+
+## 4. 이런 스타일 어떠세요? 
+- 재팬디 : 북유럽의 단순함에 일본식 차분함을 더해 지금 공간과 잘 어울린다.
+
+## 정리
+- 전체적으로 따뜻하고 아늑한 북유럽 스타일의 방이다.
+- 원목 가구와 조명이 공간의 통일감을 잘 만들어 준다.
+- 수납 소품을 정리하고 러그를 더하면 완성도가 높아진다.
+"""
+
+# JSON 모드(REPORT_OUTPUT_MODE = "json") 응답: 같은 리포트를 parsed_report.json 구조로
+CANNED_REPORT_JSON = parse_report_output(CANNED_REPORT)
+
+
+# 오류 주입 시 돌려줄 상태 코드별 응답 본문
+ERROR_STATUSES = {
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+}
+
+
+def parse_latency_spec(spec: Optional[str]) -> Callable[[random.Random], float]:
+    """지연 분포 문자열을 (난수 생성기 -> 초) 함수로 바꾼다. None/빈 문자열이면 지연 없음."""
+    if not spec:
+        return lambda rng: 0.0
+
+    kind, _, params = spec.partition(":")
+    if not params:
+        value = float(kind)
+        return lambda rng: value
+
+    args = [float(v) for v in params.split(":")]
+    if kind == "uniform":
+        low, high = args
+        return lambda rng: rng.uniform(low, high)
+    if kind == "normal":
+        mean, std = args
+        return lambda rng: max(0.0, rng.gauss(mean, std))
+    if kind == "lognormal":
+        median, sigma = args
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"알 수 없는 지연 분포: {spec}")
+
+
+class FakeBehavior:
+    """스텁 서버의 지연/오류 주입 설정. (서버 인스턴스마다 하나)"""
+
+    def __init__(
+        self,
+        text_latency: Optional[str] = None,
+        image_latency: Optional[str] = None,
+        error_rate: float = 0.0,
+        error_codes: Sequence[int] = (429, 503),
+        seed: Optional[int] = None,
+        truncate_rate: float = 0.0,
+        report_truncate_rate: float = 0.0,
+    ):
+        self.text_latency = parse_latency_spec(text_latency)
+        self.image_latency = parse_latency_spec(image_latency)
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.truncate_rate = truncate_rate
+        self.report_truncate_rate = report_truncate_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.truncated = 0
+        self.truncated_reports = 0
+
+    def plan(self, model: str) -> Tuple[float, Optional[int]]:
+        """이번 요청의 (지연 초, 주입할 오류 코드 또는 None)."""
+        with self._lock:
+            self.requests += 1
+            latency_fn = self.image_latency if "image" in model else self.text_latency
+            latency = latency_fn(self._rng)
+            error = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                error = self._rng.choice(self.error_codes)
+                self.errors += 1
+        return latency, error
+
+    def should_truncate(self) -> bool:
+        """이번 이미지 응답을 중간에서 잘라 보낼지 여부. (측면 뷰 검증/재생성 테스트용)"""
+        with self._lock:
+            if self.truncate_rate and self._rng.random() < self.truncate_rate:
+                self.truncated += 1
+                return True
+        return False
+
+    def should_truncate_report(self) -> bool:
+        """이번 리포트 응답을 '## 3-3' 앞에서 잘라 보낼지 여부. (리포트 부분 보정 테스트용)"""
+        with self._lock:
+            if self.report_truncate_rate and self._rng.random() < self.report_truncate_rate:
+                self.truncated_reports += 1
+                return True
+        return False
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    texts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if part.get("text"):
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def _first_inline_image(body: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            inline = part.get("inlineData") or part.get("inline_data")
+            if inline and inline.get("data"):
+                return inline
+    return None
+
+
+def build_reply(model: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """요청 본문에 대한 generateContent 응답(JSON)을 만든다."""
+    parts = []
+    inline = _first_inline_image(body)
+    if "image" in model and inline:
+        parts.append({
+            "inlineData": {
+                "mimeType": inline.get("mimeType") or inline.get("mime_type") or "image/png",
+                "data": inline["data"],
+            }
+        })
+    elif "개수" in _prompt_text(body):
+        parts.append({"text": "5"})
+    elif (body.get("generationConfig") or {}).get("responseMimeType") == "application/json":
+        report = dict(CANNED_REPORT_JSON)
+        if "selected_image" in json.dumps(body["generationConfig"].get("responseSchema") or {}):
+            report = {"selected_image": 1, **report}
+        parts.append({"text": json.dumps(report, ensure_ascii=False)})
+    elif "선택한 이미지" in _prompt_text(body):
+        # 선택 + 리포트 통합 요청: 첫 번째 후보를 고른 것으로 응답
+        parts.append({"text": "# 선택한 이미지: 1\n\n" + CANNED_REPORT})
+    else:
+        parts.append({"text": CANNED_REPORT})
+
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": parts},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "modelVersion": model,
+    }
+
+
+def split_stream_chunks(reply: Dict[str, Any], lines_per_chunk: int = 3) -> List[Dict[str, Any]]:
+    """텍스트 응답을 몇 줄씩 나눈 스트리밍 조각 응답 리스트로 만든다. (이미지 응답은 한 조각)"""
+    parts = reply["candidates"][0]["content"]["parts"]
+    if len(parts) != 1 or "text" not in parts[0]:
+        return [reply]
+
+    lines = parts[0]["text"].splitlines(keepends=True)
+    chunks = []
+    for i in range(0, len(lines), lines_per_chunk):
+        chunks.append({
+            "candidates": [
+                {"content": {"role": "model", "parts": [{"text": "".join(lines[i:i + lines_per_chunk])}]}, "index": 0}
+            ],
+            "modelVersion": reply.get("modelVersion"),
+        })
+    if chunks:
+        chunks[-1]["candidates"][0]["finishReason"] = "STOP"
+    return chunks or [reply]
+
+
+def _truncate_image_parts(reply: Dict[str, Any]) -> None:
+    """응답의 이미지 바이트를 절반만 남긴다. (잘린 다운로드 흉내)"""
+    for part in reply["candidates"][0]["content"]["parts"]:
+        inline = part.get("inlineData")
+        if inline:
+            # SDK는 URL-safe base64로 보낸다. (표준 알파벳도 그대로 디코드됨)
+            data = base64.urlsafe_b64decode(inline["data"])
+            inline["data"] = base64.urlsafe_b64encode(data[:len(data) // 2]).decode("ascii")
+
+
+def _report_text_part(reply: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """응답에서 템플릿 리포트 텍스트 파트를 찾는다. (가구 개수 / JSON 응답이면 None)"""
+    for part in reply["candidates"][0]["content"]["parts"]:
+        if "## 3-3" in (part.get("text") or ""):
+            return part
+    return None
+
+
+def _truncate_report_text(reply: Dict[str, Any], part: Dict[str, Any]) -> None:
+    """리포트 텍스트를 '## 3-3' 앞에서 자른다. (출력이 중간에 끊긴 응답 흉내)"""
+    part["text"] = part["text"].split("## 3-3", 1)[0]
+    reply["candidates"][0]["finishReason"] = "MAX_TOKENS"
+
+
+def _format_time(t: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t))
+
+
+class FakeFileStore:
+    """Files API 흉내: 업로드된 파일을 메모리에 보관한다. (서버 인스턴스마다 하나)"""
+
+    def __init__(self, ttl: float = 48 * 3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._files: Dict[str, Tuple[Dict[str, Any], bytes]] = {}
+        self.uploads = 0
+        self.upload_bytes = 0
+
+    def start(self, meta: Dict[str, Any]) -> str:
+        """업로드 세션을 열고 upload_id 를 반환한다."""
+        with self._lock:
+            self._next_id += 1
+            upload_id = f"u{self._next_id}"
+            self._sessions[upload_id] = {"meta": meta, "data": bytearray()}
+        return upload_id
+
+    def append(self, upload_id: str, chunk: bytes, finalize: bool, base_url: str) -> Optional[Dict[str, Any]]:
+        """조각을 추가한다. finalize 이면 파일 메타데이터를, 아니면 None. 모르는 세션이면 KeyError."""
+        with self._lock:
+            session = self._sessions[upload_id]
+            session["data"] += chunk
+            if not finalize:
+                return None
+            del self._sessions[upload_id]
+            self._next_id += 1
+            name = f"files/f{self._next_id}"
+            data = bytes(session["data"])
+            now = time.time()
+            meta = {
+                "name": name,
+                "mimeType": session["meta"].get("mimeType") or "application/octet-stream",
+                "sizeBytes": str(len(data)),
+                "createTime": _format_time(now),
+                "expirationTime": _format_time(now + self.ttl),
+                "uri": f"{base_url}/v1beta/{name}",
+                "state": "ACTIVE",
+                "_expires": now + self.ttl,
+            }
+            self._files[name] = (meta, data)
+            self.uploads += 1
+            self.upload_bytes += len(data)
+        return {k: v for k, v in meta.items() if not k.startswith("_")}
+
+    def get(self, name: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """만료되지 않은 파일의 (메타데이터, 바이트). 없으면 None."""
+        with self._lock:
+            entry = self._files.get(name)
+            if entry is not None and entry[0]["_expires"] < time.time():
+                del self._files[name]
+                entry = None
+        if entry is None:
+            return None
+        meta, data = entry
+        return {k: v for k, v in meta.items() if not k.startswith("_")}, data
+
+    def resolve_parts(self, body: Dict[str, Any]) -> Optional[str]:
+        """
+        요청의 fileData 파트를 같은 내용의 inlineData 로 바꾼다.
+        없는(만료/삭제된) 파일이 있으면 그 URI를 반환, 모두 찾았으면 None.
+        """
+        for content in body.get("contents", []):
+            for part in content.get("parts", []):
+                file_data = part.get("fileData") or part.get("file_data")
+                if not file_data:
+                    continue
+                uri = file_data.get("fileUri") or file_data.get("file_uri") or ""
+                entry = self.get("files/" + uri.rsplit("/files/", 1)[-1]) if "/files/" in uri else None
+                if entry is None:
+                    return uri
+                meta, data = entry
+                part.pop("fileData", None)
+                part.pop("file_data", None)
+                part["inlineData"] = {
+                    "mimeType": file_data.get("mimeType") or meta["mimeType"],
+                    "data": base64.b64encode(data).decode("ascii"),
+                }
+        return None
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    # keep-alive가 동작하도록 HTTP/1.1 사용
+    protocol_version = "HTTP/1.1"
+    # 헤더/본문 분할 전송 시 Nagle + delayed ACK로 생기는 ~40ms 지연 방지
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler 시그니처
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_sse(self, payloads: List[Dict[str, Any]], latency: float = 0.0) -> None:
+        # SSE 이벤트를 chunked 전송으로 하나씩 흘려보낸다.
+        # 지연의 30%는 첫 조각 전에, 나머지는 조각 사이에 나눠서 준다. (실제 스트리밍과 비슷한 TTFT)
+        time.sleep(latency * 0.3)
+        gap = latency * 0.7 / max(1, len(payloads) - 1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for idx, payload in enumerate(payloads):
+            if idx and gap:
+                time.sleep(gap)
+            event = ("data: " + json.dumps(payload) + "\r\n\r\n").encode("utf-8")
+            self.wfile.write(f"{len(event):X}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _base_url(self) -> str:
+        return f"http://{self.headers.get('Host') or '%s:%d' % self.server.server_address[:2]}"
+
+    def _handle_upload(self, raw: bytes) -> None:
+        # 재개 가능 업로드: start(메타데이터) → upload, finalize(바이트) 두 단계
+        files: FakeFileStore = self.server.files
+        command = (self.headers.get("X-Goog-Upload-Command") or "").lower()
+        if "start" in command:
+            try:
+                meta = (json.loads(raw or b"{}").get("file") or {})
+            except ValueError:
+                meta = {}
+            upload_id = files.start(meta)
+            self._send_json(200, {}, {
+                "X-Goog-Upload-URL": f"{self._base_url()}/upload/v1beta/files?upload_id={upload_id}",
+                "X-Goog-Upload-Status": "active",
+            })
+            return
+
+        upload_id = self.path.split("upload_id=", 1)[-1].split("&", 1)[0] if "upload_id=" in self.path else ""
+        try:
+            meta = files.append(upload_id, raw, "finalize" in command, self._base_url())
+        except KeyError:
+            self._send_json(404, {"error": {"code": 404, "message": "unknown upload", "status": "NOT_FOUND"}})
+            return
+        if meta is None:
+            self._send_json(200, {}, {"X-Goog-Upload-Status": "active"})
+        else:
+            self._send_json(200, {"file": meta}, {"X-Goog-Upload-Status": "final"})
+
+    def do_GET(self):
+        # files.get: /v1beta/files/{id}
+        path = self.path.split("?", 1)[0]
+        if "/files/" in path:
+            entry = self.server.files.get("files/" + path.rsplit("/files/", 1)[-1])
+            if entry is not None:
+                self._send_json(200, entry[0])
+                return
+        self._send_json(404, {"error": {"code": 404, "message": f"not found {path}", "status": "NOT_FOUND"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+
+        if self.path.startswith("/upload/"):
+            self._handle_upload(raw)
+            return
+
+        # 경로 예: /v1beta/models/gemini-2.5-flash:generateContent
+        path = self.path.split("?", 1)[0]
+        streaming = path.endswith(":streamGenerateContent")
+        if not streaming and not path.endswith(":generateContent"):
+            self._send_json(404, {"error": {"code": 404, "message": f"unknown path {path}", "status": "NOT_FOUND"}})
+            return
+
+        model = path.rsplit("/", 1)[-1].split(":", 1)[0]
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"code": 400, "message": "invalid json", "status": "INVALID_ARGUMENT"}})
+            return
+
+        missing_uri = self.server.files.resolve_parts(body)
+        if missing_uri is not None:
+            # 실제 API처럼 만료/삭제된 파일 참조는 권한 오류로 응답
+            message = f"You do not have permission to access the File {missing_uri} or it may not exist."
+            self._send_json(403, {"error": {"code": 403, "message": message, "status": "PERMISSION_DENIED"}})
+            return
+
+        behavior = getattr(self.server, "behavior", None)
+        latency, error_code = behavior.plan(model) if behavior is not None else (0.0, None)
+        if error_code is not None:
+            status = ERROR_STATUSES.get(error_code, "UNAVAILABLE")
+            self._send_json(error_code, {"error": {"code": error_code, "message": "injected error", "status": status}})
+            return
+
+        reply = build_reply(model, body)
+        if behavior is not None and "image" in model and behavior.should_truncate():
+            _truncate_image_parts(reply)
+        # 이미지를 보고 쓴 리포트만 자른다. (이미지 없는 보정 요청은 항상 온전하게 응답)
+        elif behavior is not None and "image" not in model and _first_inline_image(body):
+            part = _report_text_part(reply)
+            if part is not None and behavior.should_truncate_report():
+                _truncate_report_text(reply, part)
+        if streaming:
+            self._send_sse(split_stream_chunks(reply), latency)
+        else:
+            time.sleep(latency)
+            self._send_json(200, reply)
+
+
+def start_fake_server(host: str = "127.0.0.1", port: int = 0, behavior: Optional[FakeBehavior] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    백그라운드 스레드에서 스텁 서버를 띄운다.
+
+    Args:
+        behavior: 지연/오류 주입 설정. None이면 즉시 정상 응답.
+
+    Returns:
+        (server, base_url): 종료 시 server.shutdown() 호출. 요청/오류 수는 server.behavior,
+        업로드 수는 server.files 에서 확인.
+    """
+    server = ThreadingHTTPServer((host, port), FakeGeminiHandler)
+    server.behavior = behavior or FakeBehavior()
+    server.files = FakeFileStore()
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 Gemini 스텁 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--text-latency", default=None, help="텍스트 모델 지연 분포 (예: lognormal:1.5:0.3)")
+    parser.add_argument("--image-latency", default=None, help="이미지 모델 지연 분포 (예: lognormal:8:0.3)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/503 오류를 돌려줄 확률")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="이미지 응답을 잘라서 돌려줄 확률")
+    parser.add_argument("--report-truncate-rate", type=float, default=0.0, help="리포트 응답을 '## 3-3' 앞에서 잘라 돌려줄 확률")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.behavior = FakeBehavior(args.text_latency, args.image_latency, args.error_rate, truncate_rate=args.truncate_rate, report_truncate_rate=args.report_truncate_rate)
+    server.files = FakeFileStore()
+    print(f"Fake Gemini 서버 실행 중: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,237 @@
+"""
+실제 API 쿼터 없이 전체 파이프라인(main_report → main_new_looks → main_modify_looks)의
+처리량을 측정하는 오프라인 종단 벤치마크.
+
+지연/오류를 주입하는 로컬 스텁 서버(bench.fake_gemini)를 띄우고,
+N개의 세션을 동시에 실행하여 다음을 출력한다.
+- 단계별 소요 시간 (평균 / p50 / p95 / 최대)
+- 전체 처리량 (세션/분)
+- 재시도/한도 대기 (common.rate_limiter 카운터)
+- 최대 RSS (resource.getrusage)
+
+응답 캐시는 끄고 실행하므로 모든 호출이 스텁 서버까지 간다.
+
+실행 (llm_final_api 디렉토리에서):
+    python -m bench.run_pipeline_bench --sessions 8
+    python -m bench.run_pipeline_bench --sessions 16 --text-latency lognormal:1.5:0.3 \\
+        --image-latency lognormal:8:0.3 --error-rate 0.05 --json-out bench_result.json
+    python -m bench.run_pipeline_bench --set FUSED_EDIT_MODE=True --set REPORT_COMBINED_SELECT=True
+"""
+import argparse
+import ast
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from PIL import Image
+
+import config
+import main_1img23
+import main_modify_looks
+import main_new_looks
+import main_report
+from bench.fake_gemini import FakeBehavior, start_fake_server
+from common.rate_limiter import get_rate_limit_stats
+from common.workspace import Workspace
+
+STAGES = ("report", "new_look", "modify_look")
+
+# config 값을 이름으로 가져다 쓰는 모듈들 (--set 을 여기에도 반영)
+_CONFIG_CONSUMERS = (main_report, main_new_looks, main_modify_looks, main_1img23)
+
+
+def apply_overrides(overrides: List[str]) -> Dict[str, Any]:
+    """--set KEY=VALUE 목록을 config와 config 값을 복사해 둔 모듈들에 적용한다."""
+    applied = {}
+    for item in overrides:
+        key, _, raw = item.partition("=")
+        try:
+            value = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            value = raw
+        if not hasattr(config, key):
+            raise SystemExit(f"config에 없는 설정입니다: {key}")
+        setattr(config, key, value)
+        for module in _CONFIG_CONSUMERS:
+            if hasattr(module, key):
+                setattr(module, key, value)
+        applied[key] = value
+    return applied
+
+
+def make_candidates(session_dir: str, count: int, size) -> List[str]:
+    """세션마다 내용이 다른 후보 이미지를 만든다. (세션 간 캐시/메모 재사용 방지)"""
+    paths = []
+    seed = sum(map(ord, os.path.basename(session_dir)))
+    for idx in range(count):
+        path = os.path.join(session_dir, f"candidate_{idx}.jpg")
+        color = ((seed * 37 + idx * 53) % 256, (seed * 11 + idx * 29) % 256, (seed * 5 + idx * 71) % 256)
+        gradient = Image.linear_gradient("L").resize(size).convert("RGB")
+        Image.blend(Image.new("RGB", size, color), gradient, 0.4).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def run_session(name: str, root: str, candidates: int, size) -> Dict[str, Any]:
+    """세션 하나의 전체 파이프라인을 실행하고 단계별 소요 시간을 반환한다."""
+    session_dir = os.path.join(root, name)
+    inputs_dir = os.path.join(session_dir, "inputs")
+    os.makedirs(inputs_dir, exist_ok=True)
+    candidate_paths = make_candidates(inputs_dir, candidates, size)
+    workspace = Workspace(os.path.join(session_dir, "workspace"), session_id=name)
+
+    result = {"name": name, "ok": False, "error": None, "stages": {}}
+    start = time.perf_counter()
+    stage = "report"
+    try:
+        parsed_report = main_report.generate_report(config.API_KEY, candidate_paths, workspace=workspace)
+        result["stages"]["report"] = time.perf_counter() - start
+
+        stage = "new_look"
+        stage_start = time.perf_counter()
+        main_new_looks.run_new_look(parsed_report, {"selected_style": "AI 추천"}, workspace=workspace)
+        result["stages"]["new_look"] = time.perf_counter() - stage_start
+
+        stage = "modify_look"
+        stage_start = time.perf_counter()
+        user_choice = {"use_add": True, "use_remove": True, "use_change": True}
+        main_modify_looks.run_modify_look(parsed_report, user_choice, workspace=workspace)
+        result["stages"]["modify_look"] = time.perf_counter() - stage_start
+
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{stage}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    # nearest-rank 방식
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    samples = {stage: [r["stages"][stage] for r in results if stage in r["stages"]] for stage in STAGES}
+    samples["total"] = [r["seconds"] for r in results if r["ok"]]
+
+    stages = {}
+    for stage, values in samples.items():
+        if not values:
+            continue
+        stages[stage] = {
+            "count": len(values),
+            "mean": statistics.mean(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "max": max(values),
+        }
+
+    succeeded = sum(1 for r in results if r["ok"])
+    return {
+        "sessions": len(results),
+        "succeeded": succeeded,
+        "failed": [{"name": r["name"], "error": r["error"]} for r in results if not r["ok"]],
+        "wall_seconds": wall_seconds,
+        "sessions_per_minute": succeeded / wall_seconds * 60.0 if wall_seconds > 0 else 0.0,
+        "stages": stages,
+        # Linux에서 ru_maxrss 단위는 KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "rate_limits": get_rate_limit_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="오프라인 종단 파이프라인 벤치마크")
+    parser.add_argument("--sessions", type=int, default=4, help="동시에 실행할 세션 수")
+    parser.add_argument("--candidates", type=int, default=3, help="세션당 후보 이미지 수")
+    parser.add_argument("--image-size", default="1600x1200", help="후보 이미지 크기 (가로x세로)")
+    parser.add_argument("--text-latency", default="lognormal:0.3:0.3", help="텍스트 모델 지연 분포")
+    parser.add_argument("--image-latency", default="lognormal:1.0:0.3", help="이미지 모델 지연 분포")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/503 오류 주입 확률")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="이미지 응답을 잘라서 보낼 확률 (측면 뷰 재생성 확인용)")
+    parser.add_argument("--report-truncate-rate", type=float, default=0.0, help="리포트 응답을 잘라서 보낼 확률 (부분 보정 확인용)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", dest="overrides", action="append", default=[], help="config 덮어쓰기 (KEY=VALUE)")
+    parser.add_argument("--json-out", default=None, help="결과 JSON 저장 경로")
+    parser.add_argument("--verbose", action="store_true", help="파이프라인 로그를 그대로 출력")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.image_size.lower().split("x"))
+
+    # 모든 호출이 스텁 서버까지 가도록 캐시를 끄고, 주입된 오류의 재시도 대기를 짧게 한다.
+    config.RESPONSE_CACHE_ENABLED = False
+    config.RETRY_BASE_DELAY = 0.05
+    config.RETRY_MAX_DELAY = 0.5
+    overrides = apply_overrides(args.overrides)
+
+    behavior = FakeBehavior(
+        args.text_latency, args.image_latency, args.error_rate, seed=args.seed,
+        truncate_rate=args.truncate_rate, report_truncate_rate=args.report_truncate_rate,
+    )
+    server, config.GENAI_BASE_URL = start_fake_server(behavior=behavior)
+
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            names = [f"session{idx:03d}" for idx in range(args.sessions)]
+            log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+            start = time.perf_counter()
+            with log, ThreadPoolExecutor(max_workers=max(1, args.sessions)) as executor:
+                futures = [executor.submit(run_session, name, root, args.candidates, size) for name in names]
+                results = [future.result() for future in futures]
+            wall_seconds = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    summary = summarize(results, wall_seconds)
+    summary["config_overrides"] = overrides
+    summary["fake_server"] = {
+        "text_latency": args.text_latency,
+        "image_latency": args.image_latency,
+        "error_rate": args.error_rate,
+        "requests": behavior.requests,
+        "injected_errors": behavior.errors,
+        "truncated_images": behavior.truncated,
+        "truncated_reports": behavior.truncated_reports,
+        "file_uploads": server.files.uploads,
+        "file_upload_bytes": server.files.upload_bytes,
+    }
+
+    print(f"세션 {summary['sessions']}개 (동시 실행) | 성공 {summary['succeeded']}개 | 전체 {wall_seconds:.2f}s")
+    print(f"처리량: {summary['sessions_per_minute']:.1f} 세션/분 | 최대 RSS: {summary['peak_rss_mb']:.1f} MB")
+    print(f"스텁 요청 {behavior.requests}건 (주입 오류 {behavior.errors}건, 잘린 이미지 {behavior.truncated}건, 잘린 리포트 {behavior.truncated_reports}건, 파일 업로드 {server.files.uploads}건)")
+    print(f"{'단계':<12} {'평균':>8} {'p50':>8} {'p95':>8} {'최대':>8}")
+    for stage, stats in summary["stages"].items():
+        print(f"{stage:<12} {stats['mean']:8.2f} {stats['p50']:8.2f} {stats['p95']:8.2f} {stats['max']:8.2f}")
+    for model, stats in summary["rate_limits"].items():
+        print(
+            f"[{model}] 호출 {stats['calls']}회, 재시도 {stats['retries']}회, 실패 {stats['failures']}회, "
+            f"한도 대기 {stats['wait_seconds']:.2f}s, 백오프 {stats['backoff_seconds']:.2f}s"
+        )
+    for item in summary["failed"]:
+        print(f"실패: {item['name']} ({item['error']})")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({**summary, "results": results}, f, ensure_ascii=False, indent=4)
+
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
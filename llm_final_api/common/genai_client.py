@@ -0,0 +1,256 @@
+import atexit
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from google import genai
+from google.genai import types
+
+import config
+from common.image_handles import is_missing_file_error, refresh_file_parts
+from common.metrics import record as record_metric
+from common.rate_limiter import (
+    call_with_limits,
+    estimate_tokens,
+    get_rate_limiter,
+    reported_tokens,
+    wait_before_retry,
+)
+
+# 프로세스 전체에서 공유하는 GenAI 클라이언트 레지스트리.
+# genai.Client는 내부에 HTTP 커넥션 풀(keep-alive)을 가지고 있으므로,
+# 호출마다 새로 만들지 않고 재사용하면 클라이언트 초기화와 TCP/TLS 핸드셰이크 비용을 아낄 수 있다.
+_clients: Dict[Tuple[str, Optional[str]], genai.Client] = {}
+_lock = threading.Lock()
+
+
+def _create_client(api_key: str, base_url: Optional[str]) -> genai.Client:
+    if base_url:
+        return genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(base_url=base_url),
+        )
+    return genai.Client(api_key=api_key)
+
+
+def get_client(api_key: str, base_url: Optional[str] = None) -> genai.Client:
+    """
+    (api_key, base_url) 조합별로 하나의 genai.Client를 만들어 재사용한다.
+
+    Args:
+        api_key (str): Google GenAI API Key
+        base_url (Optional[str]): 엔드포인트 주소. None이면 config.GENAI_BASE_URL 사용.
+
+    Returns:
+        genai.Client: 공유 클라이언트 (스레드 간 공유 가능)
+    """
+    if base_url is None:
+        base_url = config.GENAI_BASE_URL
+
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    # 여러 스레드가 동시에 첫 호출을 해도 클라이언트는 한 번만 생성.
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _create_client(api_key, base_url)
+            _clients[key] = client
+    return client
+
+
+def close_clients() -> None:
+    """레지스트리의 모든 클라이언트를 닫고 비운다. (프로세스 종료 시 자동 호출)"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+
+atexit.register(close_clients)
+
+
+def _request_bytes(contents: List[Any]) -> int:
+    """요청에 실린 텍스트/이미지 바이트 수."""
+    total = 0
+    for item in contents:
+        if isinstance(item, str):
+            total += len(item.encode("utf-8"))
+            continue
+        inline = getattr(item, "inline_data", None)
+        if inline is not None and inline.data:
+            total += len(inline.data)
+        text = getattr(item, "text", None)
+        if text:
+            total += len(text.encode("utf-8"))
+    return total
+
+
+def _response_bytes(response) -> int:
+    """응답에 담긴 텍스트/이미지 바이트 수."""
+    total = 0
+    for cand in getattr(response, "candidates", None) or []:
+        content = getattr(cand, "content", None)
+        for part in getattr(content, "parts", None) or []:
+            inline = getattr(part, "inline_data", None)
+            if inline is not None and inline.data:
+                total += len(inline.data)
+            if getattr(part, "text", None):
+                total += len(part.text.encode("utf-8"))
+    return total
+
+
+def _usage(response) -> Dict[str, Optional[int]]:
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+        "total_tokens": getattr(usage, "total_token_count", None),
+    }
+
+
+def _outcome(exc: Optional[BaseException]) -> str:
+    return "ok" if exc is None else f"error:{type(exc).__name__}"
+
+
+def generate_content(
+    client: genai.Client,
+    model_name: str,
+    contents: List[Any],
+    generation_config: Optional[types.GenerateContentConfig] = None,
+    stage: str = "unknown",
+):
+    """
+    모든 generate_content 호출이 거치는 공통 진입점.
+    모델별 RPM/TPM 한도(config.MODEL_RATE_LIMITS)를 지키고, 429/5xx는 지수 백오프 + jitter로 재시도한다.
+    호출마다 단계(stage), 지연 시간(재시도/대기 포함), 업/다운로드 바이트, 토큰 수, 결과를 metrics에 기록한다.
+    참조한 Files API 파일이 서버에서 지워져 403/404가 나면 이미지를 다시 올려(또는 인라인으로) 한 번 재요청한다.
+
+    Raises:
+        RetryExhaustedError: 재시도 횟수를 다 쓴 경우
+    """
+    def _send(request_contents):
+        return call_with_limits(
+            model_name,
+            lambda: client.models.generate_content(model=model_name, contents=request_contents, config=generation_config),
+            estimated_tokens=estimate_tokens(request_contents),
+        )
+
+    start = time.perf_counter()
+    response = None
+    error = None
+    try:
+        try:
+            response = _send(contents)
+        except Exception as e:
+            refreshed = refresh_file_parts(client, contents) if is_missing_file_error(e) else None
+            if refreshed is None:
+                raise
+            print(f"  업로드한 이미지 파일을 찾을 수 없어 다시 올린 뒤 재요청합니다: {e}")
+            contents = refreshed
+            response = _send(contents)
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        record_metric(
+            "model_call",
+            stage,
+            model=model_name,
+            latency=time.perf_counter() - start,
+            upload_bytes=_request_bytes(contents),
+            download_bytes=_response_bytes(response) if response is not None else 0,
+            outcome=_outcome(error),
+            **(_usage(response) if response is not None else {}),
+        )
+
+
+def generate_content_stream(
+    client: genai.Client,
+    model_name: str,
+    contents: List[Any],
+    generation_config: Optional[types.GenerateContentConfig] = None,
+    stage: str = "unknown",
+) -> Iterator[Any]:
+    """
+    generate_content_stream용 공통 진입점.
+    첫 조각을 받기 전의 오류만 재시도한다. (이미 일부를 yield한 뒤에는 중복 출력을 피하기 위해 그대로 올림)
+    Files API 파일이 지워져 난 403/404도 첫 조각 전이면 이미지를 다시 올려 한 번 재요청한다.
+    metrics에는 스트림 전체(첫 요청 ~ 마지막 조각)를 한 건으로 기록하고, 첫 조각까지의 시간도 함께 남긴다.
+    """
+    limiter = get_rate_limiter(model_name)
+    estimated = estimate_tokens(contents)
+    max_attempts = max(1, config.RETRY_MAX_ATTEMPTS)
+
+    total_start = time.perf_counter()
+    first_chunk_latency = None
+    download_bytes = 0
+    last = None
+    error = None
+    try:
+        attempt = 0
+        files_refreshed = False
+        while True:
+            attempt += 1
+            limiter.acquire(estimated)
+            start = time.perf_counter()
+            try:
+                stream = iter(client.models.generate_content_stream(model=model_name, contents=contents, config=generation_config))
+                first = next(stream, None)
+            except Exception as e:
+                limiter.record(attempts=1, call_seconds=time.perf_counter() - start)
+                if not files_refreshed and is_missing_file_error(e):
+                    files_refreshed = True
+                    refreshed = refresh_file_parts(client, contents)
+                    if refreshed is not None:
+                        print(f"  업로드한 이미지 파일을 찾을 수 없어 다시 올린 뒤 재요청합니다: {e}")
+                        contents = refreshed
+                        continue
+                wait_before_retry(limiter, e, attempt, max_attempts)
+                continue
+            break
+
+        first_chunk_latency = time.perf_counter() - total_start
+        try:
+            if first is not None:
+                last = first
+                download_bytes += _response_bytes(first)
+                yield first
+                for chunk in stream:
+                    last = chunk
+                    download_bytes += _response_bytes(chunk)
+                    yield chunk
+        except Exception:
+            limiter.record(attempts=1, failures=1, call_seconds=time.perf_counter() - start)
+            raise
+
+        limiter.record(attempts=1, calls=1, call_seconds=time.perf_counter() - start)
+        # 사용량은 마지막 조각의 usage_metadata에 누적되어 온다.
+        limiter.settle(estimated, reported_tokens(last) if last is not None else None)
+    except BaseException as e:
+        # GeneratorExit(소비 측에서 중간에 닫은 경우)도 결과에 남긴다.
+        error = e
+        raise
+    finally:
+        record_metric(
+            "model_call",
+            stage,
+            model=model_name,
+            latency=time.perf_counter() - total_start,
+            upload_bytes=_request_bytes(contents),
+            download_bytes=download_bytes,
+            outcome=_outcome(error),
+            first_chunk_s=first_chunk_latency,
+            streamed=True,
+            **(_usage(last) if last is not None else {}),
+        )
@@ -0,0 +1,214 @@
+"""
+같은 이미지를 여러 모델 호출에 보낼 때, 매번 요청 본문에 인라인(base64)으로 싣지 않고
+Files API로 한 번만 올린 뒤 URI로 참조하게 하는 이미지 핸들 레지스트리.
+
+- 키: 이미지 바이트 해시 + MIME 타입 (같은 내용이면 호출부가 달라도 같은 핸들)
+- 만료: Files API 파일은 올린 뒤 일정 시간(48시간)이 지나면 삭제되므로 expiration_time 을 함께 보관하고,
+        남은 시간이 config.FILE_HANDLE_REFRESH_MARGIN 보다 짧으면 다시 올린다.
+- 같은 이미지를 여러 스레드가 동시에 요청해도(측면 뷰 좌/우 등) 업로드는 한 번만 한다.
+- 업로드도 모델 호출처럼 call_with_limits 로 한도/재시도를 거치고, 그래도 실패하면 기존처럼 인라인으로 보낸다.
+- 만료 전에 서버에서 파일이 지워져 모델 호출이 403/404 로 실패하면, 호출부(genai_client)가
+  refresh_file_parts 로 그 핸들을 버리고 다시 올린(또는 인라인) Part 로 한 번 재요청한다.
+
+호출부에서는 types.Part.from_bytes 대신 image_part(client, data, mime_type) 를 쓴다.
+"""
+import hashlib
+import io
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google import genai
+from google.genai import errors, types
+
+import config
+from common.metrics import record as record_metric
+from common.rate_limiter import call_with_limits
+
+# 업로드 직후 PROCESSING 상태인 파일을 기다릴 최대 시간 (초). 이미지는 보통 바로 ACTIVE.
+_ACTIVE_WAIT_SECONDS = 10.0
+
+
+def _handle_key(data: bytes, mime_type: str) -> str:
+    return hashlib.sha256(data).hexdigest() + ":" + mime_type
+
+
+def _expires_at(handle: types.File) -> Optional[float]:
+    expiration = getattr(handle, "expiration_time", None)
+    return expiration.timestamp() if expiration is not None else None
+
+
+class ImageHandleRegistry:
+    """클라이언트(API 키) 하나에 대해 올린 이미지 핸들을 보관한다. (스레드 안전)"""
+
+    def __init__(self, client: genai.Client, max_entries: Optional[int] = None):
+        self.client = client
+        self.max_entries = config.FILE_HANDLE_MAX_ENTRIES if max_entries is None else max_entries
+        self._handles: "OrderedDict[str, types.File]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _lookup(self, key: str) -> Optional[types.File]:
+        """유효한 핸들이 있으면 반환한다. 곧 만료되면 버리고 None."""
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                return None
+            expires_at = _expires_at(handle)
+            if expires_at is not None and expires_at - time.time() < config.FILE_HANDLE_REFRESH_MARGIN:
+                del self._handles[key]
+                return None
+            self._handles.move_to_end(key)
+            return handle
+
+    def _store(self, key: str, handle: types.File) -> None:
+        with self._lock:
+            self._handles[key] = handle
+            self._handles.move_to_end(key)
+            # 오래 안 쓴 핸들부터 잊는다. (원격 파일은 만료 시 자동 삭제되므로 따로 지우지 않음)
+            while len(self._handles) > self.max_entries:
+                old_key, _ = self._handles.popitem(last=False)
+                self._key_locks.pop(old_key, None)
+
+    def _upload(self, data: bytes, mime_type: str) -> types.File:
+        # 모델 호출과 같은 한도/429·503 재시도/호출 통계를 거친다. (재시도마다 새 스트림으로 올림)
+        handle = call_with_limits(
+            config.FILE_UPLOAD_LIMIT_KEY,
+            lambda: self.client.files.upload(file=io.BytesIO(data), config={"mime_type": mime_type}),
+        )
+        deadline = time.monotonic() + _ACTIVE_WAIT_SECONDS
+        while handle.state == types.FileState.PROCESSING and time.monotonic() < deadline:
+            time.sleep(0.2)
+            handle = self.client.files.get(name=handle.name)
+        if handle.state == types.FileState.FAILED or not handle.uri:
+            raise RuntimeError(f"파일 업로드 처리 실패: {handle.name} ({handle.state})")
+        return handle
+
+    def get(self, data: bytes, mime_type: str, stage: str = "unknown") -> types.File:
+        """
+        이미지의 핸들을 반환한다. 없거나 곧 만료되면 새로 올린다.
+
+        Raises:
+            Exception: 업로드 실패 (SDK 예외 그대로)
+        """
+        key = _handle_key(data, mime_type)
+        handle = self._lookup(key)
+        if handle is None:
+            with self._key_lock(key):
+                # 같은 이미지를 기다리던 다른 스레드가 이미 올렸으면 그것을 사용
+                handle = self._lookup(key)
+                if handle is None:
+                    start = time.perf_counter()
+                    error = None
+                    try:
+                        handle = self._upload(data, mime_type)
+                    except Exception as e:
+                        error = e
+                        # 실패한 이미지의 키 잠금은 남기지 않는다. (기다리던 스레드와 겹치면 최악의 경우 한 번 더 올림)
+                        with self._lock:
+                            self._key_locks.pop(key, None)
+                        raise
+                    finally:
+                        record_metric(
+                            "file_upload",
+                            stage,
+                            latency=time.perf_counter() - start,
+                            upload_bytes=len(data),
+                            outcome="ok" if error is None else f"error:{type(error).__name__}",
+                        )
+                    self._store(key, handle)
+                    return handle
+
+        record_metric("file_upload", stage, outcome="reused")
+        return handle
+
+    def part(self, data: bytes, mime_type: str, stage: str = "unknown") -> types.Part:
+        handle = self.get(data, mime_type, stage)
+        return types.Part.from_uri(file_uri=handle.uri, mime_type=handle.mime_type or mime_type)
+
+    def forget(self, data: bytes, mime_type: str, uri: Optional[str] = None) -> None:
+        """
+        핸들을 버려 다음 get 에서 다시 올리게 한다. (서버에서 파일이 먼저 지워진 경우)
+        uri 를 주면 보관 중인 핸들이 그 URI 일 때만 버린다. (다른 스레드가 이미 새로 올린 핸들은 유지)
+        """
+        key = _handle_key(data, mime_type)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and (uri is None or handle.uri == uri):
+                del self._handles[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._handles.clear()
+            self._key_locks.clear()
+
+
+# 클라이언트별 레지스트리 (get_client 가 같은 클라이언트를 재사용하므로 API 키별로 하나)
+_registries: Dict[int, ImageHandleRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_handle_registry(client: genai.Client) -> ImageHandleRegistry:
+    key = id(client)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None or registry.client is not client:
+            registry = _registries[key] = ImageHandleRegistry(client)
+        return registry
+
+
+# 핸들(URI) Part -> 원본 (바이트, MIME 타입, 단계). 파일이 지워졌을 때 다시 올리기 위해 Part 가 살아 있는 동안만 보관.
+# (Part 는 해시가 안 되므로 id 로 찾고, Part 가 사라지면 weakref.finalize 로 지운다)
+_part_sources: Dict[int, Tuple[bytes, str, str]] = {}
+
+
+def image_part(client: genai.Client, data: bytes, mime_type: str, stage: str = "unknown") -> types.Part:
+    """
+    모델 요청에 넣을 이미지 Part.
+
+    config.USE_FILE_HANDLES 가 꺼져 있거나 이미지가 config.FILE_HANDLE_MIN_BYTES 보다 작으면 기존처럼 인라인,
+    아니면 Files API 핸들(URI) 참조. 업로드에 실패하면 인라인으로 대체한다.
+    """
+    if not config.USE_FILE_HANDLES or len(data) < config.FILE_HANDLE_MIN_BYTES:
+        return types.Part.from_bytes(data=data, mime_type=mime_type)
+    try:
+        part = get_handle_registry(client).part(data, mime_type, stage)
+    except Exception as e:
+        print(f"  이미지 업로드(Files API) 실패, 인라인으로 보냅니다: {e}")
+        return types.Part.from_bytes(data=data, mime_type=mime_type)
+    _part_sources[id(part)] = (data, mime_type, stage)
+    weakref.finalize(part, _part_sources.pop, id(part), None)
+    return part
+
+
+def is_missing_file_error(exc: BaseException) -> bool:
+    """참조한 Files API 파일이 서버에 없어서(삭제/만료) 난 오류인지. (403 PERMISSION_DENIED / 404 NOT_FOUND)"""
+    return isinstance(exc, errors.ClientError) and exc.code in (403, 404)
+
+
+def refresh_file_parts(client: genai.Client, contents: List[Any]) -> Optional[List[Any]]:
+    """
+    contents 의 핸들(URI) Part 를 버리고 다시 올린 Part 로 바꾼 새 리스트를 반환한다.
+    다시 올리지 못한 이미지는 인라인으로 들어간다. 바꿀 핸들 Part 가 없으면 None (재요청해도 소용없음).
+    """
+    refreshed = list(contents)
+    changed = False
+    for idx, item in enumerate(contents):
+        source = _part_sources.get(id(item))
+        file_data = getattr(item, "file_data", None)
+        if source is None or file_data is None:
+            continue
+        data, mime_type, stage = source
+        get_handle_registry(client).forget(data, mime_type, file_data.file_uri)
+        refreshed[idx] = image_part(client, data, mime_type, stage)
+        changed = True
+    return refreshed if changed else None
@@ -0,0 +1,187 @@
+import struct
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from common.image_preprocess import sniff_image_format
+
+# 이미지 전체를 디코드하지 않고 헤더만 읽어서 크기를 구하고, 끝 표시로 잘린 파일인지 확인한다.
+# (생성된 측면 뷰가 입력과 같은 비율인지, 빈/잘린 응답은 아닌지 싸게 검사하기 위함)
+
+_PNG_IEND = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+
+# 크기 정보가 들어 있는 JPEG SOF 마커 (DHT=C4, JPG=C8, DAC=CC 제외)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 길이 필드가 없는 JPEG 마커 (SOI, TEM, RST0~7)
+_JPEG_STANDALONE_MARKERS = {0xD8, 0x01, *range(0xD0, 0xD8)}
+
+
+def _png_size(data: bytes):
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", data[16:24])
+
+
+def _jpeg_segments(data: bytes):
+    """SOS/EOI 전까지의 JPEG 세그먼트를 (마커, 시작 위치, 길이)로 차례대로 돌려준다."""
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return
+        marker = data[i + 1]
+        if marker == 0xFF:  # 채움 바이트
+            i += 1
+            continue
+        if marker in _JPEG_STANDALONE_MARKERS:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / SOS 이후에는 헤더 정보가 없음
+            return
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        yield marker, i, length
+        i += 2 + length
+
+
+def _jpeg_size(data: bytes):
+    for marker, i, _ in _jpeg_segments(data):
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+    return None
+
+
+def _exif_orientation(tiff: bytes) -> int:
+    """EXIF(TIFF) 블록의 IFD0 에서 Orientation(0x0112) 값을 읽는다. 없으면 1."""
+    endian = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if endian is None or len(tiff) < 8:
+        return 1
+    offset = struct.unpack(endian + "I", tiff[4:8])[0]
+    if offset + 2 > len(tiff):
+        return 1
+    count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+    for n in range(count):
+        entry = offset + 2 + n * 12
+        if entry + 12 > len(tiff):
+            break
+        if struct.unpack(endian + "H", tiff[entry:entry + 2])[0] == 0x0112:
+            value = struct.unpack(endian + "H", tiff[entry + 8:entry + 10])[0]
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+
+def _jpeg_orientation(data: bytes) -> int:
+    # 휴대폰 사진은 픽셀을 돌리지 않고 EXIF(APP1) Orientation 으로 회전을 표시한다.
+    for marker, i, length in _jpeg_segments(data):
+        if marker == 0xE1 and data[i + 4:i + 10] == b"Exif\x00\x00":
+            return _exif_orientation(data[i + 10:i + 2 + length])
+    return 1
+
+
+def _webp_size(data: bytes):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30 and data[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25 and data[20] == 0x2F:
+        bits = struct.unpack("<I", data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _gif_size(data: bytes):
+    if len(data) < 10:
+        return None
+    return struct.unpack("<HH", data[6:10])
+
+
+def _is_complete(fmt: str, data: bytes) -> bool:
+    """포맷별 끝 표시가 있는지 확인한다. (뒤에 붙은 0 패딩은 무시)"""
+    if fmt == "png":
+        return _PNG_IEND in data[-64:]
+    if fmt == "jpeg":
+        return data.rstrip(b"\x00").endswith(b"\xff\xd9")
+    if fmt == "gif":
+        return data.rstrip(b"\x00").endswith(b";")
+    if fmt == "webp":
+        return len(data) >= struct.unpack("<I", data[4:8])[0] + 8
+    return False
+
+
+_SIZE_READERS = {
+    "png": _png_size,
+    "jpeg": _jpeg_size,
+    "webp": _webp_size,
+    "gif": _gif_size,
+}
+
+
+def read_image_header(data: bytes) -> Optional[Dict[str, Any]]:
+    """
+    이미지 바이트의 헤더만 읽는다. (PNG / JPEG / WEBP / GIF)
+
+    Returns:
+        dict: {"format", "width", "height", "complete", "orientation"}
+              (complete=False면 끝이 잘린 파일, orientation은 EXIF 회전 값 1~8, JPEG 외에는 1)
+        포맷을 모르거나 헤더에서 크기를 읽을 수 없으면 None.
+    """
+    fmt = sniff_image_format(data or b"")
+    if fmt is None:
+        return None
+    size = _SIZE_READERS[fmt](data)
+    if not size or not size[0] or not size[1]:
+        return None
+    return {
+        "format": fmt,
+        "width": size[0],
+        "height": size[1],
+        "complete": _is_complete(fmt, data),
+        "orientation": _jpeg_orientation(data) if fmt == "jpeg" else 1,
+    }
+
+
+def display_size(header: Dict[str, Any]) -> Tuple[int, int]:
+    """EXIF 회전을 반영한 (가로, 세로). Orientation 5~8 은 90도 회전이라 가로/세로가 바뀐다."""
+    if header.get("orientation", 1) >= 5:
+        return header["height"], header["width"]
+    return header["width"], header["height"]
+
+
+def check_same_aspect(
+    data: bytes,
+    reference: Optional[Dict[str, Any]],
+    tolerance: float = 0.02,
+    output_sizes: Optional[Sequence[Tuple[int, int]]] = None,
+) -> Optional[str]:
+    """
+    생성 결과가 쓸 만한지 헤더만 보고 검사한다.
+
+    Args:
+        reference: 입력 이미지의 read_image_header 결과 (None이면 비율 검사 생략, EXIF 회전 반영)
+        tolerance: 허용하는 가로세로 비율 차이 (상대값, 0.02 = 2%)
+        output_sizes: 모델이 낼 수 있는 출력 크기 목록. 주면 입력 비율에 가장 가까운 출력 크기의 비율도 허용한다.
+
+    Returns:
+        문제가 없으면 None, 있으면 이유 ("empty" / "unknown_format" / "truncated" / "aspect")
+    """
+    if not data:
+        return "empty"
+    header = read_image_header(data)
+    if header is None:
+        return "unknown_format"
+    if not header["complete"]:
+        return "truncated"
+    if reference is not None:
+        width, height = display_size(reference)
+        expected = [width / height]
+        if output_sizes:
+            # 모델은 정해진 출력 크기 중 입력과 가장 가까운 것으로 그린다. (4:3 -> 1184x864 등)
+            expected.append(min((w / h for w, h in output_sizes), key=lambda ratio: abs(ratio - expected[0])))
+        width, height = display_size(header)
+        actual = width / height
+        if all(abs(actual - ratio) / ratio > tolerance for ratio in expected):
+            return "aspect"
+    return None
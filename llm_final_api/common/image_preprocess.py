@@ -0,0 +1,128 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+# 모델 업로드 전 이미지 전처리.
+# - 파일 내용(매직 바이트)으로 실제 포맷을 판별해 올바른 MIME 타입을 붙인다. (PNG를 image/jpeg로 보내지 않도록)
+# - max_edge가 주어지면 긴 변을 그 크기로 줄이고, 작은 포맷(JPEG/WEBP)으로 다시 인코딩한다.
+# - 결과는 (파일 경로, 수정 시각, 크기, 옵션) 단위로 메모리에 보관하여 같은 파일을 반복해서 처리하지 않는다.
+
+MIME_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "gif": "image/gif",
+}
+
+# PIL 저장 포맷 이름
+_PIL_FORMATS = {
+    "jpeg": "JPEG",
+    "png": "PNG",
+    "webp": "WEBP",
+}
+
+_MEMO_MAX_ENTRIES = 64
+_memo: "OrderedDict[tuple, Tuple[bytes, str]]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def sniff_image_format(data: bytes) -> Optional[str]:
+    """매직 바이트로 이미지 포맷을 판별한다. ("jpeg" / "png" / "webp" / "gif", 모르면 None)"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    return None
+
+
+def mime_type_of(data: bytes, default: str = "image/jpeg") -> str:
+    """이미지 바이트의 실제 MIME 타입. 판별할 수 없으면 default."""
+    fmt = sniff_image_format(data)
+    return MIME_TYPES.get(fmt, default)
+
+
+def preprocess_image_bytes(
+    data: bytes,
+    max_edge: Optional[int] = None,
+    output_format: str = "jpeg",
+    quality: int = 85,
+) -> Tuple[bytes, str]:
+    """
+    이미지 바이트를 업로드용으로 변환한다.
+
+    Args:
+        data: 원본 이미지 바이트
+        max_edge: 긴 변의 최대 픽셀 수. None이면 크기를 바꾸지 않고 MIME만 교정.
+        output_format: 축소가 필요할 때 다시 인코딩할 포맷 ("jpeg" / "webp" / "png")
+        quality: JPEG/WEBP 품질
+
+    Returns:
+        (업로드할 바이트, MIME 타입)
+    """
+    if not max_edge:
+        return data, mime_type_of(data)
+
+    with Image.open(io.BytesIO(data)) as img:
+        if max(img.size) <= max_edge:
+            # 이미 충분히 작으면 재인코딩 손실 없이 원본 그대로 보낸다.
+            return data, mime_type_of(data)
+
+        # JPEG은 DCT 축소 디코딩(draft)으로 필요한 해상도 근처까지만 디코드한다.
+        if img.format == "JPEG":
+            scale = max_edge / max(img.size)
+            img.draft("RGB", (int(img.width * scale), int(img.height * scale)))
+
+        # 휴대폰 사진의 EXIF 회전 정보는 재인코딩 시 사라지므로 픽셀에 반영해 둔다.
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        if output_format == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif output_format == "webp" and img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+        buf = io.BytesIO()
+        save_kwargs = {"optimize": True}
+        if output_format in ("jpeg", "webp"):
+            save_kwargs["quality"] = quality
+        img.save(buf, format=_PIL_FORMATS[output_format], **save_kwargs)
+
+    return buf.getvalue(), MIME_TYPES[output_format]
+
+
+def prepare_image(
+    path: str,
+    max_edge: Optional[int] = None,
+    output_format: str = "jpeg",
+    quality: int = 85,
+) -> Tuple[bytes, str]:
+    """
+    파일을 읽어 preprocess_image_bytes를 적용한 결과를 반환한다. (파일별 메모이즈)
+    파일이 바뀌면(mtime/크기 변경) 다시 처리한다.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, max_edge, output_format, quality)
+
+    with _memo_lock:
+        cached = _memo.get(key)
+        if cached is not None:
+            _memo.move_to_end(key)
+            return cached
+
+    with open(path, "rb") as f:
+        data = f.read()
+    result = preprocess_image_bytes(data, max_edge=max_edge, output_format=output_format, quality=quality)
+
+    with _memo_lock:
+        _memo[key] = result
+        while len(_memo) > _MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+    return result
@@ -0,0 +1,213 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import config
+
+# 지연 시간 히스토그램 버킷 (초). 가구 수 세기(~1s)부터 이미지 생성(~20s+)까지 포함.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+# 라벨 조합 (kind, stage, model, outcome)
+_LabelKey = Tuple[str, str, str, str]
+
+
+class MetricsRecorder:
+    """
+    모델 호출/파일 쓰기 한 건마다 기록을 남기는 수집기. (스레드 안전)
+
+    - records: 최근 기록 (JSONL 내보내기용, 최대 config.METRICS_MAX_RECORDS 건)
+    - 누적 집계: Prometheus 텍스트 포맷용 (기록이 잘려나가도 누적값은 유지)
+    """
+
+    def __init__(self, max_records: int = 10000):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=max_records)
+        self._series: Dict[_LabelKey, Dict[str, Any]] = {}
+
+    def record(
+        self,
+        kind: str,
+        stage: str,
+        model: Optional[str] = None,
+        latency: float = 0.0,
+        upload_bytes: int = 0,
+        download_bytes: int = 0,
+        prompt_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        total_tokens: Optional[int] = None,
+        outcome: str = "ok",
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        """
+        기록 한 건을 추가한다.
+
+        Args:
+            kind: "model_call" 또는 "file_write"
+            stage: 파이프라인 단계 이름 (select, report, style, edit_add, view, ...)
+            outcome: "ok" 또는 오류 종류 (예: "error:RetryExhaustedError")
+        """
+        entry = {
+            "ts": time.time(),
+            "kind": kind,
+            "stage": stage,
+            "model": model,
+            "latency_s": latency,
+            "upload_bytes": upload_bytes,
+            "download_bytes": download_bytes,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "outcome": outcome,
+        }
+        entry.update(extra)
+
+        key = (kind, stage, model or "", outcome)
+        with self._lock:
+            self._records.append(entry)
+            series = self._series.get(key)
+            if series is None:
+                series = {
+                    "count": 0,
+                    "latency_sum": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                    "upload_bytes": 0,
+                    "download_bytes": 0,
+                    "prompt_tokens": 0,
+                    "output_tokens": 0,
+                }
+                self._series[key] = series
+            series["count"] += 1
+            series["latency_sum"] += latency
+            for idx, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    series["buckets"][idx] += 1
+            series["upload_bytes"] += upload_bytes
+            series["download_bytes"] += download_bytes
+            series["prompt_tokens"] += prompt_tokens or 0
+            series["output_tokens"] += output_tokens or 0
+        return entry
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._records)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """지금까지의 기록을 꺼내고 비운다. (누적 집계는 유지)"""
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+        return records
+
+    def write_jsonl(self, path: str, records: Optional[Iterable[Dict[str, Any]]] = None) -> int:
+        """기록을 JSONL로 추가 저장하고 저장한 건수를 반환한다."""
+        records = self.records() if records is None else list(records)
+        with open(path, "a", encoding="utf-8") as f:
+            for entry in records:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return len(records)
+
+    def prometheus_text(self) -> str:
+        """누적 집계를 Prometheus 텍스트 포맷(0.0.4)으로 만든다."""
+        with self._lock:
+            series = {key: {**value, "buckets": list(value["buckets"])} for key, value in self._series.items()}
+
+        lines = [
+            "# HELP pe3r_latency_seconds Latency of model calls and file writes.",
+            "# TYPE pe3r_latency_seconds histogram",
+        ]
+        for key in sorted(series):
+            labels = _labels(key)
+            value = series[key]
+            for bound, count in zip(LATENCY_BUCKETS, value["buckets"]):
+                lines.append(f'pe3r_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'pe3r_latency_seconds_bucket{{{labels},le="+Inf"}} {value["count"]}')
+            lines.append(f"pe3r_latency_seconds_sum{{{labels}}} {value['latency_sum']}")
+            lines.append(f"pe3r_latency_seconds_count{{{labels}}} {value['count']}")
+
+        counters = [
+            ("pe3r_upload_bytes_total", "upload_bytes", "Bytes sent to the model or written to disk."),
+            ("pe3r_download_bytes_total", "download_bytes", "Bytes received from the model."),
+            ("pe3r_prompt_tokens_total", "prompt_tokens", "Prompt tokens reported by usage_metadata."),
+            ("pe3r_output_tokens_total", "output_tokens", "Output tokens reported by usage_metadata."),
+        ]
+        for name, field, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key in sorted(series):
+                lines.append(f"{name}{{{_labels(key)}}} {series[key][field]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """node_exporter textfile collector 등에서 읽을 수 있도록 파일로 저장."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: _LabelKey) -> str:
+    kind, stage, model, outcome = key
+    return f'kind="{_escape(kind)}",stage="{_escape(stage)}",model="{_escape(model)}",outcome="{_escape(outcome)}"'
+
+
+_recorder: Optional[MetricsRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRecorder:
+    """프로세스 전체에서 공유하는 수집기."""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = MetricsRecorder(max_records=config.METRICS_MAX_RECORDS)
+    return _recorder
+
+
+def record(kind: str, stage: str, **values: Any) -> None:
+    """config.METRICS_ENABLED일 때만 기록한다."""
+    if config.METRICS_ENABLED:
+        get_metrics().record(kind, stage, **values)
+
+
+def flush_metrics(jsonl_path: str, prom_path: Optional[str] = None) -> int:
+    """
+    이번 실행의 기록을 JSONL에 추가하고(기록은 비움), prom_path가 있으면 Prometheus 텍스트 파일도 쓴다.
+    저장한 건수를 반환한다.
+    """
+    if not config.METRICS_ENABLED:
+        return 0
+    recorder = get_metrics()
+    count = recorder.write_jsonl(jsonl_path, recorder.drain())
+    if prom_path:
+        recorder.write_prometheus(prom_path)
+    return count
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """GET /metrics 로 Prometheus 텍스트를 제공하는 서버를 백그라운드 스레드로 띄운다."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
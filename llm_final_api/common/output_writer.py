@@ -0,0 +1,73 @@
+import io
+import os
+from typing import Optional
+
+from PIL import Image
+
+import config
+from common.image_preprocess import sniff_image_format
+from common.workspace import Workspace
+
+# 결과 이미지 저장 정책 (config.OUTPUT_FORMAT_POLICY)
+# - "native": 모델이 돌려준 바이트를 그대로 저장 (디코드/재인코딩 없음)
+# - "match_extension": 실제 포맷이 파일 확장자와 다를 때만 확장자 포맷으로 변환
+POLICY_NATIVE = "native"
+POLICY_MATCH_EXTENSION = "match_extension"
+
+_EXTENSION_FORMATS = {
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".png": "png",
+    ".webp": "webp",
+    ".gif": "gif",
+}
+
+_PIL_FORMATS = {
+    "jpeg": "JPEG",
+    "png": "PNG",
+    "webp": "WEBP",
+    "gif": "GIF",
+}
+
+
+def _transcode(data: bytes, target_format: str) -> bytes:
+    img = Image.open(io.BytesIO(data))
+    if target_format == "jpeg" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format=_PIL_FORMATS[target_format], quality=config.UPLOAD_QUALITY)
+    return buffer.getvalue()
+
+
+def write_image(workspace: Workspace, name: str, data: bytes, policy: Optional[str] = None) -> str:
+    """
+    모델이 돌려준 이미지 바이트를 워크스페이스에 원자적으로 저장하고 경로를 반환한다.
+    변환은 policy가 "match_extension"이고 실제 포맷이 확장자와 다를 때만 한다.
+    (포맷 판별은 매직 바이트만 보므로 디코드 비용이 없다)
+    """
+    policy = policy or config.OUTPUT_FORMAT_POLICY
+    if policy == POLICY_MATCH_EXTENSION:
+        wanted = _EXTENSION_FORMATS.get(os.path.splitext(name)[1].lower())
+        actual = sniff_image_format(data)
+        if wanted is not None and actual != wanted:
+            data = _transcode(data, wanted)
+    elif policy != POLICY_NATIVE:
+        raise ValueError(f"알 수 없는 출력 포맷 정책: {policy}")
+    return workspace.write_bytes(name, data)
+
+
+def promote(workspace: Workspace, src_path: str, name: str) -> str:
+    """
+    이미 저장된 결과 파일을 다른 이름(예: img4new3r_org.png)으로도 제공한다.
+    내용을 다시 쓰지 않고 하드링크로 연결한다. (불가능하면 복사)
+    match_extension 정책이고 포맷이 확장자와 다르면 변환해서 새로 쓴다.
+    """
+    if (config.OUTPUT_FORMAT_POLICY == POLICY_MATCH_EXTENSION
+            and os.path.abspath(src_path) != os.path.abspath(workspace.path(name))):
+        wanted = _EXTENSION_FORMATS.get(os.path.splitext(name)[1].lower())
+        with open(src_path, "rb") as f:
+            head = f.read(16)
+        if wanted is not None and sniff_image_format(head) != wanted:
+            with open(src_path, "rb") as f:
+                return write_image(workspace, name, f.read())
+    return workspace.link_from(src_path, name)
@@ -0,0 +1,220 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, TypeVar
+
+import httpx
+from google.genai import errors
+
+import config
+
+T = TypeVar("T")
+
+# 재시도할 HTTP 상태 코드 (요청 한도 초과 / 일시적 서버 오류)
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+class RetryExhaustedError(RuntimeError):
+    """재시도 가능한 오류가 최대 시도 횟수까지 계속된 경우. 마지막 오류는 __cause__ 에 남는다."""
+
+
+class TokenBucket:
+    """
+    분당 한도(rate_per_minute)를 가진 토큰 버킷.
+    reserve()는 필요한 양을 먼저 차감(음수 잔고 허용)하고 기다려야 할 시간을 돌려주므로,
+    여러 스레드가 동시에 요청해도 먼저 예약한 순서대로 한도 안에서 분산된다.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """amount 만큼 예약하고, 한도를 지키기 위해 기다려야 할 시간(초)을 반환한다."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # 한 번에 버킷 용량보다 큰 요청은 용량만큼만 차감 (영원히 기다리지 않도록)
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate_per_second
+
+    def adjust(self, delta: float) -> None:
+        """예약했던 양과 실제 사용량의 차이(delta = 실제 - 예약)를 반영한다."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class ModelRateLimiter:
+    """모델 하나의 RPM/TPM 버킷과 대기/호출 시간 카운터."""
+
+    def __init__(self, model_name: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.model_name = model_name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,             # 성공한 호출 수
+            "attempts": 0,          # 실제로 보낸 요청 수 (재시도 포함)
+            "retries": 0,
+            "failures": 0,          # 최종 실패 수
+            "wait_seconds": 0.0,    # RPM/TPM 한도 때문에 기다린 시간
+            "backoff_seconds": 0.0, # 재시도 전 백오프로 기다린 시간
+            "call_seconds": 0.0,    # 실제 모델 호출에 걸린 시간
+            "tokens_estimated": 0,
+            "tokens_reported": 0,   # usage_metadata 기준 실제 토큰 수
+        }
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """요청 1건 + 예상 토큰을 예약하고 필요한 만큼 기다린다. 기다린 시간(초)을 반환."""
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if wait > 0:
+            time.sleep(wait)
+        self.record(wait_seconds=wait, tokens_estimated=estimated_tokens)
+        return wait
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """응답의 실제 토큰 수가 있으면 예약량과의 차이를 TPM 버킷에 반영한다."""
+        if actual_tokens is None:
+            return
+        if self.tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+        self.record(tokens_reported=actual_tokens)
+
+    def record(self, **values) -> None:
+        """호출 통계(attempts, calls, failures, call_seconds 등)에 값을 더한다. (스레드 안전)"""
+        with self._lock:
+            for name, value in values.items():
+                self._stats[name] += value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str) -> ModelRateLimiter:
+    """모델별 리미터를 프로세스 전체에서 하나씩 공유한다. (한도는 config.MODEL_RATE_LIMITS)"""
+    limiter = _limiters.get(model_name)
+    if limiter is not None:
+        return limiter
+
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limits = config.MODEL_RATE_LIMITS.get(model_name) or {}
+            limiter = ModelRateLimiter(model_name, rpm=limits.get("rpm"), tpm=limits.get("tpm"))
+            _limiters[model_name] = limiter
+    return limiter
+
+
+def get_rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """모델별 카운터 스냅샷. 예) {"gemini-2.5-flash": {"calls": 4, "wait_seconds": 0.0, ...}}"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.model_name: limiter.stats() for limiter in limiters}
+
+
+def estimate_tokens(contents: Iterable[Any]) -> int:
+    """요청 전 TPM 예약용 대략적인 토큰 수. (이미지 1장당 고정값 + 텍스트 길이 기준)"""
+    total = 0
+    for item in contents:
+        if isinstance(item, str):
+            # 한글 위주 프롬프트라 글자 2개당 1토큰 정도로 넉넉히 잡는다.
+            total += len(item) // 2 + 1
+        elif getattr(item, "inline_data", None) is not None or getattr(item, "file_data", None) is not None:
+            total += config.RATE_LIMIT_IMAGE_TOKENS
+        else:
+            text = getattr(item, "text", None)
+            if text:
+                total += len(text) // 2 + 1
+    return total
+
+
+def reported_tokens(response) -> Optional[int]:
+    """응답의 usage_metadata.total_token_count (없으면 None)."""
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage is not None else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """요청 한도 초과(429), 일시적 서버 오류(5xx), 네트워크 오류만 재시도 대상으로 본다."""
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def _retry_after_seconds(exc: BaseException) -> float:
+    # 서버가 Retry-After 헤더로 기다릴 시간을 알려주면 그 이상 기다린다.
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return 0.0
+    try:
+        return float(headers.get("retry-after", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def backoff_delay(attempt: int) -> float:
+    """지수 백오프 + full jitter: [0, min(최대값, 기본값 * 2^(attempt-1))] 구간에서 무작위."""
+    ceiling = min(config.RETRY_MAX_DELAY, config.RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+def wait_before_retry(limiter: ModelRateLimiter, exc: BaseException, attempt: int, max_attempts: int) -> None:
+    """재시도 가능 오류면 백오프만큼 기다리고, 아니면(또는 시도 횟수 소진 시) 예외를 올린다."""
+    if not is_retryable(exc):
+        limiter.record(failures=1)
+        raise exc
+    if attempt >= max_attempts:
+        limiter.record(failures=1)
+        raise RetryExhaustedError(f"{limiter.model_name}: {max_attempts}회 시도 후 실패 ({exc})") from exc
+
+    delay = max(backoff_delay(attempt), _retry_after_seconds(exc))
+    print(f"  [{limiter.model_name}] 일시적 오류로 {delay:.1f}s 후 재시도 ({attempt}/{max_attempts - 1}): {exc}")
+    limiter.record(retries=1, backoff_seconds=delay)
+    time.sleep(delay)
+
+
+def call_with_limits(model_name: str, fn: Callable[[], T], estimated_tokens: int = 0, max_attempts: Optional[int] = None) -> T:
+    """
+    모델 호출 fn()을 RPM/TPM 한도 안에서 실행하고, 재시도 가능한 오류는 백오프 후 다시 시도한다.
+
+    Raises:
+        RetryExhaustedError: 재시도 가능한 오류가 max_attempts번 계속된 경우
+        그 외 예외: 재시도 대상이 아닌 오류는 그대로 올린다.
+    """
+    limiter = get_rate_limiter(model_name)
+    max_attempts = max(1, max_attempts or config.RETRY_MAX_ATTEMPTS)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        limiter.acquire(estimated_tokens)
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            limiter.record(attempts=1, call_seconds=time.perf_counter() - start)
+            wait_before_retry(limiter, e, attempt, max_attempts)
+            continue
+
+        limiter.record(attempts=1, calls=1, call_seconds=time.perf_counter() - start)
+        limiter.settle(estimated_tokens, reported_tokens(result))
+        return result
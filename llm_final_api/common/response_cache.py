@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+import config
+
+# Gemini 응답을 디스크에 저장해 두는 내용 주소 기반(content-addressed) 캐시.
+# 키 = sha256(모델명 + 입력 이미지 바이트 + 프롬프트 + 생성 설정) 이므로,
+# 같은 입력으로 다시 실행하면 모델을 부르지 않고 저장된 응답(텍스트/이미지 바이트)을 돌려준다.
+
+
+def make_cache_key(
+    model_name: str,
+    images: Union[bytes, Iterable[bytes], None],
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]] = None,
+) -> str:
+    """모델명, 입력 이미지 바이트, 프롬프트, 생성 설정으로 캐시 키(hex)를 만든다."""
+    if images is None:
+        images = []
+    elif isinstance(images, (bytes, bytearray)):
+        images = [images]
+
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    for img in images:
+        # 이미지 경계가 섞이지 않도록 각 이미지의 해시를 넣는다.
+        h.update(b"\x00img")
+        h.update(hashlib.sha256(img).digest())
+    h.update(b"\x00prompt")
+    h.update(prompt.encode("utf-8"))
+    h.update(b"\x00config")
+    h.update(json.dumps(generation_config or {}, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    크기 제한이 있는 LRU 디스크 캐시.
+
+    - 항목 하나 = 파일 하나 (<cache_dir>/<키 앞 2글자>/<키>)
+    - 총 크기가 max_bytes를 넘으면 가장 오래 쓰이지 않은 항목부터 삭제
+    - 접근 순서는 파일 mtime으로도 남기므로, 프로세스를 다시 띄워도 LRU 순서가 유지된다
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size (오래된 것부터)
+        self._total_bytes = 0
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _load_index(self) -> None:
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name, st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        # 파일 읽기는 잠금 밖에서 (느린 읽기 하나가 다른 스레드의 캐시 접근을 막지 않도록)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = None
+
+        with self._lock:
+            if data is None:
+                # 다른 프로세스의 삭제/수동 정리 등으로 파일이 없어진 항목은 크기 합계에서도 뺀다.
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if key not in self._index:
+                # 다른 프로세스가 넣은 항목
+                self._index[key] = len(data)
+                self._total_bytes += len(data)
+            self._index.move_to_end(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # 임시 파일에 쓴 뒤 rename 하여, 쓰는 도중의 파일을 다른 프로세스가 읽지 않도록 한다.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            old_size = self._index.pop(key, None)
+            if old_size is not None:
+                self._total_bytes -= old_size
+            self._index[key] = len(value)
+            self._total_bytes += len(value)
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """config 설정으로 프로세스 공유 캐시를 만든다. 비활성화 상태면 None."""
+    global _cache
+    if not config.RESPONSE_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(config.RESPONSE_CACHE_DIR, config.RESPONSE_CACHE_MAX_BYTES)
+    return _cache
+
+
+def cached_call(
+    model_name: str,
+    images: Union[bytes, Iterable[bytes], None],
+    prompt: str,
+    generation_config: Optional[Dict[str, Any]],
+    compute: Callable[[], bytes],
+    use_cache: bool = True,
+) -> bytes:
+    """
+    캐시에 같은 요청의 응답이 있으면 그것을, 없으면 compute()로 모델을 호출해 저장 후 반환한다.
+    응답은 bytes로 저장되므로 텍스트 응답은 호출 측에서 utf-8로 인코딩/디코딩한다.
+    """
+    cache = get_response_cache() if use_cache else None
+    if cache is None:
+        return compute()
+
+    key = make_cache_key(model_name, images, prompt, generation_config)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    data = compute()
+    # 빈 응답은 저장하지 않는다. (다음 실행에서 다시 시도)
+    if data:
+        cache.put(key, data)
+    return data
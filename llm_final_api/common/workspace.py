@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, Optional
+
+import config
+from common.metrics import flush_metrics, record as record_metric
+
+
+class Workspace:
+    """
+    한 파이프라인(세션)의 결과 파일을 모아두는 디렉토리.
+
+    selected_input_image.jpg, parsed_report.json, modified_*.jpg, img4new3r_*.png 같은
+    고정 파일 이름은 그대로 두고, 저장 위치만 세션마다 분리해서
+    한 호스트에서 여러 파이프라인이 서로의 파일을 덮어쓰지 않고 동시에 돌 수 있게 한다.
+    모든 쓰기는 같은 디렉토리의 임시 파일에 쓴 뒤 os.replace로 교체(원자적)하므로,
+    다른 프로세스가 반쯤 쓰인 파일을 읽는 일이 없다.
+    """
+
+    def __init__(self, root: str = ".", session_id: Optional[str] = None):
+        self.root = root
+        self.session_id = session_id
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"Workspace({self.root!r})"
+
+    def path(self, name: str) -> str:
+        """세션 디렉토리 안의 파일 경로. (절대 경로를 주면 그대로 사용)"""
+        return os.path.join(self.root, name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def write_bytes(self, name: str, data: bytes, label: Optional[str] = None) -> str:
+        """
+        data를 원자적으로 저장하고 경로를 반환한다.
+        label: metrics 단계 라벨 (None이면 파일 이름. 이름이 매번 달라지는 파일은 고정 라벨을 줄 것)
+        """
+        target = self.path(name)
+        start = time.perf_counter()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target) or ".", prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)  # mkstemp 기본 권한(0600) 대신 일반 파일 권한
+            os.replace(tmp_path, target)
+        except BaseException as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._record_write(label or name, start, len(data), e)
+            raise
+        self._record_write(label or name, start, len(data))
+        return target
+
+    def write_text(self, name: str, text: str, label: Optional[str] = None) -> str:
+        return self.write_bytes(name, text.encode("utf-8"), label=label)
+
+    def write_json(self, name: str, data: Any, label: Optional[str] = None) -> str:
+        return self.write_text(name, json.dumps(data, ensure_ascii=False, indent=4), label=label)
+
+    def read_json(self, name: str) -> Any:
+        path = self.path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"JSON 파일을 찾을 수 없습니다: {path}")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def copy_from(self, src_path: str, name: str) -> str:
+        """다른 파일을 세션 안의 name으로 원자적으로 복사한다."""
+        target = self.path(name)
+        if os.path.abspath(src_path) == os.path.abspath(target):
+            return target
+        start = time.perf_counter()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target) or ".", prefix=".tmp_")
+        os.close(fd)
+        try:
+            shutil.copyfile(src_path, tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, target)
+        except BaseException as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._record_write(name, start, 0, e)
+            raise
+        self._record_write(name, start, os.path.getsize(target))
+        return target
+
+    def link_from(self, src_path: str, name: str) -> str:
+        """
+        다른 파일을 세션 안의 name으로 내용 복사 없이 연결한다. (하드링크 + os.replace, 원자적)
+        모든 쓰기가 임시 파일 교체 방식이라 원본이 나중에 바뀌어도 링크된 파일은 영향받지 않는다.
+        하드링크를 만들 수 없으면(다른 파일 시스템 등) copy_from으로 대체한다.
+        """
+        target = self.path(name)
+        if os.path.abspath(src_path) == os.path.abspath(target):
+            return target
+        start = time.perf_counter()
+        tmp_path = os.path.join(os.path.dirname(target) or ".", f".tmp_link_{uuid.uuid4().hex}")
+        try:
+            os.link(src_path, tmp_path)
+            os.replace(tmp_path, target)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return self.copy_from(src_path, name)
+        self._record_write(name, start, 0)
+        return target
+
+    def save_metrics(self) -> int:
+        """이번 실행의 metrics 기록을 metrics.jsonl(추가)과 metrics.prom(Prometheus 텍스트)으로 저장."""
+        return flush_metrics(self.path(config.METRICS_JSONL_PATH), self.path(config.METRICS_PROM_PATH))
+
+    def _record_write(self, name: str, start: float, size: int, error: Optional[BaseException] = None) -> None:
+        # 파일 이름을 단계 라벨로 사용 (고정 파일 이름이라 라벨 종류가 늘어나지 않음)
+        record_metric(
+            "file_write",
+            os.path.basename(name),
+            latency=time.perf_counter() - start,
+            upload_bytes=size,
+            outcome="ok" if error is None else f"error:{type(error).__name__}",
+            session=self.session_id,
+        )
+
+
+def create_session(session_id: Optional[str] = None, base_dir: Optional[str] = None) -> Workspace:
+    """
+    config.SESSIONS_DIR/<session_id>/ 워크스페이스를 만든다. (이미 있으면 그대로 사용)
+    session_id를 주지 않으면 새 ID를 발급한다.
+    """
+    session_id = session_id or uuid.uuid4().hex[:12]
+    return Workspace(os.path.join(base_dir or config.SESSIONS_DIR, session_id), session_id=session_id)
+
+
+def resolve_workspace(workspace: Optional[Workspace]) -> Workspace:
+    """workspace가 None이면 기존 동작대로 현재 디렉토리를 사용한다."""
+    return workspace if workspace is not None else Workspace(".")
+
+
+def workspace_from_args(session_id: Optional[str]) -> Workspace:
+    """main_*.py의 --session 인자 처리: 주면 세션 디렉토리, 없으면 현재 디렉토리."""
+    if session_id:
+        workspace = create_session(session_id)
+        print(f"세션 워크스페이스: {workspace.root}")
+        return workspace
+    return Workspace(".")
@@ -7,6 +7,93 @@ INITIAL_IMAGE_PATHS = [
     "C:/SW 지능정보 아카데미/PE3R/이미지/my3_angle/-30degree.png"
 ]
 
+# 캡처 프레임이 모여 있는 디렉토리. 지정하면 INITIAL_IMAGE_PATHS 대신 이 안의 모든 이미지(N장)를 후보로 사용.
+INITIAL_IMAGE_DIR = None
+
+# 최적 이미지 선택 시 동시에 보낼 최대 분석 요청 수
+SELECT_MAX_CONCURRENCY = 4
+
+# 최적 이미지 선택 전 로컬 사전 필터 (report/utils/image_prefilter.py, API 호출 없음)
+# 흐린 프레임, 노출이 날아간 프레임, 거의 같은 프레임을 빼고 품질 상위 PREFILTER_TOP_K장만 모델에 보낸다.
+SELECT_PREFILTER_ENABLED = True
+PREFILTER_TOP_K = 4              # 0 또는 None이면 개수 제한 없음
+PREFILTER_SIZE = 256             # 분석용으로 줄일 긴 변 픽셀 수
+PREFILTER_BLUR_RATIO = 0.3       # 가장 선명한 후보 대비 선명도(라플라시안 분산)가 이 비율 미만이면 제외
+PREFILTER_MAX_CLIPPED = 0.5      # 거의 검정/흰색 픽셀 비율이 이보다 크면 제외
+PREFILTER_DUP_DISTANCE = 5       # dHash 해밍 거리(64비트 중)가 이 값 이하이면 중복으로 보고 제외
+
+# 리포트 응답이 템플릿 끝(## 정리)까지 왔는지 확인한 뒤 파싱할지 여부
+REPORT_READY_CHECK = True
+
+# 최적 이미지 선택과 리포트 작성을 한 번의 호출로 처리할지 여부
+# (후보 이미지를 모두 한 요청에 담아 보내고, 응답 첫 줄 "# 선택한 이미지: {번호}"로 선택 결과를 받음)
+# 후보가 REPORT_COMBINED_MAX_IMAGES장보다 많으면 요청이 너무 커지므로 기존 방식 사용. 스트리밍 모드보다 우선.
+REPORT_COMBINED_SELECT = False
+REPORT_COMBINED_MAX_IMAGES = 6
+
+# 리포트를 스트리밍으로 받아 섹션이 완성될 때마다 parsed_report_events.jsonl 에 기록할지 여부
+REPORT_STREAMING = False
+
+# 리포트 응답 형식
+# "markdown": 템플릿(report_prompt)을 채운 텍스트를 받아 정규식 파서로 parsed_report.json 생성 (기존 방식)
+# "json": response_mime_type="application/json" + 응답 스키마(report/report_schema.py)로 parsed_report.json 과
+#         같은 구조의 JSON을 받아 그대로 사용하고, report_analysis_result.txt 는 로컬에서 템플릿 형식으로 만든다.
+#         JSON이 깨졌으면 템플릿 모드로 한 번 더 요청한다. 스트리밍(REPORT_STREAMING)은 템플릿 모드에서만 동작.
+REPORT_OUTPUT_MODE = "markdown"
+
+# 파싱된 리포트에 빠진 섹션(키가 없거나 빈 값)이 있으면, 전체를 다시 받지 않고 그 섹션만 텍스트 전용 요청으로
+# 다시 받아 합칠지 여부 (report/report_repair.py). 이미지 업로드 없이 이전 리포트를 맥락으로 보낸다.
+# 켜져 있으면 잘린 응답도 바로 실패로 보지 않고, 보정한 뒤에 REPORT_READY_CHECK 를 적용한다.
+REPORT_REPAIR_ENABLED = True
+REPORT_REPAIR_MAX_ATTEMPTS = 1   # 보정 요청 최대 횟수 (매번 아직 빠진 섹션만 요청)
+
+# 부분 수정(main_modify_looks)에서 추가/제거/변경 중 2개 이상을 켰을 때 한 번의 이미지 호출로 합쳐서 적용할지 여부
+# user_choice.json 의 "fused": true/false 로 실행마다 덮어쓸 수 있음. 실패 시 단계별 편집으로 대체.
+FUSED_EDIT_MODE = False
+
+# 부분 수정에서 단계별 중간 결과(modified_add.jpg 등)도 파일로 남길지 여부
+# 단계 사이의 이미지는 메모리로 넘기므로, 디버깅할 때만 켜면 된다. (최종본/좌우 이미지는 항상 저장)
+SAVE_EDIT_INTERMEDIATES = False
+
+# 부분 수정 편집 체인 저장소 (edit/edit_chain_store.py)
+# (기준 이미지, 적용한 지시문 목록) 별 중간 결과를 세션의 edit_chain/ 에 저장해서, 선택을 바꿔 다시 실행할 때
+# 앞부분이 같은 단계는 다시 호출하지 않는다. 기준 이미지도 고정되어 이전 수정 결과 위에 편집이 쌓이지 않는다.
+EDIT_CHAIN_STORE_ENABLED = True
+EDIT_CHAIN_STORE_MAX_ENTRIES = 32  # 세션당 보관할 중간 결과 수 (오래 안 쓴 것부터 삭제)
+
+# 리포트 직후 예상 스타일(AI 추천 → 나머지 추천 → PREGEN_POPULAR_STYLES 순)의 스타일 변경 이미지를
+# 백그라운드에서 미리 생성해 두고(style/style_pregen.py), main_new_looks 에서 선택이 맞으면 바로 사용할지 여부
+PREGEN_ENABLED = False
+PREGEN_MAX_STYLES = 2            # 리포트 1건당 미리 생성할 최대 스타일 수 (이미지 호출 비용 상한)
+PREGEN_MAX_CONCURRENCY = 2
+PREGEN_POPULAR_STYLES = []       # 예: ["모던 (Modern Interior)", "북유럽 (Scandinavian)"]
+PREGEN_WAIT_SECONDS = 30.0       # 선택한 스타일이 생성 중이면 기다릴 최대 시간 (초)
+PREGEN_PENDING_TTL = 180.0       # 이보다 오래된 '생성 중' 표시는 중단된 것으로 보고 무시 (초)
+
+# 측면 뷰(좌/우) 결과 검사 (common/image_header.py, 헤더만 읽고 디코드하지 않음)
+# 빈 응답, 잘린 파일, 가로세로 비율이 입력(EXIF 회전 반영)과도, 입력에 가장 가까운 모델 출력 크기와도
+# VIEW_ASPECT_TOLERANCE(상대값) 넘게 다른 결과는 해당 방향만 VIEW_REGEN_MAX_RETRIES 번까지 다시 생성한다.
+VIEW_ASPECT_TOLERANCE = 0.02
+VIEW_REGEN_MAX_RETRIES = 2
+# 이미지 모델이 돌려주는 출력 크기 (가로, 세로). 입력 비율 그대로가 아니라 이 중 가장 가까운 크기로 그린다.
+# (예: 4:3 입력 -> 1184x864, 4:3과 약 2.8% 차이)
+VIEW_OUTPUT_SIZES = [
+    (1024, 1024),
+    (832, 1248), (1248, 832),
+    (864, 1184), (1184, 864),
+    (896, 1152), (1152, 896),
+    (768, 1344), (1344, 768),
+    (1536, 672),
+]
+
+# --session <ID> 로 실행할 때 세션별 결과 디렉토리(sessions/<ID>/)를 만들 위치
+SESSIONS_DIR = "sessions"
+
+# main_service.py (상주 HTTP 서비스) 기본 주소와 메모리에 보관할 세션별 parsed_report 개수
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8080
+SERVICE_MAX_SESSIONS = 256
+
 # 3장 중 AI가 선택한 '최적 이미지'가 임시로 저장될 경로
 # 이후 모든 프로세스(Report, Style)는 이 경로를 사용합니다.
 SELECTED_IMAGE_PATH = "selected_input_image.jpg"
@@ -16,3 +103,59 @@ SELECTED_IMAGE_PATH = "selected_input_image.jpg"
 
 REPORT_MODEL = "gemini-2.5-flash" # 리포트 생성 모델
 STYLE_MODEL = "gemini-2.5-flash-image"  # 이미지 출력 모델
+
+# 모델별 호출 한도 (프로세스 전체 공유). rpm: 분당 요청 수, tpm: 분당 토큰 수. 없으면 제한 없음.
+# 프로젝트 등급(tier)에 맞게 조정. Files API 업로드는 FILE_UPLOAD_LIMIT_KEY 키로 한도를 줄 수 있음.
+MODEL_RATE_LIMITS = {
+    REPORT_MODEL: {"rpm": 1000, "tpm": 1_000_000},
+    STYLE_MODEL: {"rpm": 500, "tpm": 500_000},
+}
+# TPM 예약 시 이미지 1장을 몇 토큰으로 볼지 (실제 사용량은 응답의 usage_metadata로 보정)
+RATE_LIMIT_IMAGE_TOKENS = 1290
+
+# 429/5xx/네트워크 오류 재시도 (지수 백오프 + full jitter)
+RETRY_MAX_ATTEMPTS = 5     # 최초 호출 포함 최대 시도 횟수
+RETRY_BASE_DELAY = 1.0     # 초
+RETRY_MAX_DELAY = 30.0     # 초
+
+# GenAI 엔드포인트 주소. None이면 SDK 기본값(Google API)을 사용.
+# 로컬 스텁 서버(bench/fake_gemini.py)로 테스트할 때 "http://127.0.0.1:8765" 처럼 지정.
+GENAI_BASE_URL = None
+
+# Gemini 응답 디스크 캐시 (모델명 + 입력 이미지 + 프롬프트 + 생성 설정이 같으면 재사용)
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_DIR = ".genai_cache"
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB 초과 시 LRU 삭제
+# 스타일 변경(temperature=1.0) 호출은 매번 다른 결과를 원하므로 기본적으로 캐시하지 않음
+CACHE_STYLE_CALLS = False
+
+# 업로드 전 이미지 전처리 (긴 변 최대 픽셀, None이면 원본 해상도 유지하고 MIME만 교정)
+# 가구 개수 세기/리포트는 고해상도가 필요 없으므로 줄여서 보내고,
+# 스타일 변경/편집/측면 뷰 생성은 출력 품질과 비율 유지를 위해 원본을 그대로 보낸다.
+UPLOAD_MAX_EDGE_SELECT = 768
+UPLOAD_MAX_EDGE_REPORT = 1536
+UPLOAD_MAX_EDGE_EDIT = None
+UPLOAD_FORMAT = "jpeg"
+UPLOAD_QUALITY = 85
+
+# 이미지를 요청마다 인라인(base64)으로 싣지 않고 Files API로 한 번 올린 뒤 URI로 참조 (common/image_handles.py)
+# 이미지 1장당 업로드 요청이 한 번 더 생기므로, 같은 이미지를 여러 번 보내는 경우에 이득이다.
+# (측면 뷰 좌/우, 뷰 재생성, 상주 서비스에서 같은 세션의 반복 요청 등)
+USE_FILE_HANDLES = False
+FILE_HANDLE_MIN_BYTES = 256 * 1024    # 이보다 작은 이미지는 그냥 인라인으로 보냄
+FILE_HANDLE_REFRESH_MARGIN = 600.0    # 만료까지 남은 시간이 이보다 짧은 핸들은 다시 올림 (초, 파일 보관 기간은 48시간)
+FILE_HANDLE_MAX_ENTRIES = 256         # 프로세스에서 기억할 최대 핸들 수
+FILE_UPLOAD_LIMIT_KEY = "files"       # 업로드 호출의 한도/재시도/통계를 묶는 rate_limiter 키 (모델 호출과 별도)
+
+# 결과 이미지 저장 정책 (common/output_writer.py)
+# "native": 모델이 돌려준 바이트를 그대로 저장 (디코드/재인코딩 없음, 파일 내용과 확장자가 다를 수 있음)
+# "match_extension": 실제 포맷이 확장자(.png/.jpg)와 다를 때만 변환해서 저장
+OUTPUT_FORMAT_POLICY = "native"
+
+
+# 단계별 지연 시간/바이트/토큰 수집 (common/metrics.py)
+# 실행이 끝나면 워크스페이스에 metrics.jsonl(호출 1건당 1줄, 추가 저장)과 metrics.prom(Prometheus 텍스트)을 남긴다.
+METRICS_ENABLED = True
+METRICS_MAX_RECORDS = 10000
+METRICS_JSONL_PATH = "metrics.jsonl"
+METRICS_PROM_PATH = "metrics.prom"
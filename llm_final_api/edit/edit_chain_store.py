@@ -0,0 +1,155 @@
+"""
+부분 수정(main_modify_looks) 편집 체인의 중간 결과 저장소.
+
+사용자는 user_choice.json 의 use_add / use_remove / use_change 를 바꿔 가며 여러 번 다시 실행한다.
+(기준 이미지 해시, 지금까지 적용한 편집 지시문 목록) 을 키로 각 단계의 결과를 저장해 두면,
+다시 실행할 때 앞부분이 같은 체인은 저장된 중간 결과에서 이어서 시작하고 겹치는 단계는 다시 호출하지 않는다.
+
+또한 기준 이미지를 고정(pin)한다. 이전 부분 수정 결과(img4new3r_org.png)를 다시 기준으로 쓰면
+편집이 계속 겹쳐 쌓이므로, img4new3r_org.png 가 이 저장소가 마지막으로 만든 결과와 같으면
+처음 고정한 기준 이미지에서 다시 시작한다. (스타일 변경 등으로 최종본이 바뀌었으면 그것을 새 기준으로 고정)
+
+저장 위치: <워크스페이스>/edit_chain/
+    base.png       고정된 기준 이미지
+    state.json     {"base_hash": ..., "output_hash": ...}
+    <키>.png       중간/최종 결과 (키 = sha256(기준 이미지 해시 + 지시문 목록))
+"""
+import hashlib
+import os
+from typing import List, Optional, Tuple
+
+import config
+from common.workspace import Workspace
+
+STORE_DIR = "edit_chain"
+PINNED_BASE_NAME = os.path.join(STORE_DIR, "base.png")
+STATE_NAME = os.path.join(STORE_DIR, "state.json")
+
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def chain_key(base_hash: str, instructions: List[str], model_name: str) -> str:
+    h = hashlib.sha256()
+    for part in (model_name, base_hash, *instructions):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+class EditChainStore:
+    """워크스페이스의 edit_chain/ 디렉토리에 편집 체인 중간 결과를 저장/조회한다."""
+
+    def __init__(self, workspace: Workspace, model_name: str, max_entries: Optional[int] = None):
+        self.workspace = workspace
+        self.model_name = model_name
+        self.max_entries = config.EDIT_CHAIN_STORE_MAX_ENTRIES if max_entries is None else max_entries
+        os.makedirs(workspace.path(STORE_DIR), exist_ok=True)
+
+    def _name(self, key: str) -> str:
+        return os.path.join(STORE_DIR, f"{key}.png")
+
+    def _read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(self.workspace.path(name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _state(self) -> dict:
+        try:
+            return self.workspace.read_json(STATE_NAME)
+        except (OSError, ValueError):
+            return {}
+
+    # ------ 기준 이미지 고정 ------
+
+    def resolve_base(self, org_name: str, selected_name: str) -> Tuple[str, bytes]:
+        """
+        이번 실행의 기준 이미지를 정하고 고정한다.
+
+        Returns:
+            (기준 이미지 경로, 바이트)
+
+        Raises:
+            FileNotFoundError: 최종본도 선택 이미지도 없는 경우
+        """
+        state = self._state()
+        org_bytes = self._read(org_name)
+        pinned_bytes = self._read(PINNED_BASE_NAME)
+
+        if org_bytes is not None and pinned_bytes is not None and image_hash(org_bytes) == state.get("output_hash"):
+            # 최종본이 지난 부분 수정 결과 그대로면, 그 위에 또 쌓지 않고 고정된 기준 이미지에서 다시 시작
+            print(f"\n기준 이미지: {self.workspace.path(PINNED_BASE_NAME)} (고정된 기준 이미지 사용)")
+            return self.workspace.path(PINNED_BASE_NAME), pinned_bytes
+
+        if org_bytes is not None:
+            base_name, base_bytes = org_name, org_bytes
+            print(f"\n기준 이미지: {self.workspace.path(org_name)} (이전에 생성된 최종본 사용)")
+        else:
+            base_bytes = self._read(selected_name)
+            if base_bytes is None:
+                raise FileNotFoundError("사용할 입력 이미지가 없습니다. SELECTED_IMAGE_PATH 또는 img4new3r_org.png 중 하나는 있어야 합니다.")
+            base_name = selected_name
+            print(f"\n기준 이미지: {self.workspace.path(selected_name)} (최초 선택 이미지 사용)")
+
+        # 새 기준 이미지 고정 (내용 복사 없이 하드링크)
+        self.workspace.link_from(self.workspace.path(base_name), PINNED_BASE_NAME)
+        self.workspace.write_json(STATE_NAME, {"base_hash": image_hash(base_bytes), "output_hash": None}, label="edit_chain_state")
+        return self.workspace.path(PINNED_BASE_NAME), base_bytes
+
+    def record_output(self, output_bytes: bytes) -> None:
+        """이번 실행의 최종 결과 해시를 남긴다. (다음 실행에서 최종본이 이 결과인지 판단)"""
+        state = self._state()
+        state["output_hash"] = image_hash(output_bytes)
+        self.workspace.write_json(STATE_NAME, state, label="edit_chain_state")
+
+    # ------ 중간 결과 ------
+
+    def longest_prefix(self, base_hash: str, instructions: List[str]) -> Tuple[int, Optional[bytes]]:
+        """
+        instructions 의 앞부분 중 저장된 가장 긴 것을 찾는다.
+
+        Returns:
+            (재사용할 단계 수, 그 단계까지의 결과 바이트). 없으면 (0, None)
+        """
+        for count in range(len(instructions), 0, -1):
+            data = self.get(base_hash, instructions[:count])
+            if data is not None:
+                return count, data
+        return 0, None
+
+    def get(self, base_hash: str, instructions: List[str]) -> Optional[bytes]:
+        key = chain_key(base_hash, instructions, self.model_name)
+        data = self._read(self._name(key))
+        if data is not None:
+            # 최근 사용 시각 갱신 (오래된 것부터 정리)
+            try:
+                os.utime(self.workspace.path(self._name(key)))
+            except OSError:
+                pass
+        return data
+
+    def put(self, base_hash: str, instructions: List[str], image_bytes: bytes) -> None:
+        key = chain_key(base_hash, instructions, self.model_name)
+        self.workspace.write_bytes(self._name(key), image_bytes, label="edit_chain_step")
+        self._evict()
+
+    def _evict(self) -> None:
+        directory = self.workspace.path(STORE_DIR)
+        entries = []
+        for name in os.listdir(directory):
+            if not name.endswith(".png") or os.path.join(STORE_DIR, name) == PINNED_BASE_NAME:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,72 @@
+from typing import List, Optional, Tuple
+
+
+def build_add_instruction(rec_add: dict) -> str:
+    """recommendations_add 항목 하나로 '추가' 편집 지시문을 만든다."""
+    add_item = rec_add.get("item", "")
+    add_reason = rec_add.get("reason", "")
+    return (
+        f"현재 공간의 분위기를 유지하면서, '{add_item}'를(을) 자연스럽게 추가하세요. "
+        f"{add_reason} "
+        f"추가되는 가구는 방의 크기와 기존 동선을 해치지 않도록 적절한 위치와 크기로 배치하세요."
+    )
+
+
+def build_remove_instruction(rec_remove: dict) -> str:
+    """recommendations_remove 항목 하나로 '제거' 편집 지시문을 만든다."""
+    remove_item = rec_remove.get("item", "")
+    remove_reason = rec_remove.get("reason", "")
+    return (
+        f"현재 공간에서 '{remove_item}'를(을) 제거하세요. "
+        f"{remove_reason} "
+        f"제거 후 생기는 빈 공간은 자연스럽게 보이도록 주변 가구와 조화를 이루게 하되, "
+        f"새로운 큰 가구를 추가하지는 마세요."
+    )
+
+
+def build_change_instruction(rec_change: dict) -> str:
+    """recommendations_change 항목 하나로 '변경' 편집 지시문을 만든다."""
+    from_item = rec_change.get("from_item", "")
+    to_item = rec_change.get("to_item", "")
+    change_reason = rec_change.get("reason", "")
+    return (
+        f"현재 공간에서 '{from_item}'를(을) '{to_item}'로 교체하세요. "
+        f"{change_reason} "
+        f"교체된 가구의 위치와 대략적인 크기는 기존과 비슷하게 유지하며, "
+        f"방의 전체 구조와 다른 가구, 소품은 변경하지 마세요."
+    )
+
+
+def build_edit_steps(
+    rec_add: Optional[dict],
+    rec_remove: Optional[dict],
+    rec_change: Optional[dict],
+    use_add: bool,
+    use_remove: bool,
+    use_change: bool,
+) -> List[Tuple[str, str, str]]:
+    """
+    사용자가 켠 항목만 추가 → 제거 → 변경 순서로 모아 반환한다.
+
+    Returns:
+        list: [(step_name, 편집 지시문, 로그용 대상 설명), ...]
+    """
+    steps = []
+    if use_add and rec_add is not None:
+        steps.append(("add", build_add_instruction(rec_add), rec_add.get("item", "")))
+    if use_remove and rec_remove is not None:
+        steps.append(("remove", build_remove_instruction(rec_remove), rec_remove.get("item", "")))
+    if use_change and rec_change is not None:
+        label = f"{rec_change.get('from_item', '')} -> {rec_change.get('to_item', '')}"
+        steps.append(("change", build_change_instruction(rec_change), label))
+    return steps
+
+
+def build_fused_instruction(instructions: List[str]) -> str:
+    """여러 편집 지시문을 한 번의 이미지 모델 호출로 적용하기 위한 통합 지시문."""
+    numbered = "\n".join(f"  {idx}. {instruction}" for idx, instruction in enumerate(instructions, start=1))
+    return (
+        f"아래 {len(instructions)}가지 변경 사항을 한 장의 결과 이미지에 모두 함께 적용하세요. "
+        f"번호 순서대로 하나씩 적용했을 때와 같은 결과여야 하며, 어느 항목도 빠뜨리지 마세요.\n"
+        f"{numbered}"
+    )
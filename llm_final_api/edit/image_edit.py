@@ -1,10 +1,139 @@
 import os
-from typing import Optional
+from typing import List, Optional, Tuple
 
-from style.style_client import run_style_model  # Gemini 호출 함수.
+import config
+from common.output_writer import write_image
+from common.rate_limiter import RetryExhaustedError
+from common.workspace import Workspace, resolve_workspace
+from edit.edit_chain_store import EditChainStore, image_hash
+from edit.edit_instructions import build_fused_instruction
+from style.style_client import run_style_model_bytes  # Gemini 호출 함수.
 from style.style_prompt import generate_style_prompt  # 스타일 프롬프트 재사용.
 
 
+def build_edit_prompt(base_style: str, edit_instruction: str) -> str:
+    """한 번의 편집(추가/제거/변경)에 쓸 스타일 모델 프롬프트를 만든다."""
+    target_style = base_style or "모던"
+    # generate_style_prompt의 target_objects 자리에, 이번에 수행할 변경 내용을 그대로 넣어준다.
+    target_objects = (
+        f"이번 단계에서 수행해야 할 변경 사항:\n"
+        f"- {edit_instruction}\n\n"
+        "이미 현재 이미지가 위 요청을 충분히 만족하고 있다면, 그 부분은 변경하지 마세요.\n"
+        f"위에서 요청한 변경 사항만 적용하고, 그 외의 구조와 가구 배치, 카메라 구도는 그대로 유지하세요."
+    )
+    return generate_style_prompt(
+        target_style=target_style,
+        target_objects=target_objects,
+    )
+
+
+def edit_image_bytes(
+    api_key: str,
+    model_name: str,
+    image_bytes: bytes,
+    base_style: str,
+    edit_instruction: str,
+    step_name: str,
+) -> bytes:
+    """
+    한 번의 편집을 메모리에서 수행한다. (바이트 입력 → 바이트 출력, 디스크 입출력 없음)
+    실패하면 예외를 그대로 올린다.
+    """
+    prompt = build_edit_prompt(base_style, edit_instruction)
+    return run_style_model_bytes(
+        api_key=api_key,
+        model_name=model_name,
+        image_bytes=image_bytes,
+        prompt=prompt,
+        stage=f"edit_{step_name}",
+    )
+
+
+def run_edit_chain(
+    api_key: str,
+    model_name: str,
+    image_bytes: bytes,
+    base_style: str,
+    steps: List[Tuple[str, str, str]],
+    fused: bool = False,
+    workspace: Optional[Workspace] = None,
+    save_intermediates: Optional[bool] = None,
+    store: Optional[EditChainStore] = None,
+) -> dict:
+    """
+    편집 단계들을 순서대로 적용하면서, 각 단계의 결과 바이트를 곧바로 다음 단계의 입력으로 넘긴다.
+
+    - steps: build_edit_steps()의 결과 [(step_name, 편집 지시문, 로그용 대상 설명), ...]
+    - fused: 단계가 2개 이상이면 지시문을 합쳐 한 번에 호출 (실패하면 단계별 편집으로 진행)
+    - save_intermediates: True면 단계별 결과를 modified_{step_name}.jpg 로도 저장
+                          (None이면 config.SAVE_EDIT_INTERMEDIATES)
+    - store: 주면 (image_bytes 해시, 적용한 지시문 목록) 별로 중간 결과를 저장하고,
+             앞부분이 같은 체인은 저장된 결과에서 이어서 시작한다.
+
+    실패한 단계는 건너뛰고 이전 이미지로 계속 진행한다.
+    단, 요청 한도 초과/서버 오류가 재시도 후에도 계속되면(RetryExhaustedError) 그대로 올린다.
+
+    Returns:
+        dict: {"image": 최종 이미지 바이트, "applied": 적용된 step_name 목록}
+    """
+    if save_intermediates is None:
+        save_intermediates = config.SAVE_EDIT_INTERMEDIATES
+
+    current = image_bytes
+    applied = []
+    applied_instructions = []
+    base_hash = image_hash(image_bytes) if store is not None else None
+
+    def _apply(step_name: str, edit_instruction: str) -> bool:
+        nonlocal current
+        try:
+            current = edit_image_bytes(api_key, model_name, current, base_style, edit_instruction, step_name)
+        except RetryExhaustedError:
+            # 편집이 빠진 이미지를 결과인 것처럼 넘기지 않는다.
+            raise
+        except Exception as e:
+            print(f"  run_edit_chain('{step_name}') 중 에러 발생: {e}")
+            return False
+
+        applied.append(step_name)
+        applied_instructions.append(edit_instruction)
+        if store is not None:
+            store.put(base_hash, applied_instructions, current)
+        if save_intermediates:
+            output_path = write_image(resolve_workspace(workspace), f"modified_{step_name}.jpg", current)
+            print(f"  '{step_name}' 단계 편집 완료 → {output_path}")
+        else:
+            print(f"  '{step_name}' 단계 편집 완료")
+        return True
+
+    # 켜진 항목이 2개 이상이면 지시문을 합쳐 이미지 모델을 한 번만 호출한다.
+    if fused and len(steps) > 1:
+        print("통합 편집 대상: " + ", ".join(label for _, _, label in steps))
+        fused_instruction = build_fused_instruction([instruction for _, instruction, _ in steps])
+        cached = store.get(base_hash, [fused_instruction]) if store is not None else None
+        if cached is not None:
+            print("  같은 통합 편집 결과를 재사용합니다.")
+            return {"image": cached, "applied": ["fused"]}
+        if _apply("fused", fused_instruction):
+            return {"image": current, "applied": applied}
+        print("통합 편집에 실패하여 단계별 편집으로 진행합니다.")
+
+    if store is not None:
+        reused, cached = store.longest_prefix(base_hash, [instruction for _, instruction, _ in steps])
+        if reused:
+            current = cached
+            applied.extend(step_name for step_name, _, _ in steps[:reused])
+            applied_instructions.extend(instruction for _, instruction, _ in steps[:reused])
+            print(f"  저장된 중간 결과 재사용: {', '.join(applied)} (남은 단계 {len(steps) - reused}개)")
+            steps = steps[reused:]
+
+    for step_name, edit_instruction, label in steps:
+        print(f"대상: {label}")
+        _apply(step_name, edit_instruction)
+
+    return {"image": current, "applied": applied}
+
+
 def run_image_edit(
     api_key: str,
     model_name: str,
@@ -12,49 +141,37 @@ def run_image_edit(
     base_style: str,
     edit_instruction: str,
     step_name: str,
+    workspace: Optional[Workspace] = None,
 ) -> str:
     """
     한 번의 편집(추가/제거/변경)을 수행하고 새로운 이미지를 저장한 뒤 경로를 반환한다.
+    (edit_image_bytes를 파일 경로로 감싼 함수)
 
     - base_style: 공간의 기본 스타일 설명 (예: "차분하고 따뜻한 북유럽")
     - edit_instruction: 이번 단계에서 수행할 변경에 대한 자연어 설명
     - step_name: "add" / "remove" / "change" 등, 파일 이름에 사용
+    - workspace: 결과 이미지(modified_{step_name}.jpg)를 저장할 세션 워크스페이스 (None이면 현재 디렉토리)
     """
 
     if not os.path.exists(input_image_path):
         print(f" run_image_edit: 입력 이미지가 존재하지 않습니다: {input_image_path}")
         return input_image_path
 
-    target_style = base_style or "모던"
-    # generate_style_prompt의 target_objects 자리에, 이번에 수행할 변경 내용을 그대로 넣어준다.
-    target_objects = (
-        f"이번 단계에서 수행해야 할 변경 사항:\n"
-        f"- {edit_instruction}\n\n"
-        "이미 현재 이미지가 위 요청을 충분히 만족하고 있다면, 그 부분은 변경하지 마세요.\n"
-        f"위에서 요청한 변경 사항만 적용하고, 그 외의 구조와 가구 배치, 카메라 구도는 그대로 유지하세요."
-    )
-
     try:
-        prompt = generate_style_prompt(
-            target_style=target_style,
-            target_objects=target_objects,
-        )
+        with open(input_image_path, "rb") as f:
+            input_bytes = f.read()
 
         # Gemini 스타일 모델 호출 -> 이미지 바이트 획득.
-        image_bytes = run_style_model(
-            api_key=api_key,
-            model_name=model_name,
-            image_path=input_image_path,
-            prompt=prompt,
-        )
+        image_bytes = edit_image_bytes(api_key, model_name, input_bytes, base_style, edit_instruction, step_name)
 
-        output_path = f"modified_{step_name}.jpg"
-        with open(output_path, "wb") as f:
-            f.write(image_bytes)
+        output_path = write_image(resolve_workspace(workspace), f"modified_{step_name}.jpg", image_bytes)
 
         print(f"  '{step_name}' 단계 편집 완료 → {output_path}")
         return output_path
 
+    except RetryExhaustedError:
+        # 요청 한도 초과/서버 오류가 재시도 후에도 계속되면, 편집이 빠진 이미지를 결과인 것처럼 넘기지 않는다.
+        raise
     except Exception as e:
         print(f"  run_image_edit('{step_name}') 중 에러 발생: {e}")
         # 실패해도 파이프라인이 완전히 멈추지 않도록, 이전 이미지를 그대로 반환.
@@ -1,11 +1,19 @@
-import os
-from google import genai
 from google.genai import types
-from PIL import Image # 이미지 저장 및 처리 
-import io # 바이트 스트림 처리 
-from config import API_KEY, STYLE_MODEL
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+from config import API_KEY, STYLE_MODEL, UPLOAD_MAX_EDGE_EDIT, UPLOAD_FORMAT, UPLOAD_QUALITY, VIEW_ASPECT_TOLERANCE, VIEW_OUTPUT_SIZES, VIEW_REGEN_MAX_RETRIES
+from common.genai_client import generate_content, get_client
+from common.image_handles import image_part
+from common.image_header import check_same_aspect, read_image_header
+from common.metrics import record as record_metric
+from common.image_preprocess import preprocess_image_bytes
+from common.response_cache import cached_call
+from common.output_writer import write_image
+from common.workspace import Workspace, resolve_workspace
 
-def make_one_image_to_three(api_key: str, model_name: str, input_image_path: str):
+VIEW_TEMPERATURE = 0.1
+
+def make_one_image_to_three(api_key: str, model_name: str, input_image_path: str, workspace: Optional[Workspace] = None):
     """
     앞선 과정에서 생성된 방 이미지를 입력받아,
     왼쪽 측면 뷰(Left View)와 오른쪽 측면 뷰(Right View) 2장의 이미지를 추가로 생성합니다.
@@ -14,19 +22,46 @@ def make_one_image_to_three(api_key: str, model_name: str, input_image_path: str
         api_key (str): Google GenAI API Key
         model_name (str): 사용할 모델명 (config.py의 STYLE_MODEL, 예: 'gemini-2.5-flash-image')
         input_image_path (str): 앞선 과정에서 생성된 원본 이미지 경로
-    """
-    # 1. 클라이언트 초기화.
-    client = genai.Client(api_key=api_key)
+        workspace (Optional[Workspace]): 좌/우 이미지를 저장할 세션 워크스페이스 (None이면 현재 디렉토리)
 
-    # 2. 원본 이미지 파일 읽기. (바이트 변환)
+    Returns:
+        dict: 방향별 저장 경로. 예) {"left": "img4new3r_left.png", "right": None}
+              (실패한 방향은 None)
+    """
+    # 1. 원본 이미지 파일 읽기. (바이트 변환)
     # LLM에게 원본 이미지(레퍼런스)를 '입력'으로 제공하여, 동일한 구조와 스타일을 유지하라는 컨텍스트를 부여하기 위함
     # 즉, 1번 과정에서 만든 이미지를 모델에게 "이 공간을 기반으로 그려줘"라고 전달하기 위함.
     try:
         with open(input_image_path, "rb") as f:
-            img_bytes = f.read()
+            image_bytes = f.read()
     except FileNotFoundError:
         print(f" 오류: 입력 이미지를 찾을 수 없습니다. 경로를 확인하세요: {input_image_path}")
-        return
+        return {}
+
+    return make_side_views(api_key, model_name, image_bytes, workspace=workspace)
+
+
+def make_side_views(api_key: str, model_name: str, image_bytes: bytes, workspace: Optional[Workspace] = None):
+    """
+    make_one_image_to_three와 같지만 파일 경로 대신 이미지 바이트를 받는다.
+    편집/스타일 변경 결과를 디스크에서 다시 읽지 않고 바로 넘길 때 사용. (좌/우 결과 파일만 저장)
+
+    Returns:
+        dict: 방향별 저장 경로. 예) {"left": "img4new3r_left.png", "right": None}
+    """
+    # 2. 클라이언트 준비. (프로세스 공유 클라이언트 재사용)
+    client = get_client(api_key)
+    workspace = resolve_workspace(workspace)
+
+    img_bytes, mime_type = preprocess_image_bytes(
+        image_bytes,
+        max_edge=UPLOAD_MAX_EDGE_EDIT,
+        output_format=UPLOAD_FORMAT,
+        quality=UPLOAD_QUALITY,
+    )
+    # 생성된 뷰의 비율을 비교할 기준 (헤더만 읽음, 읽을 수 없으면 비율 검사는 생략)
+    # 원본을 그대로 보낼 때(UPLOAD_MAX_EDGE_EDIT=None)는 EXIF 회전 값을 비교 시 반영한다.
+    reference_header = read_image_header(img_bytes)
 
     # 3. 생성할 이미지 설정. (방향, 파일명, 각도별 추가 프롬프트)
 
@@ -93,63 +128,138 @@ def make_one_image_to_three(api_key: str, model_name: str, input_image_path: str
         {"direction": "right", "filename": "img4new3r_right.png"}
     ]
 
-    # 4. 왼쪽/오른쪽 이미지 생성 반복.
-    for task in tasks:
-        direction = task["direction"]
-        output_filename = task["filename"]
-        
-        # 현재 방향에 맞는 프롬프트 조립.
-        # [공통규칙] + [현재 방향 지시] + [네거티브]를 결합하여 모델에 전달
-        final_prompt = base_rules + "\n" + prompts_by_direction[direction] + "\n" + negative_prompt
-
-        print(f"⏳ '{direction}' 측면 이미지 생성 중...")
+    # 4. 왼쪽/오른쪽 이미지를 동시에 생성.
+    # 두 방향은 서로 독립적이고 같은 레퍼런스 바이트를 쓰므로, 스레드 풀로 병렬 요청한다.
+    # 각 방향의 결과 파일은 해당 요청이 끝나는 즉시 저장되고, 한쪽의 에러는 다른 쪽에 영향을 주지 않는다.
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = {}
+        for task in tasks:
+            direction = task["direction"]
 
+            # 현재 방향에 맞는 프롬프트 조립.
+            # [공통규칙] + [현재 방향 지시] + [네거티브]를 결합하여 모델에 전달
+            final_prompt = base_rules + "\n" + prompts_by_direction[direction] + "\n" + negative_prompt
 
-        try:
-            # 5. 모델 호출. (이미지 생성 요청)
-            # contents 인자에 '레퍼런스 이미지'와 '텍스트 프롬프트'를 모두 전달하여 
-            # Gemini의 이미지 참조 및 생성 능력을 활용.
-            # Vertex AI Studio 설정: 온도 0.1 이하, 이미지 출력.
-            response = client.models.generate_content(
-                model=model_name,
-                contents=[
-                    # 1번 이미지.(레퍼런스)
-                    types.Part.from_bytes(
-                        data=img_bytes,
-                        mime_type="image/jpeg"  # 또는 image/png, 입력 파일에 맞춰 조정 가능.
-                    ),
-                    # 텍스트 프롬프트.
-                    final_prompt
-                ],
-                config=types.GenerateContentConfig(
-                    temperature=0.1,  # 온도 설정 (0.1): 결과물의 일관성을 높이고 창의성을 낮추기.
-                    # 모델이 이미지를 반환하도록 설정. (모델 스펙에 따라 파라미터가 다를 수 있음)
-                    # 만약 순수 Imagen 모델이라면 generate_images 메서드를 써야 할 수도 있음.
-                    # 여기서는 Gemini 멀티모달(입력:이미지+텍스트 -> 출력:이미지)을 가정.
-                )
+            print(f"⏳ '{direction}' 측면 이미지 생성 중...")
+            future = executor.submit(
+                _generate_view,
+                client,
+                model_name,
+                img_bytes,
+                mime_type,
+                direction,
+                final_prompt,
+                workspace,
+                task["filename"],
+                reference_header,
             )
-            
-            # 6. 응답 처리 및 이미지 저장.
-            # Gemini 모델은 이미지 생성 결과를 response.parts 내의 inline_data로 반환
-            if response.parts:
-                for part in response.parts:
-                    # 바이너리 데이터(이미지)가 있는지 확인.
-                    if part.inline_data:
-                        image_data = part.inline_data.data
-                        
-                        # 바이트 데이터를 이미지 파일로 저장.
-                        img = Image.open(io.BytesIO(image_data))
-                        img.save(output_filename)
-                        print(f"   저장 완료: {output_filename}")
-                        break # 이미지를 하나 찾으면 저장하고 다음 태스크로.
-                else:
-                    # 루프가 break 없이 끝났다면 이미지가 없다는 뜻.
-                    print(f"    경고: 모델 응답에 이미지 데이터가 없습니다. (텍스트 응답일 수 있음)")
-                    print(f"   응답 내용: {response.text}")
-            else:
-                print(f"   오류: 모델로부터 응답이 비어있습니다.")
+            futures[future] = direction
 
-        except Exception as e:
-            print(f"   '{direction}' 이미지 생성 중 에러 발생: {e}")
+        for future in as_completed(futures):
+            direction = futures[future]
+            try:
+                results[direction] = future.result()
+            except Exception as e:
+                print(f"   '{direction}' 이미지 생성 중 에러 발생: {e}")
+                results[direction] = None
 
     print("\n 모든 추가 뷰 이미지 생성 작업이 끝났습니다.")
+    return results
+
+
+class InvalidViewError(Exception):
+    """생성된 측면 뷰가 헤더 검사(빈 응답/잘림/비율)를 통과하지 못한 경우."""
+
+
+def _generate_view(client, model_name: str, img_bytes: bytes, mime_type: str, direction: str, final_prompt: str, workspace: Workspace, output_filename: str, reference_header: Optional[dict] = None):
+    """
+    한 방향(left/right)의 측면 뷰를 생성하고 곧바로 파일로 저장한다.
+
+    결과는 헤더만 읽어서 검사하고(빈 응답, 잘린 파일, 입력과 다른 가로세로 비율),
+    통과하지 못하면 이 방향만 VIEW_REGEN_MAX_RETRIES 번까지 다시 생성한다.
+    검사 결과는 방향별로 metrics 에 남긴다. (kind="view_check")
+
+    Returns:
+        str | None: 저장된 파일 경로. 끝까지 검사를 통과하지 못하면 None.
+    """
+    def _call() -> bytes:
+        # 5. 모델 호출. (이미지 생성 요청)
+        # contents 인자에 '레퍼런스 이미지'와 '텍스트 프롬프트'를 모두 전달하여 
+        # Gemini의 이미지 참조 및 생성 능력을 활용.
+        # Vertex AI Studio 설정: 온도 0.1 이하, 이미지 출력.
+        response = generate_content(
+            client,
+            model_name,
+            [
+                # 1번 이미지.(레퍼런스) 좌/우와 재생성이 같은 이미지를 쓰므로 USE_FILE_HANDLES 면 한 번만 업로드
+                # mime_type: 파일 내용으로 판별한 실제 포맷 (png/jpeg 등)
+                image_part(client, img_bytes, mime_type, stage="view"),
+                # 텍스트 프롬프트.
+                final_prompt
+            ],
+            types.GenerateContentConfig(
+                temperature=VIEW_TEMPERATURE,  # 온도 설정 (0.1): 결과물의 일관성을 높이고 창의성을 낮추기.
+                # 모델이 이미지를 반환하도록 설정. (모델 스펙에 따라 파라미터가 다를 수 있음)
+                # 만약 순수 Imagen 모델이라면 generate_images 메서드를 써야 할 수도 있음.
+                # 여기서는 Gemini 멀티모달(입력:이미지+텍스트 -> 출력:이미지)을 가정.
+            ),
+            stage="view",
+        )
+
+        # 6. 응답 처리.
+        # Gemini 모델은 이미지 생성 결과를 response.parts 내의 inline_data로 반환
+        image_data = b""
+        if not response.parts:
+            print(f"   오류: '{direction}' 모델로부터 응답이 비어있습니다.")
+        else:
+            for part in response.parts:
+                # 바이너리 데이터(이미지)가 있는지 확인.
+                if part.inline_data:
+                    image_data = part.inline_data.data
+                    break
+            else:
+                # 루프가 break 없이 끝났다면 이미지가 없다는 뜻.
+                print(f"    경고: '{direction}' 모델 응답에 이미지 데이터가 없습니다. (텍스트 응답일 수 있음)")
+                print(f"   응답 내용: {response.text}")
+
+        # 7. 헤더만 읽어서 검사. (통과하지 못한 결과는 캐시에 남기지 않도록 예외로 처리)
+        reason = check_same_aspect(image_data, reference_header, VIEW_ASPECT_TOLERANCE, VIEW_OUTPUT_SIZES)
+        if reason is not None:
+            raise InvalidViewError(reason)
+        return image_data
+
+    image_data = None
+    reason = None
+    attempts = 0
+    for attempt in range(1 + max(0, VIEW_REGEN_MAX_RETRIES)):
+        attempts = attempt + 1
+        try:
+            # 같은 레퍼런스 이미지 + 방향 프롬프트로 생성한 결과가 있으면 캐시에서 재사용
+            # 검사에 실패한 결과는 캐시에 남지 않으므로, 다시 생성해 통과한 결과가 같은 키로 저장된다.
+            image_data = cached_call(model_name, img_bytes, final_prompt, {"temperature": VIEW_TEMPERATURE}, _call)
+            reason = None
+            break
+        except InvalidViewError as e:
+            reason = str(e)
+            if attempt < VIEW_REGEN_MAX_RETRIES:
+                print(f"   '{direction}' 뷰 검사 실패 ({reason}), 다시 생성합니다. ({attempts}/{1 + VIEW_REGEN_MAX_RETRIES})")
+
+    header = read_image_header(image_data) if image_data else None
+    record_metric(
+        "view_check",
+        direction,
+        model=model_name,
+        outcome="ok" if reason is None else f"invalid:{reason}",
+        attempts=attempts,
+        width=header["width"] if header else None,
+        height=header["height"] if header else None,
+    )
+    if reason is not None:
+        print(f"   '{direction}' 뷰가 {attempts}번 모두 검사를 통과하지 못했습니다. ({reason})")
+        return None
+
+    # 모델이 돌려준 바이트를 그대로 원자적 저장. (디코드/재인코딩은 OUTPUT_FORMAT_POLICY가 요구할 때만)
+    output_path = write_image(workspace, output_filename, image_data)
+    print(f"   저장 완료: {output_path}")
+    return output_path
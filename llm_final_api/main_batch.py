@@ -0,0 +1,226 @@
+"""
+여러 방(room)을 한 번에 처리하는 배치 실행 스크립트.
+
+각 방마다 최적 이미지 선택 → 리포트 → 스타일 변경/부분 수정 → 좌/우 각도 이미지 생성을
+제한된 크기의 워커 풀에서 실행하고, 방별 결과는 <output-dir>/<방 이름>/ 에 저장한다.
+마지막에 처리량과 실패 목록을 <output-dir>/batch_summary.json 으로 남긴다.
+
+입력 (둘 중 하나):
+1) --manifest rooms.json
+    {
+      "rooms": [
+        {"name": "room01", "images": ["a.jpg", "b.png"], "style_choice": {"selected_style": "AI 추천"}},
+        {"name": "room02", "images": ["c.jpg"], "user_choice": {"use_add": true, "use_remove": false, "use_change": true}}
+      ]
+    }
+   (이미지 경로가 상대 경로면 manifest 파일 위치 기준)
+2) --rooms-dir captures/
+    captures/<방 이름>/ 아래의 이미지 파일들을 후보로 사용.
+    같은 폴더에 style_choice.json / user_choice.json 이 있으면 함께 사용.
+
+style_choice가 있으면 스타일 변경, user_choice가 있으면 부분 수정을 실행하고 (둘 다 있으면 순서대로),
+둘 다 없으면 "AI 추천" 스타일 변경을 실행한다.
+
+오프라인 부하 테스트:
+    python main_batch.py --rooms-dir captures --stub --workers 8
+    (--stub: 로컬 Gemini 스텁 서버를 띄워서 실제 API 대신 사용)
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+import config
+from common.workspace import Workspace
+from common.metrics import start_metrics_server
+from common.rate_limiter import get_rate_limit_stats
+from main_report import generate_report
+from main_new_looks import run_new_look
+from main_modify_looks import run_modify_look
+from report.utils.image_selector import collect_candidate_paths
+
+DEFAULT_STYLE_CHOICE = {"selected_style": "AI 추천"}
+SUMMARY_FILENAME = "batch_summary.json"
+
+
+def _load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_manifest(manifest_path: str) -> List[Dict[str, Any]]:
+    """manifest JSON에서 방 목록을 읽는다. 상대 이미지 경로는 manifest 위치 기준으로 바꾼다."""
+    manifest = _load_json(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    rooms = []
+    for idx, room in enumerate(manifest.get("rooms", [])):
+        images = [
+            path if os.path.isabs(path) else os.path.join(base_dir, path)
+            for path in room.get("images", [])
+        ]
+        rooms.append({
+            "name": room.get("name") or f"room{idx + 1:03d}",
+            "images": images,
+            "style_choice": room.get("style_choice"),
+            "user_choice": room.get("user_choice"),
+        })
+    return rooms
+
+
+def discover_rooms(rooms_dir: str) -> List[Dict[str, Any]]:
+    """rooms_dir 아래의 하위 폴더 하나를 방 하나로 보고 방 목록을 만든다."""
+    rooms = []
+    for name in sorted(os.listdir(rooms_dir)):
+        room_dir = os.path.join(rooms_dir, name)
+        if not os.path.isdir(room_dir):
+            continue
+
+        style_path = os.path.join(room_dir, "style_choice.json")
+        choice_path = os.path.join(room_dir, "user_choice.json")
+        rooms.append({
+            "name": name,
+            "images": collect_candidate_paths(room_dir),
+            "style_choice": _load_json(style_path) if os.path.exists(style_path) else None,
+            "user_choice": _load_json(choice_path) if os.path.exists(choice_path) else None,
+        })
+    return rooms
+
+
+def process_room(room: Dict[str, Any], output_root: str) -> Dict[str, Any]:
+    """
+    방 하나에 대해 전체 파이프라인을 실행한다. 예외는 여기서 잡아 결과에 기록한다.
+
+    Returns:
+        dict: {"name", "output_dir", "ok", "error", "seconds", "stages": {단계: 소요 시간(초)}}
+    """
+    output_dir = os.path.join(output_root, room["name"])
+    workspace = Workspace(output_dir, session_id=room["name"])
+
+    result = {"name": room["name"], "output_dir": output_dir, "ok": False, "error": None, "seconds": 0.0, "stages": {}}
+    start = time.perf_counter()
+    stage = "report"
+    try:
+        stage_start = time.perf_counter()
+        parsed_report = generate_report(config.API_KEY, room["images"], workspace=workspace)
+        result["stages"]["report"] = time.perf_counter() - stage_start
+
+        style_choice = room.get("style_choice")
+        user_choice = room.get("user_choice")
+        if style_choice is None and user_choice is None:
+            style_choice = DEFAULT_STYLE_CHOICE
+
+        if style_choice is not None:
+            stage = "new_look"
+            stage_start = time.perf_counter()
+            run_new_look(parsed_report, style_choice, workspace=workspace)
+            result["stages"]["new_look"] = time.perf_counter() - stage_start
+
+        if user_choice is not None:
+            stage = "modify_look"
+            stage_start = time.perf_counter()
+            run_modify_look(parsed_report, user_choice, workspace=workspace)
+            result["stages"]["modify_look"] = time.perf_counter() - stage_start
+
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{stage}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(rooms: List[Dict[str, Any]], output_root: str, workers: int) -> Dict[str, Any]:
+    """방 목록을 워커 풀에서 처리하고 요약(dict)을 반환/저장한다."""
+    results = []
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(process_room, room, output_root): room["name"] for room in rooms}
+        for future in as_completed(futures):
+            res = future.result()
+            results.append(res)
+            status = "완료" if res["ok"] else f"실패 ({res['error']})"
+            print(f"[batch] {res['name']}: {status} - {res['seconds']:.1f}s ({len(results)}/{len(rooms)})")
+    wall_seconds = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["name"])
+    succeeded = [r for r in results if r["ok"]]
+
+    # 단계별 평균 소요 시간
+    stage_times: Dict[str, List[float]] = {}
+    for r in results:
+        for name, seconds in r["stages"].items():
+            stage_times.setdefault(name, []).append(seconds)
+
+    summary = {
+        "rooms_total": len(rooms),
+        "succeeded": len(succeeded),
+        "failed": [{"name": r["name"], "error": r["error"]} for r in results if not r["ok"]],
+        "workers": workers,
+        "wall_seconds": wall_seconds,
+        "rooms_per_minute": (len(succeeded) / wall_seconds * 60.0) if wall_seconds > 0 else 0.0,
+        "stage_mean_seconds": {name: sum(v) / len(v) for name, v in stage_times.items()},
+        "rate_limits": get_rate_limit_stats(),
+        "rooms": results,
+    }
+
+    summary_workspace = Workspace(output_root)
+    summary_workspace.write_json(SUMMARY_FILENAME, summary)
+    summary_workspace.save_metrics()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="여러 방을 한 번에 처리하는 배치 실행")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="방 목록 manifest JSON 경로")
+    source.add_argument("--rooms-dir", help="방별 하위 폴더가 있는 디렉토리")
+    parser.add_argument("--output-dir", default="batch_output", help="방별 결과를 저장할 루트 디렉토리")
+    parser.add_argument("--workers", type=int, default=4, help="동시에 처리할 방 수")
+    parser.add_argument("--base-url", default=None, help="GenAI 엔드포인트 (로컬 스텁 서버 등)")
+    parser.add_argument("--stub", action="store_true", help="로컬 Gemini 스텁 서버를 띄워서 사용")
+    parser.add_argument("--metrics-port", type=int, default=None, help="실행 중 GET /metrics (Prometheus) 제공 포트")
+    args = parser.parse_args()
+
+    rooms = load_manifest(args.manifest) if args.manifest else discover_rooms(args.rooms_dir)
+    if not rooms:
+        print("처리할 방이 없습니다.")
+        return
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+        print(f"metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+
+    server = None
+    if args.stub:
+        from bench.fake_gemini import start_fake_server
+        server, config.GENAI_BASE_URL = start_fake_server()
+        print(f"로컬 스텁 서버 사용: {config.GENAI_BASE_URL}")
+    elif args.base_url:
+        config.GENAI_BASE_URL = args.base_url
+
+    try:
+        summary = run_batch(rooms, args.output_dir, args.workers)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print("\n------ 배치 요약 ------")
+    print(f"방 {summary['rooms_total']}개 중 성공 {summary['succeeded']}개, 실패 {len(summary['failed'])}개")
+    print(f"전체 {summary['wall_seconds']:.1f}s, 처리량 {summary['rooms_per_minute']:.1f} 방/분 (워커 {summary['workers']}개)")
+    for name, seconds in summary["stage_mean_seconds"].items():
+        print(f"  - {name}: 평균 {seconds:.2f}s")
+    for model, stats in summary["rate_limits"].items():
+        print(
+            f"  [{model}] 호출 {stats['calls']}회 (재시도 {stats['retries']}회, 실패 {stats['failures']}회) | "
+            f"한도 대기 {stats['wait_seconds']:.1f}s, 백오프 {stats['backoff_seconds']:.1f}s, 호출 {stats['call_seconds']:.1f}s"
+        )
+    for item in summary["failed"]:
+        print(f"  실패: {item['name']} ({item['error']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,8 @@
 - 1~2단계를 거쳐 parsed_report.json 이 생성되어 있음
 - 프론트에서 드롭박스 선택 결과를 style_choice.json 으로 저장해 둠
 """
-import os
-import json
-import shutil
+import argparse
+from typing import Optional
 
 from config import (
     API_KEY,
@@ -19,22 +18,18 @@ from config import (
     SELECTED_IMAGE_PATH,
 )
 
-from style.style_client import run_style_model
+from style.style_client import run_style_model_bytes
+from style.style_pregen import TARGET_OBJECTS, take_pregenerated
 from style.style_prompt import generate_style_prompt
-from main_1img23 import make_one_image_to_three   
+from main_1img23 import make_side_views
+from common.output_writer import write_image
+from common.workspace import Workspace, resolve_workspace, workspace_from_args
 
 PARSED_REPORT_PATH = "parsed_report.json"
 STYLE_CHOICE_PATH = "style_choice.json"
 ORG_IMAGE_PATH = "img4new3r_org.png"  # 최종 결과물 이름
 
 
-def load_json(path: str):
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"JSON 파일을 찾을 수 없습니다: {path}")
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
 def decide_target_style(parsed_report: dict, style_choice: dict) -> str:
     pass
 
@@ -72,78 +67,83 @@ def decide_target_style(parsed_report: dict, style_choice: dict) -> str:
     return selected
 
 
-# 메인 실행
-def main():
-
-    # 1. 입력 데이터
-    try:
-        parsed_report = load_json(PARSED_REPORT_PATH)
-    except Exception as e:
-        print(f"parsed_report.json 로드 실패: {e}")
-        return
-
-    try:
-        style_choice = load_json(STYLE_CHOICE_PATH)
-    except Exception as e:
-        print(f"style_choice.json 로드 실패: {e}")
-        return
+def resolve_base_image(workspace: Optional[Workspace] = None) -> str:
+    """
+    세션 워크스페이스 안에서 기준 이미지를 고른다.
+    이전에 생성된 최종본(img4new3r_org.png)이 있으면 그것을, 없으면 리포트 단계에서 선택된 이미지를 사용.
+    """
+    workspace = resolve_workspace(workspace)
+    if workspace.exists(ORG_IMAGE_PATH):
+        org_image_path = workspace.path(ORG_IMAGE_PATH)
+        print(f"\n기준 이미지: {org_image_path} (이전에 생성된 최종본 사용)")
+        return org_image_path
+    if workspace.exists(SELECTED_IMAGE_PATH):
+        selected_image_path = workspace.path(SELECTED_IMAGE_PATH)
+        print(f"\n기준 이미지: {selected_image_path} (최초 선택 이미지 사용)")
+        return selected_image_path
+    raise FileNotFoundError("사용할 입력 이미지가 없습니다. SELECTED_IMAGE_PATH 또는 img4new3r_org.png 중 하나는 있어야 합니다.")
+
+
+def run_new_look(parsed_report: dict, style_choice: dict, workspace: Optional[Workspace] = None) -> dict:
+    """
+    선택된 스타일로 방 전체 스타일을 바꾼 이미지를 만들고(img4new3r_org.png),
+    그 이미지 기준으로 좌/우 각도 이미지를 생성한다. 모든 결과는 세션 워크스페이스에 저장.
+
+    Returns:
+        dict: {"org": 최종본 경로, "left": 경로 또는 None, "right": 경로 또는 None}
+
+    Raises:
+        기준 이미지가 없거나 스타일 변경(3단계)에 실패하면 예외를 그대로 올린다.
+    """
+    workspace = resolve_workspace(workspace)
 
     # 2. 기준 이미지 선택 
-    if os.path.exists(ORG_IMAGE_PATH):
-        base_image_path = ORG_IMAGE_PATH
-        print(f"\n기준 이미지: {ORG_IMAGE_PATH} (이전에 생성된 최종본 사용)")
-    elif os.path.exists(SELECTED_IMAGE_PATH):
-        base_image_path = SELECTED_IMAGE_PATH
-        print(f"\n기준 이미지: {SELECTED_IMAGE_PATH} (최초 선택 이미지 사용)")
-    else:
-        print("사용할 입력 이미지가 없습니다. SELECTED_IMAGE_PATH 또는 img4new3r_org.png 중 하나는 있어야 합니다.")
-        return
-
-    print(f"리포트 파싱 파일: {PARSED_REPORT_PATH}")
-    print(f"스타일 선택 파일: {STYLE_CHOICE_PATH}")
+    base_image_path = resolve_base_image(workspace)
 
     # 3. 최종 target_style 결정
     target_style = decide_target_style(parsed_report, style_choice)
     print(f"\n최종 적용할 스타일: {target_style}")
 
     # 모든 가구 선택
-    target_objects = "모든 가구와 데코 요소"
+    target_objects = TARGET_OBJECTS
 
-    try:
-        style_prompt = generate_style_prompt(
-            target_style=target_style,
-            target_objects=target_objects,
-        )
+    style_prompt = generate_style_prompt(
+        target_style=target_style,
+        target_objects=target_objects,
+    )
+
+    with open(base_image_path, "rb") as f:
+        base_image_bytes = f.read()
 
-        image_bytes = run_style_model(
+    # 리포트 직후 미리 생성해 둔 결과가 같은 (기준 이미지, 스타일)이면 바로 사용
+    image_bytes = take_pregenerated(workspace, base_image_bytes, target_style, STYLE_MODEL)
+    if image_bytes is not None:
+        print("미리 생성해 둔 스타일 변경 이미지를 사용합니다.")
+    else:
+        image_bytes = run_style_model_bytes(
             api_key=API_KEY,
             model_name=STYLE_MODEL,
-            image_path=base_image_path,
+            image_bytes=base_image_bytes,
             prompt=style_prompt,
+            stage="new_look",
         )
 
-        temp_output = "styled_new_look_tmp.jpg"
-        with open(temp_output, "wb") as f:
-            f.write(image_bytes)
+    # 최종본은 항상 ORG_IMAGE_PATH 로 통일 (임시 파일 + 복사 없이 한 번에 저장)
+    styled_image_path = write_image(workspace, ORG_IMAGE_PATH, image_bytes)
 
-        # 최종본은 항상 ORG_IMAGE_PATH 로 통일
-        shutil.copyfile(temp_output, ORG_IMAGE_PATH)
-        styled_image_path = ORG_IMAGE_PATH
-
-        print(f"스타일 변경 이미지 저장 완료: {styled_image_path}")
-
-    except Exception as e:
-        print(f"스타일 변경(3단계) 중 에러 발생: {e}")
-        return
+    print(f"스타일 변경 이미지 저장 완료: {styled_image_path}")
 
     # 4. 좌&우 각도 이미지 2장 생성
     print("\n 4단계: 좌/우 각도 이미지 생성 시작 ---")
 
+    views = {}
     try:
-        make_one_image_to_three(
+        # 방금 받은 바이트를 그대로 넘긴다. (저장한 파일을 다시 읽지 않음)
+        views = make_side_views(
             api_key=API_KEY,
             model_name=STYLE_MODEL,
-            input_image_path=styled_image_path,
+            image_bytes=image_bytes,
+            workspace=workspace,
         )
         print("\n 좌/우 각도 이미지 생성 완료!")
         print("   - img4new3r_left.png")
@@ -151,6 +151,40 @@ def main():
     except Exception as e:
         print(f"좌/우 각도 생성(4단계) 중 에러 발생: {e}")
 
+    return {"org": styled_image_path, "left": views.get("left"), "right": views.get("right")}
+
+
+# 메인 실행
+def main():
+    parser = argparse.ArgumentParser(description="선택한 스타일로 방 전체 스타일 변경 + 좌/우 각도 이미지 생성")
+    parser.add_argument("--session", default=None, help="세션 ID (sessions/<ID>/ 의 파일을 사용, 없으면 현재 디렉토리)")
+    args = parser.parse_args()
+    workspace = workspace_from_args(args.session)
+
+    # 1. 입력 데이터
+    try:
+        parsed_report = workspace.read_json(PARSED_REPORT_PATH)
+    except Exception as e:
+        print(f"parsed_report.json 로드 실패: {e}")
+        return
+
+    try:
+        style_choice = workspace.read_json(STYLE_CHOICE_PATH)
+    except Exception as e:
+        print(f"style_choice.json 로드 실패: {e}")
+        return
+
+    print(f"리포트 파싱 파일: {PARSED_REPORT_PATH}")
+    print(f"스타일 선택 파일: {STYLE_CHOICE_PATH}")
+
+    try:
+        run_new_look(parsed_report, style_choice, workspace=workspace)
+    except Exception as e:
+        print(f"스타일 변경(3단계) 중 에러 발생: {e}")
+        return
+    finally:
+        workspace.save_metrics()
+
 
 if __name__ == "__main__":
     main()
@@ -1,58 +1,376 @@
-import time
+import argparse
 import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
 from config import *
-from report.utils.image_selector import select_best_image
-from report.utils.report_parser import parse_report_output
-from report.report_client import run_report_model
-from report.report_prompt import report_prompt
+from common.output_writer import promote
+from common.workspace import Workspace, resolve_workspace, workspace_from_args
+from report.utils.image_prefilter import prefilter_candidates
+from report.utils.image_selector import collect_candidate_paths, select_best_image
+from report.utils.report_parser import IncrementalReportParser, is_report_complete, parse_report_output
+from report.report_client import IncompleteReportError, run_report_model, run_select_and_report_model, stream_report_model
+from report.report_prompt import (
+    build_select_and_report_json_prompt,
+    build_select_and_report_prompt,
+    report_json_prompt,
+    report_prompt,
+)
+from report.report_repair import repair_report
+from report.report_schema import (
+    REPORT_RESPONSE_SCHEMA,
+    SELECT_REPORT_RESPONSE_SCHEMA,
+    parse_report_json,
+    render_report_markdown,
+)
+from style.style_pregen import launch_pregeneration_process
 
+REPORT_OUTPUT_PATH = "report_analysis_result.txt"
+PARSED_REPORT_PATH = "parsed_report.json"
+REPORT_EVENTS_PATH = "parsed_report_events.jsonl"  # 스트리밍 모드에서 섹션별 이벤트가 한 줄씩 추가됨
 
-def main():
-    # ----- 1단계: 3장의 이미지 중 최적의 입력 이미지 1장 선택 ------
+
+def run_report_stage(
+    api_key: str,
+    model_name: str,
+    image_path: str,
+    prompt: str,
+    ready_check: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    리포트 모델 호출이 실제로 끝날 때까지(블로킹) 기다렸다가 응답 텍스트를 반환한다.
+    고정 sleep 없이, 호출 완료 자체를 다음 단계(파싱)의 시작 신호로 사용.
+
+    Args:
+        ready_check: 응답 텍스트가 파싱 가능한 상태인지 확인하는 함수 (선택).
+                     False를 반환하면 RuntimeError를 던진다.
+                     없으면 잘린 응답도 그대로 반환한다. (보정 단계에서 채움, 캐시에는 저장되지 않음)
+    """
+    try:
+        raw_report_text = run_report_model(
+            api_key=api_key,
+            model_name=model_name,
+            image_path=image_path,
+            prompt=prompt,
+        )
+    except IncompleteReportError as e:
+        if ready_check is not None:
+            raise RuntimeError(str(e)) from e
+        raw_report_text = e.text
+
+    if ready_check is not None and not ready_check(raw_report_text):
+        raise RuntimeError("리포트 응답이 템플릿 끝(## 정리)까지 도착하지 않았습니다.")
+
+    return raw_report_text
+
+
+def _parse_json_report(raw_text: str) -> Dict[str, Any]:
+    """JSON 모드 응답을 파싱한다. 모델이 스키마 대신 템플릿 텍스트로 답했으면 기존 정규식 파서로 파싱."""
+    try:
+        return parse_report_json(raw_text)
+    except ValueError:
+        if is_report_complete(raw_text):
+            return parse_report_output(raw_text)
+        raise
+
+
+def report_json_stage(
+    api_key: str,
+    model_name: str,
+    image_path: str,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    리포트를 JSON 모드(응답 스키마)로 받는다. 파싱은 json.loads 한 번으로 끝나고,
+    리포트 텍스트는 받은 JSON으로 템플릿과 같은 형식을 로컬에서 만든다.
+
+    Returns:
+        (템플릿 형식 리포트 텍스트, parsed_report dict)
+
+    Raises:
+        ValueError: 응답이 깨졌거나(잘림 포함) 필수 항목이 빠진 경우
+    """
+    raw_json_text = run_report_model(
+        api_key=api_key,
+        model_name=model_name,
+        image_path=image_path,
+        prompt=report_json_prompt,
+        response_schema=REPORT_RESPONSE_SCHEMA,
+    )
+    parsed_data = _parse_json_report(raw_json_text)
+    return render_report_markdown(parsed_data), parsed_data
+
+
+def stream_report_stage(
+    api_key: str,
+    model_name: str,
+    image_path: str,
+    prompt: str,
+    on_section: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ready_check: Optional[Callable[[str], bool]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    리포트를 스트리밍으로 받으면서, 템플릿 섹션(## 1 … ## 정리)이 닫힐 때마다 on_section(event)을 호출한다.
+
+    Returns:
+        (원본 리포트 텍스트, 전체 parsed_report dict)
+        parsed_report는 전체 텍스트에 대한 parse_report_output 결과와 같다.
+    """
+    parser = IncrementalReportParser()
+
+    def _emit(events):
+        if on_section is None:
+            return
+        for event in events:
+            on_section(event)
+
+    for chunk in stream_report_model(
+        api_key=api_key,
+        model_name=model_name,
+        image_path=image_path,
+        prompt=prompt,
+    ):
+        _emit(parser.feed(chunk))
+    _emit(parser.close())
+
+    raw_report_text = parser.text
+    if ready_check is not None and not ready_check(raw_report_text):
+        raise RuntimeError("리포트 응답이 템플릿 끝(## 정리)까지 도착하지 않았습니다.")
+
+    return raw_report_text, parser.result()
+
+
+def select_and_report_stage(
+    api_key: str,
+    model_name: str,
+    candidate_paths: List[str],
+    ready_check: Optional[Callable[[str], bool]] = None,
+    json_mode: bool = False,
+) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    후보 이미지 전체를 한 요청으로 보내 최적 이미지 선택과 리포트 작성을 한 번에 받는다.
+    (후보 N장 기준 N+1번의 왕복 → 1번)
+    json_mode 이면 응답 스키마로 받고, 리포트 텍스트는 로컬에서 만든다.
+
+    Returns:
+        (선택된 후보 이미지 경로, 리포트 텍스트, parsed_report dict)
+
+    Raises:
+        RuntimeError: 선택 번호가 없거나 범위를 벗어난 경우, 리포트가 완성되지 않은 경우
+        ValueError: JSON 모드 응답이 깨진 경우
+    """
+    if json_mode:
+        parsed_data = _parse_json_report(run_select_and_report_model(
+            api_key=api_key,
+            model_name=model_name,
+            image_paths=candidate_paths,
+            prompt=build_select_and_report_json_prompt(len(candidate_paths)),
+            response_schema=SELECT_REPORT_RESPONSE_SCHEMA,
+        ))
+        raw_report_text = render_report_markdown(parsed_data)
+    else:
+        try:
+            raw_report_text = run_select_and_report_model(
+                api_key=api_key,
+                model_name=model_name,
+                image_paths=candidate_paths,
+                prompt=build_select_and_report_prompt(len(candidate_paths)),
+            )
+        except IncompleteReportError as e:
+            if ready_check is not None:
+                raise RuntimeError(str(e)) from e
+            raw_report_text = e.text
+
+        if ready_check is not None and not ready_check(raw_report_text):
+            raise RuntimeError("리포트 응답이 템플릿 끝(## 정리)까지 도착하지 않았습니다.")
+
+        parsed_data = parse_report_output(raw_report_text)
+    index = parsed_data.get("selected_image_index")
+    if index is None or not 0 <= index < len(candidate_paths):
+        raise RuntimeError(f"응답에서 유효한 선택 이미지 번호를 찾을 수 없습니다: {index}")
+
+    return candidate_paths[index], raw_report_text, parsed_data
+
+
+def repair_stage(
+    api_key: str,
+    model_name: str,
+    raw_report_text: str,
+    parsed_data: Dict[str, Any],
+    ready_check: Optional[Callable[[str], bool]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    빠진 섹션만 다시 요청해 채운 뒤 준비 상태를 확인한다. (REPORT_REPAIR_ENABLED 일 때 사용)
+
+    Raises:
+        RuntimeError: 보정 후에도 리포트가 템플릿 끝(## 정리)까지 채워지지 않은 경우
+    """
+    raw_report_text, parsed_data, repaired = repair_report(api_key, model_name, raw_report_text, parsed_data)
+    if repaired:
+        print(f"  리포트 보정 완료: {', '.join(repaired)}")
+
+    if ready_check is not None and not ready_check(raw_report_text):
+        raise RuntimeError("리포트 응답이 템플릿 끝(## 정리)까지 도착하지 않았습니다.")
+    return raw_report_text, parsed_data
+
+
+def generate_report(api_key: str, candidate_paths, workspace: Optional[Workspace] = None) -> Dict[str, Any]:
+    """
+    1단계(최적 이미지 선택)와 2단계(리포트 생성/파싱)를 실행하고 결과 파일을 세션 워크스페이스에 저장한다.
+    (workspace가 None이면 현재 디렉토리)
+
+    REPORT_COMBINED_SELECT가 켜져 있고 후보가 2장 이상 REPORT_COMBINED_MAX_IMAGES장 이하이면
+    두 단계를 한 번의 호출로 처리하고, 실패하면 기존 방식(후보별 가구 수 → 리포트)으로 진행한다.
+
+    REPORT_OUTPUT_MODE가 "json"이면 리포트를 응답 스키마(JSON)로 받고, 템플릿 형식 텍스트는 로컬에서 만든다.
+    JSON 응답이 깨졌으면 템플릿 모드로 한 번 더 요청한다.
+    REPORT_REPAIR_ENABLED이면 파싱 결과에 빠진 섹션만 텍스트 전용 요청으로 다시 받아 채운다.
+
+    저장 파일: selected_input_image.jpg, report_analysis_result.txt, parsed_report.json
+               (스트리밍 모드면 parsed_report_events.jsonl 추가)
+
+    Returns:
+        dict: 파싱된 리포트 (parsed_report.json 내용)
+
+    Raises:
+        RuntimeError: 유효한 입력 이미지가 없거나 리포트가 완성되지 않은 경우
+    """
+    workspace = resolve_workspace(workspace)
+    ready_check = is_report_complete if REPORT_READY_CHECK else None
+    json_mode = REPORT_OUTPUT_MODE == "json"
+    # 보정을 켜면 잘린 응답도 빠진 섹션을 채운 뒤에 판단하므로, 준비 상태 확인을 보정 뒤로 미룬다.
+    stage_ready_check = None if REPORT_REPAIR_ENABLED else ready_check
+
+    # ----- 0단계: 로컬 사전 필터 (흐림/노출 불량/중복 후보는 API 호출 전에 제외) ------
+    if SELECT_PREFILTER_ENABLED and len(candidate_paths) > 1:
+        prefiltered = prefilter_candidates(candidate_paths)
+        for item in prefiltered["dropped"]:
+            print(f"  사전 필터 제외: {item['path']} ({item['reason']})")
+        print(f"------ 사전 필터: {len(candidate_paths)}장 중 {len(prefiltered['kept'])}장 통과 ------")
+        candidate_paths = prefiltered["kept"]
+
+    # ----- 1+2단계 통합: 선택과 리포트를 한 번의 호출로 ------
+    existing_paths = [path for path in candidate_paths if os.path.exists(path)]
+    if REPORT_COMBINED_SELECT and 1 < len(existing_paths) <= REPORT_COMBINED_MAX_IMAGES:
+        print(f"------ {len(existing_paths)}장 선택 + 리포트 통합 호출 ------")
+        try:
+            best_image_path, raw_report_text, parsed_data = select_and_report_stage(
+                api_key=api_key,
+                model_name=REPORT_MODEL,
+                candidate_paths=existing_paths,
+                ready_check=stage_ready_check,
+                json_mode=json_mode,
+            )
+            if REPORT_REPAIR_ENABLED:
+                raw_report_text, parsed_data = repair_stage(
+                    api_key, REPORT_MODEL, raw_report_text, parsed_data, ready_check
+                )
+        except Exception as e:
+            print(f"통합 호출 실패, 기존 방식으로 진행합니다: {e}")
+        else:
+            selected_path = promote(workspace, best_image_path, SELECTED_IMAGE_PATH)
+            print(f" 최종 선택된 이미지: {best_image_path}")
+            print(f"    -> {selected_path}에 저장 완료.")
+            _save_report(workspace, raw_report_text, parsed_data)
+            return parsed_data
+
+    # ----- 1단계: N장의 후보 이미지 중 최적의 입력 이미지 1장 선택 ------
     final_input_path = select_best_image(
-        api_key=API_KEY, 
+        api_key=api_key, 
         model_name=REPORT_MODEL,        # 리포트는 Gemini-2.5-flash 사용
-        input_paths=INITIAL_IMAGE_PATHS,    # config에 정의된 사용자가 입력한 3장의 이미지
+        input_paths=candidate_paths,
         selected_output_path=SELECTED_IMAGE_PATH,
+        max_concurrency=SELECT_MAX_CONCURRENCY,
+        upload_max_edge=UPLOAD_MAX_EDGE_SELECT,
+        workspace=workspace,
     )
 
     if not final_input_path:
-        print("유효한 입력 이미지를 확인하세요.")
-        return
+        raise RuntimeError("유효한 입력 이미지를 확인하세요.")
 
     # ------ 2단계: 공간 분석 리포트 생성 ------
-    try:
-        # Gemini에 이미지 + 분석용 프롬프트 전달
-        raw_report_text = run_report_model(
-            api_key=API_KEY,
+    parsed_data = None
+    if json_mode:
+        # JSON 모드: 스키마로 받은 JSON을 그대로 parsed_report 로 사용
+        try:
+            raw_report_text, parsed_data = report_json_stage(
+                api_key=api_key,
+                model_name=REPORT_MODEL,
+                image_path=final_input_path,
+            )
+        except ValueError as e:
+            print(f"JSON 리포트를 사용할 수 없어 템플릿 모드로 다시 요청합니다: {e}")
+
+    if parsed_data is None and REPORT_STREAMING:
+        # 스트리밍 모드: 섹션이 완성될 때마다 이벤트 파일에 한 줄씩 추가 (프론트에서 tail 하여 먼저 표시)
+        with open(workspace.path(REPORT_EVENTS_PATH), "w", encoding="utf-8") as events_file:
+            def on_section(event):
+                print(f"  섹션 완료: {event['section']}")
+                events_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+                events_file.flush()
+
+            raw_report_text, parsed_data = stream_report_stage(
+                api_key=api_key,
+                model_name=REPORT_MODEL,
+                image_path=final_input_path,
+                prompt=report_prompt,
+                on_section=on_section,
+                ready_check=stage_ready_check,
+            )
+    elif parsed_data is None:
+        # Gemini에 이미지 + 분석용 프롬프트 전달 (응답이 완료되면 바로 반환)
+        raw_report_text = run_report_stage(
+            api_key=api_key,
             model_name=REPORT_MODEL, # 리포트는 Gemini-2.5-flash 사용
             image_path=final_input_path,  # 1단계에서 선택된 이미지 사용
             prompt=report_prompt,
+            ready_check=stage_ready_check,
         )
 
-        # Gemini 응답 대기 시간
-        time.sleep(10)
-
         # 전체 리포트 파싱
         parsed_data = parse_report_output(raw_report_text)
 
-        # 2-1) 리포트 원본 txt 저장
-        report_output_path = "report_analysis_result.txt"
-        with open(report_output_path, "w", encoding="utf-8") as f:
-            f.write(raw_report_text)
+    # 빠진 섹션이 있으면 그 섹션만 다시 요청해 채움 (전체 리포트 재요청 대신)
+    if REPORT_REPAIR_ENABLED:
+        raw_report_text, parsed_data = repair_stage(api_key, REPORT_MODEL, raw_report_text, parsed_data, ready_check)
+
+    _save_report(workspace, raw_report_text, parsed_data)
+    return parsed_data
 
-        # 2-2) 파싱된 전체 데이터를 JSON으로 저장
-        parsed_json_path = "parsed_report.json"
-        with open(parsed_json_path, "w", encoding="utf-8") as f:
-            json.dump(parsed_data, f, ensure_ascii=False, indent=4)
 
-        # --------------------------------------------------
+def _save_report(workspace: Workspace, raw_report_text: str, parsed_data: Dict[str, Any]) -> None:
+    # 2-1) 리포트 원본 txt 저장
+    workspace.write_text(REPORT_OUTPUT_PATH, raw_report_text)
 
+    # 2-2) 파싱된 전체 데이터를 JSON으로 저장
+    workspace.write_json(PARSED_REPORT_PATH, parsed_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="최적 이미지 선택 + 공간 분석 리포트")
+    parser.add_argument("--session", default=None, help="세션 ID (결과를 sessions/<ID>/ 에 저장, 없으면 현재 디렉토리)")
+    args = parser.parse_args()
+    workspace = workspace_from_args(args.session)
+
+    # INITIAL_IMAGE_DIR가 지정되어 있으면 디렉토리 안의 모든 프레임을, 아니면 config의 고정 리스트를 사용
+    if INITIAL_IMAGE_DIR:
+        candidate_paths = collect_candidate_paths(INITIAL_IMAGE_DIR)
+    else:
+        candidate_paths = INITIAL_IMAGE_PATHS
+
+    try:
+        generate_report(API_KEY, candidate_paths, workspace=workspace)
     except Exception as e:
-        print(f"2단계 (리포트 분석) 중 에러 발생: {e}")
+        print(f"리포트 단계 중 에러 발생: {e}")
         # 에러 시 그냥 종료
         return
+    finally:
+        workspace.save_metrics()
+
+    # 사용자가 스타일을 고르는 동안 예상 스타일을 미리 생성 (별도 프로세스, 이 스크립트는 바로 종료)
+    if PREGEN_ENABLED:
+        launch_pregeneration_process(workspace)
+        print("예상 스타일 선행 생성을 백그라운드에서 시작했습니다.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,278 @@
+"""
+파이프라인 상주 서비스.
+
+main_*.py 를 클릭마다 새 프로세스로 실행하면 매번 인터프리터 시작, google.genai / PIL 임포트,
+클라이언트 생성, parsed_report.json 다시 읽기 비용을 낸다.
+이 스크립트는 한 프로세스를 띄워 두고 같은 작업을 HTTP(JSON)로 제공한다.
+- GenAI 클라이언트: 프로세스 공유 클라이언트(common.genai_client.get_client)를 시작할 때 미리 만들어 재사용
+- 전처리한 업로드 이미지: common.image_preprocess.prepare_image 메모이즈를 요청 간에 그대로 재사용
+- parsed_report: 세션별로 메모리에 보관 (없을 때만 세션 워크스페이스의 parsed_report.json 을 읽음)
+
+엔드포인트 (모두 세션 워크스페이스 sessions/<session>/ 의 파일을 읽고 쓴다):
+    POST /report       {"session": "user42", "images": ["a.jpg", ...]}     (images 생략 시 config의 입력 이미지)
+    POST /new-look     {"session": "user42", "style_choice": {"selected_style": "AI 추천"}}
+    POST /modify-look  {"session": "user42", "user_choice": {"use_add": true, "use_remove": false, "use_change": true}}
+    POST /side-views   {"session": "user42"}                                 (img4new3r_org.png 기준 좌/우 재생성)
+    GET  /metrics      Prometheus 텍스트
+    GET  /health
+
+응답은 {"ok": true, "result": ...} 또는 {"ok": false, "error": "..."}.
+
+실행:
+    python main_service.py --port 8080
+    python main_service.py --stub        (로컬 Gemini 스텁 서버를 띄워서 실제 API 대신 사용)
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import config
+from common.genai_client import get_client
+from common.metrics import get_metrics
+from common.workspace import Workspace, create_session
+from main_1img23 import make_one_image_to_three
+from main_modify_looks import run_modify_look
+from main_new_looks import run_new_look
+from main_report import generate_report
+from report.utils.image_selector import collect_candidate_paths
+from style.style_pregen import start_pregeneration
+
+PARSED_REPORT_PATH = "parsed_report.json"
+ORG_IMAGE_PATH = "img4new3r_org.png"
+
+# 세션 ID는 sessions/<ID>/ 디렉토리 이름으로 쓰이므로 경로 문자를 허용하지 않는다.
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ServiceError(Exception):
+    """요청을 처리할 수 없을 때 HTTP 상태 코드와 함께 올리는 예외."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class PipelineService:
+    """
+    요청 사이에 유지되는 상태.
+
+    - 세션별 parsed_report (최근 config.SERVICE_MAX_SESSIONS 개, LRU)
+    - 세션별 잠금: 같은 세션의 파일(img4new3r_org.png 등)을 두 요청이 동시에 쓰지 않도록 직렬화
+      (서로 다른 세션은 동시에 처리)
+    """
+
+    def __init__(self, max_sessions: int = 256):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._reports: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._session_locks: Dict[str, threading.Lock] = {}
+        self.started_at = time.time()
+        self.requests = 0
+
+    def warm_up(self) -> None:
+        """첫 요청이 클라이언트 생성 비용을 내지 않도록 미리 만들어 둔다."""
+        get_client(config.API_KEY)
+
+    def workspace(self, body: Dict[str, Any]) -> Workspace:
+        session_id = body.get("session")
+        if not isinstance(session_id, str) or not _SESSION_ID_RE.match(session_id):
+            raise ServiceError(400, "session 값이 필요합니다. (영문/숫자 ID)")
+        return create_session(session_id)
+
+    def session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = self._session_locks[session_id] = threading.Lock()
+            return lock
+
+    def remember_report(self, session_id: str, parsed_report: Dict[str, Any]) -> None:
+        with self._lock:
+            self._reports[session_id] = parsed_report
+            self._reports.move_to_end(session_id)
+            while len(self._reports) > self.max_sessions:
+                self._reports.popitem(last=False)
+
+    def parsed_report(self, workspace: Workspace) -> Dict[str, Any]:
+        """메모리에 있으면 그대로, 없으면 워크스페이스의 parsed_report.json 을 읽어 보관한다."""
+        with self._lock:
+            parsed_report = self._reports.get(workspace.session_id)
+            if parsed_report is not None:
+                self._reports.move_to_end(workspace.session_id)
+                return parsed_report
+        if not workspace.exists(PARSED_REPORT_PATH):
+            raise ServiceError(404, "parsed_report.json 이 없습니다. /report 를 먼저 호출하세요.")
+        parsed_report = workspace.read_json(PARSED_REPORT_PATH)
+        self.remember_report(workspace.session_id, parsed_report)
+        return parsed_report
+
+    # ------ 작업 ------
+
+    def report(self, workspace: Workspace, body: Dict[str, Any]) -> Dict[str, Any]:
+        images = body.get("images")
+        if not images:
+            images = collect_candidate_paths(config.INITIAL_IMAGE_DIR) if config.INITIAL_IMAGE_DIR else config.INITIAL_IMAGE_PATHS
+        parsed_report = generate_report(config.API_KEY, images, workspace=workspace)
+        self.remember_report(workspace.session_id, parsed_report)
+        if config.PREGEN_ENABLED:
+            # 응답은 바로 보내고, 예상 스타일은 같은 프로세스의 백그라운드 스레드에서 미리 생성
+            start_pregeneration(parsed_report, workspace)
+        return {"parsed_report": parsed_report, "selected_image": workspace.path(config.SELECTED_IMAGE_PATH)}
+
+    def new_look(self, workspace: Workspace, body: Dict[str, Any]) -> Dict[str, Any]:
+        style_choice = body.get("style_choice") or {"selected_style": "AI 추천"}
+        return run_new_look(self.parsed_report(workspace), style_choice, workspace=workspace)
+
+    def modify_look(self, workspace: Workspace, body: Dict[str, Any]) -> Dict[str, Any]:
+        user_choice = body.get("user_choice")
+        if not isinstance(user_choice, dict):
+            raise ServiceError(400, "user_choice 값이 필요합니다.")
+        return run_modify_look(self.parsed_report(workspace), user_choice, workspace=workspace)
+
+    def side_views(self, workspace: Workspace, body: Dict[str, Any]) -> Dict[str, Any]:
+        if not workspace.exists(ORG_IMAGE_PATH):
+            raise ServiceError(404, f"{ORG_IMAGE_PATH} 이 없습니다. /new-look 또는 /modify-look 을 먼저 호출하세요.")
+        return make_one_image_to_three(
+            config.API_KEY, config.STYLE_MODEL, workspace.path(ORG_IMAGE_PATH), workspace=workspace
+        )
+
+    def handle(self, operation: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        workspace = self.workspace(body)
+        with self._lock:
+            self.requests += 1
+        with self.session_lock(workspace.session_id):
+            return getattr(self, operation)(workspace, body)
+
+
+# URL → PipelineService 메서드 이름
+ROUTES = {
+    "/report": "report",
+    "/new-look": "new_look",
+    "/modify-look": "modify_look",
+    "/side-views": "side_views",
+}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "PipelineService/1.0"
+
+    @property
+    def service(self) -> PipelineService:
+        return self.server.service
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body = get_metrics().prometheus_text().encode("utf-8")
+            self._send(200, body, "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/health":
+            self._send_json(200, {
+                "ok": True,
+                "uptime_s": time.time() - self.service.started_at,
+                "requests": self.service.requests,
+            })
+        else:
+            self._send_json(404, {"ok": False, "error": f"알 수 없는 경로: {path}"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        operation = ROUTES.get(path)
+        if operation is None:
+            self._send_json(404, {"ok": False, "error": f"알 수 없는 경로: {path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("JSON 객체가 아닙니다.")
+        except ValueError as e:
+            self._send_json(400, {"ok": False, "error": f"요청 본문을 읽을 수 없습니다: {e}"})
+            return
+
+        start = time.perf_counter()
+        try:
+            result = self.service.handle(operation, body)
+        except ServiceError as e:
+            self._send_json(e.status, {"ok": False, "error": str(e)})
+        except FileNotFoundError as e:
+            self._send_json(404, {"ok": False, "error": str(e)})
+        except Exception as e:
+            print(f"[service] {path} 처리 중 에러 발생: {e}")
+            self._send_json(500, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+        else:
+            self._send_json(200, {"ok": True, "result": result, "seconds": time.perf_counter() - start})
+
+    def _send_json(self, status: int, data: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """서비스 상태(PipelineService)를 붙인 HTTP 서버를 만든다. (클라이언트는 미리 생성)"""
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.service = PipelineService(max_sessions=config.SERVICE_MAX_SESSIONS)
+    server.service.warm_up()
+    server.daemon_threads = True
+    return server
+
+
+def start_service(host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    백그라운드 스레드에서 서비스를 띄운다. (테스트/벤치마크에서 같은 프로세스 안에 띄울 때 사용)
+    종료 시 server.shutdown() 호출. 실제 포트는 server.server_address[1].
+    """
+    server = create_server(host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="리포트/스타일 변경/부분 수정/좌우 뷰를 제공하는 상주 HTTP 서비스")
+    parser.add_argument("--host", default=config.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    parser.add_argument("--base-url", default=None, help="GenAI 엔드포인트 (로컬 스텁 서버 등)")
+    parser.add_argument("--stub", action="store_true", help="로컬 Gemini 스텁 서버를 띄워서 사용")
+    args = parser.parse_args()
+
+    stub = None
+    if args.stub:
+        from bench.fake_gemini import start_fake_server
+        stub, config.GENAI_BASE_URL = start_fake_server()
+        print(f"로컬 스텁 서버 사용: {config.GENAI_BASE_URL}")
+    elif args.base_url:
+        config.GENAI_BASE_URL = args.base_url
+
+    server = create_server(args.host, args.port)
+    print(f"서비스 시작: http://{args.host}:{server.server_address[1]}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n서비스 종료")
+    finally:
+        server.server_close()
+        if stub is not None:
+            stub.shutdown()
+            stub.server_close()
+        # 실행 동안 모인 metrics 를 세션 루트에 저장
+        Workspace(config.SESSIONS_DIR).save_metrics()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,155 @@
-from google import genai
+from typing import Iterator, List
+
 from google.genai import types
 
-# 보고서 모델을 실행하는 함수
-def run_report_model(api_key, model_name, image_path, prompt):
-    client = genai.Client(api_key=api_key) # 제공된 API 키로 client 초기화
-
-    with open(image_path, "rb") as f:
-        img_bytes = f.read()
-
-    # Gemini 모델에 콘텐츠를 생성하도록 요청
-    response = client.models.generate_content(
-        model=model_name,
-        contents=[
-            types.Part.from_bytes(
-                data=img_bytes,
-                mime_type="image/jpeg"
-            ),
-            prompt
-        ]
+import config
+from common.genai_client import generate_content, generate_content_stream, get_client
+from common.image_handles import image_part
+from common.image_preprocess import prepare_image
+from common.response_cache import cached_call, get_response_cache, make_cache_key
+from report.report_schema import parse_report_json, response_config
+from report.utils.report_parser import is_report_complete
+
+
+class IncompleteReportError(ValueError):
+    """
+    리포트 응답이 템플릿 끝까지 오지 않은 경우. 이런 응답은 캐시에 저장하지 않는다.
+    받은 텍스트는 .text 로 남겨 두어 호출부가 그대로 쓰거나 다시 요청할 수 있다.
+    """
+
+    def __init__(self, message: str, text: str):
+        super().__init__(message)
+        self.text = text
+
+
+def _checked_report_bytes(text, response_schema=None) -> bytes:
+    """
+    캐시에 넣기 전에 응답을 검사한다. 잘린 응답은 예외로 던져 cached_call 이 저장하지 않게 한다.
+
+    Raises:
+        IncompleteReportError: 템플릿 끝(## 정리)까지 오지 않은 경우,
+                               JSON 모드에서 JSON이 깨졌고(잘림 포함) 템플릿 텍스트로도 완성되지 않은 경우
+    """
+    if response_schema is not None:
+        try:
+            parse_report_json(text)
+        except ValueError as e:
+            # 모델이 스키마 대신 완성된 템플릿 텍스트로 답한 경우는 그대로 쓴다. (main_report._parse_json_report)
+            if not is_report_complete(text):
+                raise IncompleteReportError(str(e), text) from e
+    elif not is_report_complete(text):
+        raise IncompleteReportError("리포트 응답이 템플릿 끝(## 정리)까지 도착하지 않았습니다.", text)
+    return text.encode("utf-8")
+
+
+def _prepare_report_image(image_path):
+    # 리포트 분석에는 원본 해상도가 필요 없으므로 축소/재인코딩 후 실제 MIME 타입으로 업로드
+    return prepare_image(
+        image_path,
+        max_edge=config.UPLOAD_MAX_EDGE_REPORT,
+        output_format=config.UPLOAD_FORMAT,
+        quality=config.UPLOAD_QUALITY,
     )
 
+
+def _generation_config(response_schema):
+    # response_schema 가 있으면 JSON 모드 (응답이 스키마 구조의 JSON 텍스트로 옴)
+    if response_schema is None:
+        return None, None
+    config_dict = response_config(response_schema)
+    return types.GenerateContentConfig(**config_dict), config_dict
+
+
+# 보고서 모델을 실행하는 함수
+# 응답이 잘렸으면 (캐시에 저장하지 않고) IncompleteReportError 를 던진다.
+def run_report_model(api_key, model_name, image_path, prompt, use_cache=True, response_schema=None):
+    client = get_client(api_key) # 공유 클라이언트 재사용 (커넥션 유지)
+    generation_config, config_dict = _generation_config(response_schema)
+
+    img_bytes, mime_type = _prepare_report_image(image_path)
+
+    def _call() -> bytes:
+        # Gemini 모델에 콘텐츠를 생성하도록 요청
+        response = generate_content(
+            client,
+            model_name,
+            [
+                image_part(client, img_bytes, mime_type, stage="report"),
+                prompt
+            ],
+            generation_config,
+            stage="report",
+        )
+        return _checked_report_bytes(response.text or "", response_schema)
+
+    # 같은 이미지 + 프롬프트(+ 응답 스키마)로 이미 받은 리포트가 있으면 캐시에서 재사용
+    report_bytes = cached_call(model_name, img_bytes, prompt, config_dict, _call, use_cache=use_cache)
+
     # 모델 응답의 텍스트 부분 반환
-    return response.text
+    return report_bytes.decode("utf-8")
+
+
+def run_select_and_report_model(api_key, model_name, image_paths: List[str], prompt, use_cache=True, response_schema=None):
+    """
+    후보 이미지 여러 장을 한 요청에 담아, 최적 이미지 선택과 리포트 작성을 한 번의 호출로 받는다.
+    각 이미지 앞에 "[이미지 i]" 라벨을 붙여 프롬프트의 번호와 맞춘다. (i는 1부터)
+    response_schema 를 주면 JSON 모드로 받는다.
+
+    Raises:
+        IncompleteReportError: 응답이 잘린 경우 (캐시에 저장하지 않음)
+    """
+    client = get_client(api_key)
+    generation_config, config_dict = _generation_config(response_schema)
+
+    prepared = [_prepare_report_image(path) for path in image_paths]
+
+    def _call() -> bytes:
+        # 캐시에 없을 때만 이미지 Part를 만든다. (USE_FILE_HANDLES 면 이때 업로드)
+        contents = []
+        for idx, (img_bytes, mime_type) in enumerate(prepared, start=1):
+            contents.append(f"[이미지 {idx}]")
+            contents.append(image_part(client, img_bytes, mime_type, stage="select_report"))
+        contents.append(prompt)
+        response = generate_content(client, model_name, contents, generation_config, stage="select_report")
+        return _checked_report_bytes(response.text or "", response_schema)
+
+    report_bytes = cached_call(model_name, [img for img, _ in prepared], prompt, config_dict, _call, use_cache=use_cache)
+    return report_bytes.decode("utf-8")
+
+
+def stream_report_model(api_key, model_name, image_path, prompt, use_cache=True) -> Iterator[str]:
+    """
+    리포트를 generate_content_stream으로 받아, 도착하는 텍스트 조각을 차례대로 yield 한다.
+    캐시에 같은 요청의 리포트가 있으면 전체 텍스트를 한 번에 yield 한다.
+    스트림이 템플릿 끝(## 정리)까지 도착했을 때만 run_report_model과 같은 캐시 키로 저장한다.
+    """
+    client = get_client(api_key)
+
+    img_bytes, mime_type = _prepare_report_image(image_path)
+
+    cache = get_response_cache() if use_cache else None
+    key = make_cache_key(model_name, img_bytes, prompt, None) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached.decode("utf-8")
+            return
+
+    chunks = []
+    for chunk in generate_content_stream(
+        client,
+        model_name,
+        [
+            image_part(client, img_bytes, mime_type, stage="report"),
+            prompt
+        ],
+        stage="report",
+    ):
+        text = chunk.text or ""
+        if text:
+            chunks.append(text)
+            yield text
+
+    full_text = "".join(chunks)
+    if cache is not None and is_report_complete(full_text):
+        cache.put(key, full_text.encode("utf-8"))
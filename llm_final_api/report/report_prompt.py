@@ -45,4 +45,50 @@ report_prompt = """
 -----------------------------------------
 
 위 템플릿의 고정된 구조는 절대 변경하지 말고, {{ }} 안의 내용만 이미지 분석으로 채워라.
-"""
\ No newline at end of file
+"""
+
+# 선택 + 리포트 통합 프롬프트: 후보 이미지 N장을 한 번에 보내고, 최적 이미지 선택과 리포트 작성을 한 응답으로 받는다.
+def build_select_and_report_prompt(num_images: int) -> str:
+    return f"""
+너에게 같은 방을 여러 각도에서 찍은 사진 {num_images}장이 [이미지 1] ~ [이미지 {num_images}] 순서로 주어졌다.
+
+먼저, 가구(침대, 소파, 테이블, 의자, 선반, TV, 주요 조명 등)와 주요 데코 요소가
+가장 많이 보이고 공간 분석에 가장 적합한 사진 1장을 골라라.
+응답의 첫 줄에는 반드시 아래 형식으로 고른 사진의 번호만 출력하라.
+
+# 선택한 이미지: {{번호}}
+
+그 다음 줄부터는 고른 사진 1장만을 분석하여 아래 지시와 템플릿대로 리포트를 작성하라.
+""" + report_prompt
+
+
+# JSON 모드(REPORT_OUTPUT_MODE = "json") 리포트 프롬프트: 출력 구조는 응답 스키마(report/report_schema.py)가 강제하므로
+# 프롬프트에는 각 필드에 채울 내용만 적는다. (Markdown 텍스트는 받은 JSON으로 로컬에서 만든다)
+report_json_prompt = """
+너는 공간 분석가이자 인테리어 전문가이다.
+이미지를 분석하여 주어진 JSON 스키마에 맞춰 결과를 작성하라. 모든 값은 한국어로 쓴다.
+
+- general_style: 전체 분위기를 '{분위기1}하고 {분위기2}한 {분위기3}' 형식으로 (예: '따뜻하고 아늑한 북유럽')
+- mood_words: general_style 의 분위기 단어 3개
+- mood_details: 분위기 3개 각각의 이름(word), 확률(percentage, 정수 %, 합 100), 한 문장 설명(description)
+- basis: 분위기 판단 근거 — furniture_layout(가구 배치 및 공간 분석), color_texture(색감 및 질감), material(소재)
+- recommendations_add: 현재 분위기에 맞춰 추가하면 좋을 가구 1개와 근거(한 문장)
+- recommendations_remove: 제거하면 좋을 가구 1개와 근거(한 문장)
+- recommendations_change: 바꿨으면 하는 가구(from_item)와 추천 가구(to_item), 근거(한 문장) 1개
+- recommended_styles: 추천 분위기(style) 1개와 소개 및 추천 근거(한 문장)
+- summary: summary1(전체 분위기 한 문장), summary2(공간의 강점 또는 잘 구현된 요소 한 문장),
+           summary3(아쉬운 점을 기반으로 현실적인 개선 방향 한 문장)
+
+가구 추천의 근거와 summary 는 mood_details 와 basis 를 종합한 내용으로 작성하라.
+스키마 외의 설명이나 여분 문장을 출력하지 마라.
+"""
+
+
+def build_select_and_report_json_prompt(num_images: int) -> str:
+    return f"""
+너에게 같은 방을 여러 각도에서 찍은 사진 {num_images}장이 [이미지 1] ~ [이미지 {num_images}] 순서로 주어졌다.
+
+먼저, 가구(침대, 소파, 테이블, 의자, 선반, TV, 주요 조명 등)와 주요 데코 요소가
+가장 많이 보이고 공간 분석에 가장 적합한 사진 1장을 골라 그 번호를 selected_image 에 넣어라.
+나머지 필드는 고른 사진 1장만을 분석하여 아래 지시대로 작성하라.
+""" + report_json_prompt
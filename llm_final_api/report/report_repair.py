@@ -0,0 +1,191 @@
+"""
+파싱된 리포트에서 빠진 섹션만 다시 요청해 채우는 부분 보정(repair) 단계.
+
+응답이 중간에 잘리거나 모델이 템플릿 일부를 건너뛰면 parse_report_output 결과에서
+recommendations_change, recommended_styles 같은 키가 빠진다. 전체 리포트를 이미지와 함께 다시 받는 대신,
+이미 받은 리포트를 맥락으로 주고 빠진 템플릿 섹션만 텍스트 전용 요청으로 받아 합친다.
+(이미지 업로드 없음, 출력 토큰도 빠진 섹션만큼만)
+리포트 텍스트는 보정한 섹션만 원래 자리에 끼워 넣고, 나머지 원문은 그대로 둔다.
+"""
+from typing import Any, Dict, List, Tuple
+
+import config
+from common.genai_client import generate_content, get_client
+from common.response_cache import cached_call
+from report.report_client import IncompleteReportError
+from report.report_prompt import report_prompt
+from report.utils.report_parser import (
+    SECTION_ADD,
+    SECTION_BASIS,
+    SECTION_CHANGE,
+    SECTION_MOOD,
+    SECTION_OVERALL,
+    SECTION_REMOVE,
+    SECTION_STYLES,
+    SECTION_SUMMARY,
+    assemble_report,
+    find_report_sections,
+    parse_report_output,
+    split_report_sections,
+)
+
+# 섹션 ID -> 그 섹션이 채우는 parsed_report 키
+SECTION_KEYS = {
+    SECTION_OVERALL: ["general_style", "mood_words"],
+    SECTION_MOOD: ["mood_details"],
+    SECTION_BASIS: ["basis"],
+    SECTION_ADD: ["recommendations_add"],
+    SECTION_REMOVE: ["recommendations_remove"],
+    SECTION_CHANGE: ["recommendations_change"],
+    SECTION_STYLES: ["recommended_styles"],
+    SECTION_SUMMARY: ["summary"],
+}
+
+
+def _template_sections() -> Dict[str, str]:
+    """report_prompt 템플릿을 섹션별 원문(제목 줄 + 본문)으로 나눈다."""
+    sections = {}
+    for section_id, title, body in split_report_sections(report_prompt):
+        heading = "# " if section_id == SECTION_OVERALL else "## "
+        # 마지막 섹션 뒤의 구분선/안내 문장은 제외
+        body = body.split("-----", 1)[0].strip()
+        sections[section_id] = (heading + title + "\n" + body).strip()
+    return sections
+
+
+TEMPLATE_SECTIONS = _template_sections()
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _unfilled_sections(parsed: Dict[str, Any], section_ids) -> List[str]:
+    return [
+        section_id
+        for section_id in section_ids
+        if any(_is_empty(parsed.get(key)) for key in SECTION_KEYS[section_id])
+    ]
+
+
+def find_missing_sections(parsed: Dict[str, Any]) -> List[str]:
+    """키가 없거나 비어 있는 템플릿 섹션 ID 목록을 템플릿 순서대로 반환한다. 없으면 빈 리스트."""
+    return _unfilled_sections(parsed, SECTION_KEYS)
+
+
+def splice_sections(raw_report_text: str, reply_text: str, section_ids: List[str]) -> str:
+    """
+    보정 응답에서 section_ids 섹션의 원문(제목 줄 + 본문)을 꺼내 리포트에 끼워 넣는다.
+    리포트에 이미 있는 (비었거나 잘린) 같은 섹션은 교체하고, 없던 섹션은 템플릿 순서상 뒤에 오는
+    첫 섹션 앞에(없으면 맨 끝에) 넣는다. 그 밖의 원문은 한 글자도 바꾸지 않는다.
+    """
+    fragments = {
+        section_id: reply_text[start:end].strip()
+        for section_id, _, start, _, end in find_report_sections(reply_text)
+    }
+    order = list(SECTION_KEYS)
+    text = raw_report_text
+    for section_id in section_ids:
+        fragment = fragments.get(section_id)
+        if not fragment:
+            continue
+        spans = {sid: (start, end) for sid, _, start, _, end in find_report_sections(text)}
+        if section_id in spans:
+            start, end = spans[section_id]
+        else:
+            later = [spans[sid][0] for sid in order[order.index(section_id) + 1:] if sid in spans]
+            start = end = min(later) if later else len(text)
+        before = text[:start].rstrip()
+        after = text[end:].strip("\n")
+        text = (before + "\n\n" if before else "") + fragment + ("\n\n" + after if after else "\n")
+    return text
+
+
+def build_repair_prompt(raw_report_text: str, missing_sections: List[str]) -> str:
+    """이전 리포트를 맥락으로 주고, 빠진 섹션의 템플릿만 채우도록 하는 텍스트 프롬프트."""
+    templates = "\n\n".join(TEMPLATE_SECTIONS[section_id] for section_id in missing_sections)
+    return f"""
+너는 공간 분석가이자 인테리어 전문가이다.
+아래는 네가 방 사진 한 장을 분석해 작성하던 리포트인데, 일부 섹션이 빠지거나 중간에 잘렸다.
+
+-----------------------------------------
+{raw_report_text.strip()}
+-----------------------------------------
+
+위 리포트의 분석 내용과 일관되게, 아래 섹션들만 템플릿 그대로 작성하라.
+제목, 번호, 줄바꿈 등 템플릿 형식은 바꾸지 말고 중괄호 {{ }} 안의 내용만 채워라.
+(((종합)))은 위 리포트의 '1. 분위기 정의 및 유형별 확률'과 '2. 분위기 판단 근거'를 종합한 내용이다.
+아래에 없는 섹션이나 추가 설명은 출력하지 마라.
+
+-----------------------------------------
+
+{templates}
+"""
+
+
+def repair_report(
+    api_key: str,
+    model_name: str,
+    raw_report_text: str,
+    parsed: Dict[str, Any],
+    use_cache: bool = True,
+) -> Tuple[str, Dict[str, Any], List[str]]:
+    """
+    빠진 섹션이 있으면 그 섹션만 텍스트 전용 요청으로 받아 parsed 에 합친다.
+    최대 config.REPORT_REPAIR_MAX_ATTEMPTS 번, 매번 아직 빠진 섹션만 요청한다.
+
+    Returns:
+        (리포트 텍스트, 합친 parsed_report dict, 보정한 섹션 ID 목록)
+        리포트 텍스트는 원문에 보정한 섹션만 끼워 넣은 것이고(splice_sections),
+        parsed 의 해당 섹션 키도 보정 응답 값으로 바뀐다. 나머지 섹션의 원문과 키는 그대로.
+    """
+    missing = find_missing_sections(parsed)
+    if not missing:
+        return raw_report_text, parsed, []
+
+    client = get_client(api_key)
+    merged = dict(parsed)
+    repaired: List[str] = []
+    report_text = raw_report_text
+
+    for attempt in range(1, config.REPORT_REPAIR_MAX_ATTEMPTS + 1):
+        print(f"  리포트 보정 {attempt}회차: 빠진 섹션 {', '.join(missing)} 만 다시 요청")
+        prompt = build_repair_prompt(raw_report_text, missing)
+
+        def _call() -> bytes:
+            response = generate_content(client, model_name, [prompt], stage="report_repair")
+            reply_text = response.text or ""
+            # 요청한 섹션이 하나라도 비어 있으면 캐시에 저장하지 않는다. (받은 부분은 아래에서 그대로 합침)
+            unfilled = _unfilled_sections(parse_report_output(reply_text), missing)
+            if unfilled:
+                raise IncompleteReportError(f"보정 응답에 섹션이 빠져 있습니다: {', '.join(unfilled)}", reply_text)
+            return reply_text.encode("utf-8")
+
+        try:
+            reply = cached_call(model_name, None, prompt, None, _call, use_cache=use_cache).decode("utf-8")
+        except IncompleteReportError as e:
+            print(f"  {e}")
+            reply = e.text
+        except Exception as e:
+            print(f"  리포트 보정 요청 실패: {e}")
+            break
+
+        fragments = parse_report_output(reply)
+        filled = [section_id for section_id in missing if section_id not in _unfilled_sections(fragments, [section_id])]
+        for section_id in filled:
+            # 섹션 원문을 통째로 교체하므로 키도 보정 응답 값으로 맞춘다.
+            for key in SECTION_KEYS[section_id]:
+                merged[key] = fragments[key]
+        report_text = splice_sections(report_text, reply, filled)
+        repaired.extend(filled)
+
+        missing = find_missing_sections(merged)
+        if not missing:
+            break
+
+    if not repaired:
+        return raw_report_text, parsed, []
+
+    # parsed_report.json 과 같은 키 순서로 정리 (선택 번호 등 확장 필드는 뒤에 붙음)
+    merged = assemble_report(merged)
+    return report_text, merged, repaired
@@ -0,0 +1,141 @@
+"""
+리포트를 JSON으로 받는 모드(REPORT_OUTPUT_MODE = "json")용 응답 스키마, 파서, Markdown 렌더러.
+
+모델에 response_mime_type="application/json" + response_schema 를 주면 응답이 parsed_report.json 과
+같은 구조의 JSON으로 오므로, 정규식 파싱 없이 json.loads 한 번으로 끝난다.
+report_analysis_result.txt 는 기존 템플릿(report_prompt)과 같은 형식으로 로컬에서 만들어 저장한다.
+"""
+import json
+from typing import Any, Dict, List
+
+from report.utils.report_parser import BASIS_KEY_MAPPING, assemble_report
+
+# ------ 응답 스키마 (Gemini Schema 형식, parsed_report.json 과 같은 키) ------
+
+_STRING = {"type": "STRING"}
+
+
+def _object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    # 모든 필드 필수, 키 순서도 고정 (출력 순서가 parsed_report.json 과 같도록)
+    return {
+        "type": "OBJECT",
+        "properties": properties,
+        "required": list(properties),
+        "property_ordering": list(properties),
+    }
+
+
+def _array(item: Dict[str, Any], min_items: int = 1) -> Dict[str, Any]:
+    return {"type": "ARRAY", "items": item, "min_items": min_items}
+
+
+# BASIS_KEY_MAPPING 의 역방향 (저장 키 -> 템플릿 항목명)
+BASIS_LABELS = {key: label for label, key in BASIS_KEY_MAPPING.items()}
+SUMMARY_KEYS = ["summary1", "summary2", "summary3"]
+
+_REPORT_PROPERTIES = {
+    "general_style": {
+        "type": "STRING",
+        "description": "'{분위기1}하고 {분위기2}한 {분위기3}' 형식의 전체 분위기 (끝에 '스타일'은 붙이지 않음)",
+    },
+    "mood_words": _array(_STRING),
+    "mood_details": _array(_object({
+        "word": _STRING,
+        "percentage": {"type": "INTEGER"},
+        "description": _STRING,
+    })),
+    "basis": _object({key: _STRING for key in BASIS_LABELS}),
+    "recommendations_add": _array(_object({"item": _STRING, "reason": _STRING})),
+    "recommendations_remove": _array(_object({"item": _STRING, "reason": _STRING})),
+    "recommendations_change": _array(_object({"from_item": _STRING, "to_item": _STRING, "reason": _STRING})),
+    "recommended_styles": _array(_object({"style": _STRING, "reason": _STRING})),
+    "summary": _object({key: _STRING for key in SUMMARY_KEYS}),
+}
+
+REPORT_RESPONSE_SCHEMA = _object(_REPORT_PROPERTIES)
+
+# 선택 + 리포트 통합 모드: 고른 사진 번호(1부터)를 맨 앞에 추가
+SELECT_REPORT_RESPONSE_SCHEMA = _object({
+    "selected_image": {"type": "INTEGER", "description": "고른 사진의 번호 ([이미지 i]의 i, 1부터)"},
+    **_REPORT_PROPERTIES,
+})
+
+
+def response_config(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """GenerateContentConfig 인자 겸 캐시 키용 생성 설정."""
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+# ------ JSON 응답 파싱 ------
+
+def parse_report_json(result_text: str) -> Dict[str, Any]:
+    """
+    JSON 모드 응답을 parsed_report dict 로 바꾼다. (키 순서는 parse_report_output 과 같음)
+    통합 모드 응답의 selected_image(1부터)는 selected_image_index(0부터)로 바꾼다.
+
+    Raises:
+        ValueError: JSON이 아니거나(응답이 잘린 경우 포함) 필수 키가 빠진 경우
+    """
+    try:
+        data = json.loads(result_text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"리포트 JSON 파싱 실패: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("리포트 JSON의 최상위가 객체가 아닙니다.")
+
+    missing = [key for key in _REPORT_PROPERTIES if key not in data]
+    if missing:
+        raise ValueError(f"리포트 JSON에 필수 키가 없습니다: {', '.join(missing)}")
+
+    fragments = dict(data)
+    selected = fragments.pop("selected_image", None)
+    if selected is not None:
+        fragments["selected_image_index"] = int(selected) - 1
+    return assemble_report(fragments)
+
+
+# ------ Markdown 렌더링 (report_prompt 템플릿과 같은 형식) ------
+
+def render_report_markdown(parsed: Dict[str, Any]) -> str:
+    """
+    parsed_report dict 를 report_prompt 템플릿 형식의 텍스트로 만든다.
+    결과를 parse_report_output 으로 다시 파싱하면 같은 dict 가 나온다. (selected_image_index 포함)
+    """
+    lines: List[str] = []
+
+    index = parsed.get("selected_image_index")
+    if index is not None:
+        lines += [f"# 선택한 이미지: {index + 1}", ""]
+
+    if parsed.get("general_style"):
+        lines += [f"# 전체적인 분위기는 **{parsed['general_style']} 스타일**입니다.", ""]
+
+    lines.append("## 1. 분위기 정의 및 유형별 확률")
+    for item in parsed.get("mood_details") or []:
+        lines.append(f"- {item['word']}({item['percentage']}%): {item['description']}")
+
+    lines += ["", "## 2. 분위기 판단 근거"]
+    for key, value in (parsed.get("basis") or {}).items():
+        lines.append(f"- {BASIS_LABELS.get(key, key)} : {value}")
+
+    lines += ["", "## 3-1. 현재 분위기에 맞춰 추가하면 좋을 가구 추천"]
+    for item in parsed.get("recommendations_add") or []:
+        lines.append(f"- {item['item']} : {item['reason']}")
+
+    lines += ["", "## 3-2. 제거하면 좋을 가구 추천"]
+    for item in parsed.get("recommendations_remove") or []:
+        lines.append(f"- {item['item']} : {item['reason']}")
+
+    lines += ["", "## 3-3. 분위기별 바꿨으면 하는 가구 추천"]
+    for item in parsed.get("recommendations_change") or []:
+        lines.append(f"- {item['from_item']} -> {item['to_item']} : {item['reason']}")
+
+    lines += ["", "## 4. 이런 스타일 어떠세요?"]
+    for item in parsed.get("recommended_styles") or []:
+        lines.append(f"- {item['style']} : {item['reason']}")
+
+    lines += ["", "## 정리"]
+    for sentence in (parsed.get("summary") or {}).values():
+        lines.append(f"- {sentence}")
+
+    return "\n".join(lines) + "\n"
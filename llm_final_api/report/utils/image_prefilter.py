@@ -0,0 +1,151 @@
+"""
+최적 이미지 선택(select_best_image) 전에, API 호출 없이 로컬에서 후보를 걸러내는 사전 필터.
+
+후보마다 긴 변 PREFILTER_SIZE px 의 흑백 이미지로 줄여서 NumPy로 다음을 계산한다.
+- 선명도: 라플라시안 분산 (흔들린/초점이 나간 프레임은 값이 작음)
+- 노출: 히스토그램에서 거의 검정/흰색으로 날아간 픽셀 비율과 평균 밝기
+- dHash: 64비트 차분 해시 (해밍 거리가 작으면 같은 각도에서 찍은 거의 같은 프레임)
+
+흐림/노출 불량/중복 후보를 빼고, 남은 후보 중 품질 점수 상위 K장만 모델에 보낸다.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import config
+
+
+def load_gray(path: str, size: int = 256) -> np.ndarray:
+    """이미지를 긴 변 size px 흑백(float32, 0~255)으로 읽는다. JPEG은 축소 디코딩(draft) 사용."""
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            img.draft("L", (size, size))
+        img = ImageOps.exif_transpose(img).convert("L")
+        img.thumbnail((size, size), Image.BILINEAR)
+        return np.asarray(img, dtype=np.float32)
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """4-이웃 라플라시안의 분산. (컨볼루션 대신 슬라이스 연산으로 계산)"""
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0
+    lap = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+        - 4.0 * gray[1:-1, 1:-1]
+    )
+    return float(lap.var())
+
+
+def exposure(gray: np.ndarray) -> Dict[str, float]:
+    """
+    밝기 히스토그램으로 노출 상태를 계산한다.
+
+    Returns:
+        dict: {"mean": 평균 밝기, "clipped": 거의 검정(<=8) 또는 흰색(>=247) 픽셀 비율,
+               "score": 0~1 (클수록 노출이 적당)}
+    """
+    hist = np.bincount(gray.astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    total = hist.sum() or 1.0
+    clipped = float((hist[:9].sum() + hist[247:].sum()) / total)
+    mean = float(np.dot(hist, np.arange(256)) / total)
+    # 클리핑이 적고 평균이 중간 밝기(128)에 가까울수록 1
+    score = max(0.0, 1.0 - clipped) * (1.0 - 0.5 * abs(mean - 128.0) / 128.0)
+    return {"mean": mean, "clipped": clipped, "score": score}
+
+
+def dhash(gray: np.ndarray) -> int:
+    """9x8로 줄인 뒤 가로로 이웃한 픽셀의 밝기 차이 부호로 만든 64비트 해시."""
+    small = np.asarray(
+        Image.fromarray(gray.astype(np.uint8)).resize((9, 8), Image.BILINEAR),
+        dtype=np.int16,
+    )
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def analyze_image(path: str, size: Optional[int] = None) -> Dict[str, Any]:
+    """한 장의 선명도/노출/해시를 계산한다. 읽을 수 없으면 예외를 그대로 올린다."""
+    gray = load_gray(path, size or config.PREFILTER_SIZE)
+    return {
+        "path": path,
+        "sharpness": sharpness(gray),
+        "exposure": exposure(gray),
+        "dhash": dhash(gray),
+    }
+
+
+def prefilter_candidates(input_paths: List[str], top_k: Optional[int] = None) -> Dict[str, Any]:
+    """
+    후보 이미지를 로컬에서 점수화하고, 모델에 보낼 후보만 남긴다.
+
+    제외 기준 (config):
+    - 흐림: 선명도가 가장 선명한 후보의 PREFILTER_BLUR_RATIO 배 미만
+    - 노출 불량: 날아간 픽셀 비율이 PREFILTER_MAX_CLIPPED 초과
+    - 중복: 더 좋은 후보와 dHash 해밍 거리가 PREFILTER_DUP_DISTANCE 이하
+    - 상위 K 밖: 위를 통과한 후보 중 품질 점수(선명도 x 노출) 상위 top_k 장만 유지
+
+    모든 후보가 제외되면 품질 점수가 가장 높은 1장은 남긴다.
+
+    Returns:
+        dict:
+            - "kept": 모델에 보낼 후보 경로 (입력 순서 유지)
+            - "dropped": [{"path", "reason"}, ...]
+            - "scores": {경로: {"sharpness", "exposure", "quality"}}
+    """
+    top_k = config.PREFILTER_TOP_K if top_k is None else top_k
+
+    analyzed: List[Dict[str, Any]] = []
+    dropped: List[Dict[str, str]] = []
+    for path in input_paths:
+        try:
+            analyzed.append(analyze_image(path))
+        except Exception as e:
+            # 파일 없음/손상 등은 여기서 제외하지 않고 기존 단계(score_candidates)의 처리에 맡긴다.
+            print(f"  사전 필터: {path} 분석 실패 ({e})")
+            analyzed.append({"path": path, "error": str(e)})
+
+    valid = [item for item in analyzed if "error" not in item]
+    max_sharpness = max((item["sharpness"] for item in valid), default=0.0)
+    for item in valid:
+        relative = item["sharpness"] / max_sharpness if max_sharpness > 0 else 1.0
+        item["quality"] = relative * item["exposure"]["score"]
+
+    # 품질이 좋은 후보부터 보면서 제외 여부를 결정 (중복이면 더 좋은 쪽이 남음)
+    survivors: List[Dict[str, Any]] = []
+    for item in sorted(valid, key=lambda x: x["quality"], reverse=True):
+        if max_sharpness > 0 and item["sharpness"] < config.PREFILTER_BLUR_RATIO * max_sharpness:
+            reason = "흐림"
+        elif item["exposure"]["clipped"] > config.PREFILTER_MAX_CLIPPED:
+            reason = "노출 불량"
+        elif any(hamming(item["dhash"], kept["dhash"]) <= config.PREFILTER_DUP_DISTANCE for kept in survivors):
+            reason = "중복"
+        elif top_k and len(survivors) >= top_k:
+            reason = f"상위 {top_k}장 밖"
+        else:
+            survivors.append(item)
+            continue
+        dropped.append({"path": item["path"], "reason": reason})
+
+    if not survivors and valid:
+        best = max(valid, key=lambda x: x["quality"])
+        survivors.append(best)
+        dropped = [d for d in dropped if d["path"] != best["path"]]
+
+    kept_paths = {item["path"] for item in survivors} | {item["path"] for item in analyzed if "error" in item}
+    return {
+        "kept": [path for path in input_paths if path in kept_paths],
+        "dropped": dropped,
+        "scores": {
+            item["path"]: {
+                "sharpness": item["sharpness"],
+                "exposure": item["exposure"],
+                "quality": item["quality"],
+            }
+            for item in valid
+        },
+    }
@@ -1,90 +1,188 @@
 import os
-from google import genai
-from google.genai import types
-from PIL import Image
-import shutil
-from typing import List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from common.genai_client import generate_content, get_client
+from common.image_handles import image_part
+from common.image_preprocess import prepare_image
+from common.response_cache import cached_call
+from common.output_writer import promote
+from common.workspace import Workspace, resolve_workspace
 
 # config 파일의 API_KEY와 모델명을 사용.
 # 실제 main 함수에서 config를 import 할 것이므로, 여기서는 함수 인자로 받도록 함.
 
-def select_best_image(api_key: str, model_name: str, input_paths: List[str], selected_output_path: str) -> str:
-    """
-    주어진 3장의 이미지 경로 중, 가구가 가장 많고 분석에 적합한 1장의 이미지를 선택하고,
-    그 이미지를 selected_output_path에 복사하여 저장한 후 경로를 반환합니다.
+# 후보 이미지를 동시에 분석할 때 기본 최대 동시 요청 수.
+DEFAULT_MAX_CONCURRENCY = 4
 
-    Args:
-        api_key (str): Google GenAI API Key.
-        model_name (str): 사용할 AI 모델 ('gemini-2.0-flash').
-        input_paths (List[str]): 3장의 입력 이미지 경로 리스트.
-        selected_output_path (str): 선택된 이미지를 복사하여 저장할 경로.
-        
-    Returns:
-        str: 최종 선택된 이미지의 경로 (selected_output_path).
-    """
-    print("------ 3장 중 최적 이미지 선택 시작 ------")
-    # Gemini API 클라이언트 초기화.
-    client = genai.Client(api_key=api_key)
-    best_image_path = None
-    # 가구 개수 추적용 변수. 초기값을 -1로 설정하여 어떤 이미지도 선택되지 않은 초기 상태를 나타냄.
-    max_furniture_count = -1
-    
-    # ------ AI 프롬프트: 각 이미지의 가구 개수를 정확히 세도록 지시. ------
-    selection_prompt = """
+# 가구 개수 세기에는 고해상도가 필요 없으므로, 기본적으로 긴 변 768px로 줄여서 업로드.
+DEFAULT_UPLOAD_MAX_EDGE = 768
+
+# 디렉토리에서 후보 이미지를 모을 때 인정하는 확장자.
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# ------ AI 프롬프트: 각 이미지의 가구 개수를 정확히 세도록 지시. ------
+SELECTION_PROMPT = """
     주어진 이미지에 보이는 '가구(furniture)'와 '주요 데코 요소'의 개수를 정확히 세어서
     '숫자'만 출력해 주세요. 가구와 데코 요소의 경계가 모호할 경우, 방의 분석에 중요하다고
     판단되는 항목(침대, 소파, 테이블, 의자, 선반, TV, 주요 조명 등)만 포함하세요.
     예시: 5
     """
 
+
+def collect_candidate_paths(image_dir: str) -> List[str]:
+    """
+    디렉토리 안의 이미지 파일(캡처 프레임)을 이름 순으로 모아 후보 리스트로 반환합니다.
+    """
+    if not os.path.isdir(image_dir):
+        print(f" 경고: 후보 이미지 디렉토리가 없습니다 - {image_dir}")
+        return []
+
+    return [
+        os.path.join(image_dir, name)
+        for name in sorted(os.listdir(image_dir))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def _count_furniture(client, model_name: str, path: str, upload_max_edge: Optional[int]) -> int:
+    """한 장의 이미지에 대해 가구 개수를 요청하고 정수로 반환. 실패 시 예외를 그대로 올린다."""
+    # 이미지 바이트 로드. (축소/재인코딩 + 실제 MIME 타입)
+    img_bytes, mime_type = prepare_image(path, max_edge=upload_max_edge)
+
+    def _call() -> bytes:
+        # Gemini-2.5-flash 모델 호출: 이미지와 프롬프트를 함께 전달하여 가구 개수 분석 요청.
+        response = generate_content(
+            client,
+            model_name,
+            [
+                image_part(client, img_bytes, mime_type, stage="select"),
+                SELECTION_PROMPT
+            ],
+            stage="select",
+        )
+        text = (response.text or "").strip()
+        # 숫자가 없는 응답은 캐시에 남기지 않도록 여기서 실패 처리
+        if not re.search(r"\d+", text):
+            raise ValueError(f"응답에서 숫자를 찾을 수 없습니다: {text!r}")
+        return text.encode("utf-8")
+
+    # 같은 프레임을 이미 분석한 적이 있으면 캐시된 응답 사용
+    count_text = cached_call(model_name, img_bytes, SELECTION_PROMPT, None, _call).decode("utf-8")
+
+    # 응답 텍스트에서 첫 번째 숫자만 추출.
+    # LLM이 숫자 외의 문자를 포함하더라도 안정적으로 숫자를 추출하기 위함.
+    return int(re.search(r"\d+", count_text).group())
+
+
+def score_candidates(
+    api_key: str,
+    model_name: str,
+    input_paths: List[str],
+    max_concurrency: Optional[int] = None,
+    upload_max_edge: Optional[int] = DEFAULT_UPLOAD_MAX_EDGE,
+) -> Dict[str, Any]:
+    """
+    N장의 후보 이미지에 대해 가구 개수 분석 요청을 동시에 보내고, 전체 점수를 순위대로 반환합니다.
+
+    Args:
+        api_key (str): Google GenAI API Key.
+        model_name (str): 사용할 AI 모델 (config.REPORT_MODEL).
+        input_paths (List[str]): 후보 이미지 경로 리스트 (개수 제한 없음).
+        max_concurrency (Optional[int]): 최대 동시 요청 수. None이면 DEFAULT_MAX_CONCURRENCY.
+        upload_max_edge (Optional[int]): 업로드 전 긴 변 최대 픽셀. None이면 원본 해상도.
+
+    Returns:
+        dict:
+            - "best": 가구 수가 가장 많은 이미지 경로 (없으면 None, 동점이면 입력 순서가 빠른 쪽)
+            - "ranked": [{"path", "furniture_count"}, ...] 가구 수 내림차순
+            - "failed": [{"path", "error"}, ...] 파일 없음/분석 실패 후보 (0개로 간주하지 않음)
+    """
+    client = get_client(api_key)
+    limit = max(1, max_concurrency or DEFAULT_MAX_CONCURRENCY)
+
+    failed: List[Dict[str, str]] = []
+    existing: List[str] = []
     for path in input_paths:
-        if not os.path.exists(path):
+        if os.path.exists(path):
+            existing.append(path)
+        else:
             print(f" 경고: 파일 없음 - {path}. 이 경로는 건너뜁니다.")
-            continue
-            
-        print(f"  -> 이미지 분석 중: {path}")
-        
-        # 이미지 파일을 바이너리(바이트) 형태로 읽어 Gemini API의 입력 파트(Part)로 전달 준비.
-        try:
-            # 이미지 바이트 로드.
-            with open(path, "rb") as f:
-                img_bytes = f.read()
-
-            # Gemini-2.5-flash 모델 호출: 이미지와 프롬프트를 함께 전달하여 가구 개수 분석 요청.
-            response = client.models.generate_content(
-                model=model_name,
-                contents=[
-                    types.Part.from_bytes(data=img_bytes, mime_type="image/jpeg"),
-                    selection_prompt
-                ]
-            )
-            
-            # 응답 텍스트에서 숫자만 추출하는 파싱 로직.
-            count_text = response.text.strip()
-            
-            # 문자열에서 숫자(digit)만 필터링하여 합친 후, 정수형으로 변환.
-            # LLM이 숫자 외의 문자를 포함하더라도 안정적으로 숫자를 추출하기 위함.
-            furniture_count = int("".join(filter(str.isdigit, count_text)))
-            
-            print(f"   분석 결과: 가구 {furniture_count}개")
-            
-            # 최대 가구 수 업데이트: 가구 수가 더 많은 이미지를 '최적 이미지'로 선택.
-            if furniture_count > max_furniture_count:
-                max_furniture_count = furniture_count
-                best_image_path = path
-
-        except Exception as e:
-            print(f"  AI 분석 오류: {e}. 이 경로는 0개로 간주합니다.")
-            
+            failed.append({"path": path, "error": "파일 없음"})
+
+    scored: List[Dict[str, Any]] = []
+    if existing:
+        with ThreadPoolExecutor(max_workers=min(limit, len(existing))) as executor:
+            futures = [(path, executor.submit(_count_furniture, client, model_name, path, upload_max_edge)) for path in existing]
+
+            # 입력 순서대로 결과를 모아, 동점일 때 먼저 입력된 이미지가 앞서도록 한다.
+            for path, future in futures:
+                try:
+                    count = future.result()
+                    print(f"  -> {path}: 가구 {count}개")
+                    scored.append({"path": path, "furniture_count": count})
+                except Exception as e:
+                    print(f"  AI 분석 오류 ({path}): {e}")
+                    failed.append({"path": path, "error": str(e)})
+
+    ranked = sorted(scored, key=lambda item: item["furniture_count"], reverse=True)
+    return {
+        "best": ranked[0]["path"] if ranked else None,
+        "ranked": ranked,
+        "failed": failed,
+    }
+
+
+def select_best_image(
+    api_key: str,
+    model_name: str,
+    input_paths: List[str],
+    selected_output_path: str,
+    max_concurrency: Optional[int] = None,
+    upload_max_edge: Optional[int] = DEFAULT_UPLOAD_MAX_EDGE,
+    workspace: Optional[Workspace] = None,
+) -> str:
+    """
+    주어진 후보 이미지 경로 중, 가구가 가장 많고 분석에 적합한 1장의 이미지를 선택하고,
+    그 이미지를 selected_output_path에 복사하여 저장한 후 경로를 반환합니다.
+
+    Args:
+        api_key (str): Google GenAI API Key.
+        model_name (str): 사용할 AI 모델 ('gemini-2.0-flash').
+        input_paths (List[str]): 후보 이미지 경로 리스트 (3장 고정이 아닌 N장).
+        selected_output_path (str): 선택된 이미지를 복사하여 저장할 경로. (workspace 기준 상대 경로)
+        max_concurrency (Optional[int]): 최대 동시 분석 요청 수.
+        upload_max_edge (Optional[int]): 업로드 전 긴 변 최대 픽셀.
+        workspace (Optional[Workspace]): 세션 워크스페이스. None이면 현재 디렉토리.
+
+    Returns:
+        str: 최종 선택된 이미지의 경로 (워크스페이스 안의 selected_output_path).
+    """
+    print(f"------ {len(input_paths)}장 중 최적 이미지 선택 시작 ------")
+    result = score_candidates(
+        api_key,
+        model_name,
+        input_paths,
+        max_concurrency=max_concurrency,
+        upload_max_edge=upload_max_edge,
+    )
+
+    for rank, item in enumerate(result["ranked"], start=1):
+        print(f"   {rank}위: {item['path']} (가구 {item['furniture_count']}개)")
+    for item in result["failed"]:
+        print(f"   실패: {item['path']} ({item['error']})")
+
+    best_image_path = result["best"]
+
     # ------ 최종 선택 및 파일 복사 ------
     if best_image_path:
-        # shutil.copyfile을 사용하여 선택된 이미지를 지정된 경로로 복사.
-        shutil.copyfile(best_image_path, selected_output_path)
+        # 선택된 이미지를 세션 워크스페이스 안으로 연결. (하드링크, 불가능하면 복사)
+        selected_path = promote(resolve_workspace(workspace), best_image_path, selected_output_path)
         print(f"\n 최종 선택된 이미지: {best_image_path}")
-        print(f"    -> {selected_output_path}에 복사 완료.")
-        return selected_output_path
+        print(f"    -> {selected_path}에 저장 완료.")
+        return selected_path
     else:
         print("\n 오류: 분석할 수 있는 유효한 이미지 경로가 없습니다.")
         return ""
 
-
@@ -1,200 +1,333 @@
 import re
-from typing import Dict, Any, List, Union
-
-def parse_report_output(result_text: str) -> Dict[str, Union[str, Dict, List]]:
-    llm_output = result_text
-    parsed_data: Dict[str, Any] = {}
-
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+# ------ 섹션 토크나이저 ------
+# 리포트 전체를 한 번만 훑어서 제목(#, ##) 줄 기준으로 섹션을 나누고,
+# 각 섹션 본문 안에서만 미리 컴파일된 패턴으로 항목을 뽑는다.
+
+# 제목 줄: "# ..." 또는 "## ..." (제목 앞뒤 공백은 파이썬에서 strip)
+_HEADING_RE = re.compile(r"^[ \t]*#{1,6}(?P<title>[^\n]*)", re.MULTILINE)
+
+# 제목 -> 섹션 ID 판별 (전체 분위기 / 정리 / 번호 섹션)
+_SECTION_ID_RE = re.compile(
+    r"(?P<overall>전체적인 분위기는)|(?P<summary>정리)|(?P<selected>선택한 이미지)|(?P<number>\d+(?:-\d+)?)\."
+)
+_OVERALL_RE = re.compile(r"^전체적인 분위기는\s*\*\*(.*?)\s*스타일\*\*")
+_SELECTED_RE = re.compile(r"^선택한 이미지\s*[:：]?\s*\D*?(\d+)")
+
+# 섹션 ID
+SECTION_OVERALL = "overall"    # # 전체적인 분위기는 **... 스타일**입니다.
+SECTION_MOOD = "1"             # ## 1. 분위기 정의 및 유형별 확률
+SECTION_BASIS = "2"            # ## 2. 분위기 판단 근거
+SECTION_ADD = "3-1"            # ## 3-1. 현재 분위기에 맞춰 추가하면 좋을 가구 추천
+SECTION_REMOVE = "3-2"         # ## 3-2. 제거하면 좋을 가구 추천
+SECTION_CHANGE = "3-3"         # ## 3-3. 분위기별 바꿨으면 하는 가구 추천
+SECTION_STYLES = "4"           # ## 4. 이런 스타일 어떠세요?
+SECTION_SUMMARY = "정리"        # ## 정리
+SECTION_SELECTED = "selected"  # # 선택한 이미지: {번호}  (선택+리포트 통합 모드에서만 출력)
+
+# 섹션 본문 패턴
+_MOOD_WORD_RE = re.compile(r"([가-힣\s]+?)(?:하고|한|\s*$)")
+PATTERN_MOOD_DETAIL = re.compile(r"-\s*(.*?)\s*\((\d+)%\):\s*(.*)")   # {분위기}({확률}%): {설명}
+PATTERN_KEY_VALUE = re.compile(r"-\s*(.*?):\s*(.*)")                  # {항목} : {근거}
+PATTERN_CHANGE = re.compile(r"-\s*(.*?)\s*->\s*(.*?)\s*:\s*(.*)")      # {변경 가구} -> {추천 가구} : {근거}
+PATTERN_STYLE_BULLET = re.compile(r"^\s*-\s*(?P<style>[^:]+?)\s*:\s*(?P<reason>.+)$", re.MULTILINE)
+PATTERN_SUMMARY_LINE = re.compile(r"-\s*(.*)")
+
+BASIS_KEY_MAPPING = {
+    "가구 배치 및 공간 분석": "furniture_layout",
+    "색감 및 질감": "color_texture",
+    "소재": "material",
+}
+
+# parsed_report.json의 키 순서 (기존 출력과 동일하게 유지)
+OUTPUT_KEY_ORDER = [
+    "general_style",
+    "mood_words",
+    "mood_details",
+    "basis",
+    "recommendations_add",
+    "recommendations_remove",
+    "recommendations_change",
+    "recommended_styles",
+    "summary",
+]
+
+
+def classify_heading(title: str) -> Optional[str]:
+    """제목 텍스트로 섹션 ID를 판별한다. 템플릿에 없는 제목이면 None."""
+    m = _SECTION_ID_RE.match(title)
+    if m is None:
+        return None
+    if m.group("overall"):
+        return SECTION_OVERALL
+    if m.group("summary"):
+        return SECTION_SUMMARY
+    if m.group("selected"):
+        return SECTION_SELECTED
+    return m.group("number")
+
+
+def find_report_sections(result_text: str) -> List[Tuple[str, str, int, int, int]]:
+    """
+    리포트를 한 번 훑어서 섹션마다 (섹션 ID, 제목, 제목 줄 시작, 본문 시작, 본문 끝) 위치를 반환한다.
+    본문은 제목 줄 다음부터 다음 템플릿 제목 줄 직전까지. (템플릿에 없는 제목은 본문의 일부로 취급)
+    같은 섹션이 여러 번 나오면 첫 번째만 사용.
+    """
+    headings = []
+    for m in _HEADING_RE.finditer(result_text):
+        title = m.group("title").strip()
+        section_id = classify_heading(title)
+        if section_id is not None:
+            headings.append((section_id, title, m))
+
+    sections: List[Tuple[str, str, int, int, int]] = []
+    seen = set()
+    for idx, (section_id, title, m) in enumerate(headings):
+        if section_id in seen:
+            continue
+        seen.add(section_id)
+
+        body_end = headings[idx + 1][2].start() if idx + 1 < len(headings) else len(result_text)
+        sections.append((section_id, title, m.start(), m.end(), body_end))
+
+    return sections
+
+
+def split_report_sections(result_text: str) -> List[Tuple[str, str, str]]:
+    """리포트를 (섹션 ID, 제목, 본문) 리스트로 나눈다. 나누는 기준은 find_report_sections 와 같다."""
+    return [
+        (section_id, title, result_text[body_start:body_end])
+        for section_id, title, _, body_start, body_end in find_report_sections(result_text)
+    ]
+
+
+# ------ 섹션별 파서 (섹션 본문만 보고 결과 조각 dict를 반환) ------
+
+def _parse_overall(title: str, body: str) -> Dict[str, Any]:
     # ------ 전체적인 분위기 한 줄 ------
-    match_style = re.search(
-        r"#\s*전체적인 분위기는\s*\*\*(.*?)\s*스타일\*\*",
-        llm_output,
-        re.DOTALL, 
-    )
+    m = _OVERALL_RE.match(title)
+    if not m:
+        return {}
 
-    # 일치하는 경우에만 처리
-    if match_style: 
-        general = match_style.group(1).strip()
-        parsed_data["general_style"] = general
+    general = m.group(1).strip()
+    # {분위기1}, {분위기2} ,{분위기3} 추출
+    moods = _MOOD_WORD_RE.findall(general)
+    return {
+        "general_style": general,
+        "mood_words": [w.strip() for w in moods if w.strip()],  # 추출된 단어 리스트는 'mood_words' 저장
+    }
 
-        # {분위기1}, {분위기2} ,{분위기3} 추출 
-        moods = re.findall(r"([가-힣\s]+?)(?:하고|한|\s*$)", general)
-        parsed_data["mood_words"] = [m.strip() for m in moods if m.strip()] # 추출된 단어 리스트는 'mood_words' 저장
 
+def _parse_mood(title: str, body: str) -> Dict[str, Any]:
     # ------ ## 1. 분위기 정의 및 유형별 확률 ------
-    mood_section_match = re.search(
-        r"##\s*1\. 분위기 정의 및 유형별 확률(.*?)(?=##\s*2\. 분위기 판단 근거)",
-        llm_output,
-        re.DOTALL,
-    )
-
-    if mood_section_match:
-        mood_section = mood_section_match.group(1)
-
-        # {분위기}({확률}%): {설명} 패턴을 정의
-        PATTERN_MOOD_DETAIL = r"-\s*(.*?)\s*\((\d+)%\):\s*(.*)"
-
-        # PATTERN_MOOD_DETAIL에 매칭되는 항목을 찾아 리스트로 변환
-        mood_matches = re.findall(PATTERN_MOOD_DETAIL, mood_section)
-
-        parsed_data["mood_details"] = []
-
-        # 찾은 모든 항목(튜플)을 순회하며, 구조화
-        for mood, pct, desc in mood_matches:
-            parsed_data["mood_details"].append(
-                {
-                    "word": mood.strip(),
-                    "percentage": int(pct),
-                    "description": desc.strip(),
-                }
-            )
-
-    
+    return {
+        "mood_details": [
+            {
+                "word": mood.strip(),
+                "percentage": int(pct),
+                "description": desc.strip(),
+            }
+            for mood, pct, desc in PATTERN_MOOD_DETAIL.findall(body)
+        ]
+    }
+
+
+def _parse_basis(title: str, body: str) -> Dict[str, Any]:
     # ------ ## 2. 분위기 판단 근거 -------
-        basis_section_match = re.search(
-        r"##\s*2\. 분위기 판단 근거(.*?)(?=##\s*3-1\. 현재 분위기에 맞춰 추가하면 좋을 가구 추천)",
-        llm_output,
-        re.DOTALL,
-    )
-    if basis_section_match:
-        basis_section = basis_section_match.group(1)
-
-        PATTERN_BASIS = r"-\s*(.*?):\s*(.*)"
-        basis_matches = re.findall(PATTERN_BASIS, basis_section)
-
-        parsed_data["basis"] = {}
-        key_mapping = {
-            "가구 배치 및 공간 분석": "furniture_layout",
-            "색감 및 질감": "color_texture",
-            "소재": "material",
-        }
-
-        # 찾은 모든 (key, value) 쌍
-        for key, value in basis_matches:
-            k = key.strip()
-            v = value.strip()
-            if k in key_mapping:
-                parsed_data["basis"][key_mapping[k]] = v
-            else:
-                # 매핑에 없는 키는 원문 그대로도 보존
-                parsed_data["basis"][k] = v
+    basis: Dict[str, str] = {}
+    for key, value in PATTERN_KEY_VALUE.findall(body):
+        k = key.strip()
+        # 매핑에 없는 키는 원문 그대로도 보존
+        basis[BASIS_KEY_MAPPING.get(k, k)] = value.strip()
+    return {"basis": basis}
 
+
+def _parse_add(title: str, body: str) -> Dict[str, Any]:
     # ------ ## 3-1. 현재 분위기에 맞춰 추가하면 좋을 가구 추천 ------
-    add_section_match = re.search(
-        r"##\s*3-1\. 현재 분위기에 맞춰 추가하면 좋을 가구 추천(.*?)(?=##\s*3-2\. 제거하면 좋을 가구 추천)",
-        llm_output,
-        re.DOTALL,
-    )
-    if add_section_match:
-        add_section = add_section_match.group(1)
-
-        # {추가 가구} : {근거}
-        PATTERN_ADD = r"-\s*(.*?):\s*(.*)"
-        add_matches = re.findall(PATTERN_ADD, add_section)
-
-        parsed_data["recommendations_add"] = []
-
-        # 찾은 항목(튜플)을 구조화
-        for item, reason in add_matches:
-            parsed_data["recommendations_add"].append(
-                {
-                    "item": item.strip(),
-                    "reason": reason.strip(),
-                }
-            )
+    return {
+        "recommendations_add": [
+            {"item": item.strip(), "reason": reason.strip()}
+            for item, reason in PATTERN_KEY_VALUE.findall(body)
+        ]
+    }
+
 
+def _parse_remove(title: str, body: str) -> Dict[str, Any]:
     # ------ ## 3-2. 제거하면 좋을 가구 추천 ------
-    rem_section_match = re.search(
-        r"##\s*3-2\. 제거하면 좋을 가구 추천(.*?)(?=##\s*3-3\. 분위기별 바꿨으면 하는 가구 추천)",
-        llm_output,
-        re.DOTALL,
-    )
-    if rem_section_match:
-        rem_section = rem_section_match.group(1)
-
-        # {제거 가구} : {근거}
-        PATTERN_REM = r"-\s*(.*?):\s*(.*)"
-        rem_matches = re.findall(PATTERN_REM, rem_section)
-
-        # 템플릿 상 한 줄만 나오지만, 혹시 모를 확장을 고려해 리스트로 저장
-        parsed_data["recommendations_remove"] = []
-        for item, reason in rem_matches:
-            parsed_data["recommendations_remove"].append(
-                {
-                    "item": item.strip(),
-                    "reason": reason.strip(),
-                }
-            )
+    # 템플릿 상 한 줄만 나오지만, 혹시 모를 확장을 고려해 리스트로 저장
+    return {
+        "recommendations_remove": [
+            {"item": item.strip(), "reason": reason.strip()}
+            for item, reason in PATTERN_KEY_VALUE.findall(body)
+        ]
+    }
 
+
+def _parse_change(title: str, body: str) -> Dict[str, Any]:
     # ------ ## 3-3. 분위기별 바꿨으면 하는 가구 추천 ------
-    change_section_match = re.search(
-        r"##\s*3-3\. 분위기별 바꿨으면 하는 가구 추천(.*?)(?=#\s*6\. 이런 스타일 어떠세요\?|##\s*정리|$)",
-        llm_output,
-        re.DOTALL,
-    )
-    if change_section_match:
-        change_section = change_section_match.group(1)
-
-        # {변경 가구} -> {추천 가구} : {근거}
-        PATTERN_CHANGE = r"-\s*(.*?)\s*->\s*(.*?)\s*:\s*(.*)"
-        change_matches = re.findall(PATTERN_CHANGE, change_section)
-
-        parsed_data["recommendations_change"] = []
-        for src, dst, reason in change_matches:
-            parsed_data["recommendations_change"].append(
-                {
-                    "from_item": src.strip(),
-                    "to_item": dst.strip(),
-                    "reason": reason.strip(),
-                }
-            )
+    return {
+        "recommendations_change": [
+            {"from_item": src.strip(), "to_item": dst.strip(), "reason": reason.strip()}
+            for src, dst, reason in PATTERN_CHANGE.findall(body)
+        ]
+    }
+
 
+def _parse_styles(title: str, body: str) -> Dict[str, Any]:
     # ------ ## 4. 이런 스타일 어떠세요? ------
-    section_pattern = re.compile(
-        r"^##\s*4\.\s*이런 스타일 어떠세요\?\s*$"
-        r"(?P<body>.*?)(?=^##\s*정리|\Z)", 
-        re.MULTILINE | re.DOTALL,
-    )
-
-    m = section_pattern.search(llm_output)
-    
-    parsed_data["recommended_styles"] = [] # 결과 리스트 초기화
-    
-    if m:
-        body = m.group("body").strip()
-        
-        if body:
-            # "{- 스타일} : {이유}" 형식 한 줄씩 파싱
-            bullet_pattern = re.compile(
-                r"^\s*-\s*(?P<style>[^:]+?)\s*:\s*(?P<reason>.+)$",
-                re.MULTILINE,
-            )
-
-            # 본문(body) 내에서 모든 일치 항목을 반복해서 찾음
-            for b in bullet_pattern.finditer(body):
-                style = b.group("style").strip()
-                reason = b.group("reason").strip()
-                parsed_data["recommended_styles"].append(
-                    {
-                        "style": style,
-                        "reason": reason,
-                    }
-                )
+    # "{- 스타일} : {이유}" 형식 한 줄씩 파싱
+    return {
+        "recommended_styles": [
+            {"style": b.group("style").strip(), "reason": b.group("reason").strip()}
+            for b in PATTERN_STYLE_BULLET.finditer(body.strip())
+        ]
+    }
 
+
+def _parse_summary(title: str, body: str) -> Dict[str, Any]:
     # ------ 정리 ------
-    sum_section_match = re.search(r"##\s*정리(.*)", llm_output, re.DOTALL)
-    if sum_section_match:
-        sum_section = sum_section_match.group(1)
+    # " {- 문장}" 형태의 모든 줄을 뽑아온다.
+    lines = PATTERN_SUMMARY_LINE.findall(body)
+    return {"summary": {f"summary{idx + 1}": sentence.strip() for idx, sentence in enumerate(lines)}}
+
+
+def _parse_selected(title: str, body: str) -> Dict[str, Any]:
+    # ------ # 선택한 이미지: {번호} ------
+    # 프롬프트의 번호는 1부터 시작, 저장은 후보 리스트의 0부터 시작하는 인덱스로.
+    m = _SELECTED_RE.match(title)
+    if not m:
+        return {}
+    return {"selected_image_index": int(m.group(1)) - 1}
+
+
+SECTION_PARSERS = {
+    SECTION_OVERALL: _parse_overall,
+    SECTION_MOOD: _parse_mood,
+    SECTION_BASIS: _parse_basis,
+    SECTION_ADD: _parse_add,
+    SECTION_REMOVE: _parse_remove,
+    SECTION_CHANGE: _parse_change,
+    SECTION_STYLES: _parse_styles,
+    SECTION_SUMMARY: _parse_summary,
+    SECTION_SELECTED: _parse_selected,
+}
+
+
+def parse_section(section_id: str, title: str, body: str) -> Dict[str, Any]:
+    """섹션 하나를 파싱하여 parsed_report 조각(dict)을 반환한다. 모르는 섹션이면 빈 dict."""
+    parser = SECTION_PARSERS.get(section_id)
+    if parser is None:
+        return {}
+    return parser(title, body)
+
+
+def assemble_report(fragments: Dict[str, Any]) -> Dict[str, Union[str, Dict, List]]:
+    """섹션 조각들을 합친 dict를 기존 parsed_report.json과 같은 키 순서로 정리한다."""
+    parsed_data: Dict[str, Any] = {}
+    for key in OUTPUT_KEY_ORDER:
+        if key in fragments:
+            parsed_data[key] = fragments[key]
+        elif key == "recommended_styles":
+            # 추천 스타일은 섹션이 없어도 항상 빈 리스트로 존재
+            parsed_data[key] = []
+    # 순서 목록에 없는 키(확장 필드)는 뒤에 붙인다.
+    for key, value in fragments.items():
+        if key not in parsed_data:
+            parsed_data[key] = value
+    return parsed_data
 
-        # " {- 문장}" 형태의 모든 줄을 뽑아온다.
-        lines = re.findall(r"-\s*(.*)", sum_section)
 
-        parsed_data["summary"] = {}
-        for idx, sentence in enumerate(lines):
-            key = f"summary{idx + 1}"
-            parsed_data["summary"][key] = sentence.strip()
+def parse_report_output(result_text: str) -> Dict[str, Union[str, Dict, List]]:
+    fragments: Dict[str, Any] = {}
+    for section_id, title, body in split_report_sections(result_text):
+        fragments.update(parse_section(section_id, title, body))
 
     # 최종 결과 반환
-    return parsed_data
-
-
+    return assemble_report(fragments)
+
+
+class IncrementalReportParser:
+    """
+    스트리밍으로 도착하는 리포트 텍스트를 조금씩 받아, 섹션이 닫히는 순간(다음 템플릿 제목이 도착한 순간)
+    해당 섹션을 파싱한 이벤트를 돌려준다. 마지막 섹션은 close()에서 돌려준다.
+
+    섹션 경계와 섹션별 파서는 parse_report_output과 같은 것을 쓰므로,
+    close() 이후 result()는 전체 텍스트에 대한 parse_report_output 결과와 같다.
+
+    이벤트 형식: {"section": 섹션 ID, "title": 제목, "data": parsed_report 조각}
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_pos = 0      # 아직 제목 검사를 하지 않은 첫 줄의 시작 위치
+        self._open = None       # 현재 열려 있는 섹션 (섹션 ID, 제목, 본문 시작 위치)
+        self._seen = set()
+        self._fragments: Dict[str, Any] = {}
+        self._closed = False
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """텍스트 조각을 추가하고, 이번에 닫힌 섹션들의 이벤트를 반환한다."""
+        if self._closed:
+            raise RuntimeError("close() 이후에는 feed()를 호출할 수 없습니다.")
+        self._buffer += chunk
+
+        # 줄이 끝까지 도착한 부분까지만 제목을 검사한다. (제목 줄이 잘려서 오는 경우 대비)
+        complete_end = self._buffer.rfind("\n") + 1
+        if complete_end <= self._scan_pos:
+            return []
+        events = self._scan(complete_end)
+        self._scan_pos = complete_end
+        return events
+
+    def close(self) -> List[Dict[str, Any]]:
+        """스트림 종료. 남은 텍스트를 검사하고 마지막 섹션의 이벤트를 반환한다."""
+        if self._closed:
+            return []
+        events = self._scan(len(self._buffer))
+        self._scan_pos = len(self._buffer)
+        if self._open is not None:
+            events.extend(self._finish_open(len(self._buffer)))
+            self._open = None
+        self._closed = True
+        return events
+
+    def result(self) -> Dict[str, Union[str, Dict, List]]:
+        """지금까지 닫힌 섹션들로 만든 parsed_report dict."""
+        return assemble_report(self._fragments)
+
+    def _scan(self, end: int) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for m in _HEADING_RE.finditer(self._buffer, self._scan_pos, end):
+            title = m.group("title").strip()
+            section_id = classify_heading(title)
+            if section_id is None:
+                continue
+            if self._open is not None:
+                events.extend(self._finish_open(m.start()))
+                self._open = None
+            # 같은 섹션이 다시 나오면 (parse_report_output과 같이) 첫 번째만 사용
+            if section_id not in self._seen:
+                self._seen.add(section_id)
+                self._open = (section_id, title, m.end())
+        return events
+
+    def _finish_open(self, body_end: int) -> List[Dict[str, Any]]:
+        section_id, title, body_start = self._open
+        data = parse_section(section_id, title, self._buffer[body_start:body_end])
+        self._fragments.update(data)
+        return [{"section": section_id, "title": title, "data": data}]
+
+
+def is_report_complete(result_text: str) -> bool:
+    """
+    모델 응답이 템플릿의 마지막 섹션(## 정리)까지 도착했는지 확인하는 준비 상태 체크.
+    응답이 중간에 잘렸거나 비어 있으면 False.
+    """
+    if not result_text or not result_text.strip():
+        return False
+    return re.search(r"##\s*정리[^\n]*\n\s*-\s*\S", result_text) is not None
@@ -1,34 +1,82 @@
-from google import genai
 from google.genai import types
 
+import config
+from common.genai_client import generate_content, get_client
+from common.image_handles import image_part
+from common.image_preprocess import prepare_image, preprocess_image_bytes
+from common.response_cache import cached_call
 
-def run_style_model(api_key, model_name, image_path, prompt):
+STYLE_TEMPERATURE = 1.0
+
+
+def run_style_model(api_key, model_name, image_path, prompt, use_cache=None, stage="style"):
     """
     스타일 변경용 Gemini 이미지 모델을 호출하고,
     응답에서 첫 번째 이미지 파트를 찾아 바이트로 돌려준다.
     이미지가 없으면 RuntimeError를 던진다.
+
+    use_cache: None이면 config.CACHE_STYLE_CALLS를 따른다.
+               (temperature=1.0 호출은 다양한 결과를 원하므로 기본적으로 캐시하지 않음)
+    stage: metrics에 기록할 단계 이름 (new_look, edit_add, ...)
+    """
+    # 1. 입력 이미지 읽기 (실제 포맷에 맞는 MIME 타입 판별)
+    img_bytes, mime_type = prepare_image(
+        image_path,
+        max_edge=config.UPLOAD_MAX_EDGE_EDIT,
+        output_format=config.UPLOAD_FORMAT,
+        quality=config.UPLOAD_QUALITY,
+    )
+    return _call_style_model(api_key, model_name, img_bytes, mime_type, prompt, use_cache, stage)
+
+
+def run_style_model_bytes(api_key, model_name, image_bytes, prompt, use_cache=None, stage="style"):
+    """
+    run_style_model과 같지만 파일 경로 대신 이미지 바이트를 받는다.
+    이전 단계의 결과를 디스크에 쓰고 다시 읽지 않고 바로 다음 호출에 넘길 때 사용.
     """
-    client = genai.Client(api_key=api_key)
-
-    # 1. 입력 이미지 읽기
-    with open(image_path, "rb") as f:
-        img_bytes = f.read()
-
-    # 2. 모델 호출
-    response = client.models.generate_content(
-        model=model_name,
-        contents=[
-            types.Part.from_bytes(
-                data=img_bytes,
-                mime_type="image/jpeg",  # png라도 대부분 문제 없이 처리됨
+    img_bytes, mime_type = preprocess_image_bytes(
+        image_bytes,
+        max_edge=config.UPLOAD_MAX_EDGE_EDIT,
+        output_format=config.UPLOAD_FORMAT,
+        quality=config.UPLOAD_QUALITY,
+    )
+    return _call_style_model(api_key, model_name, img_bytes, mime_type, prompt, use_cache, stage)
+
+
+def _call_style_model(api_key, model_name, img_bytes, mime_type, prompt, use_cache, stage) -> bytes:
+    client = get_client(api_key)
+
+    if use_cache is None:
+        use_cache = config.CACHE_STYLE_CALLS
+
+    def _call() -> bytes:
+        # 2. 모델 호출
+        response = generate_content(
+            client,
+            model_name,
+            [
+                image_part(client, img_bytes, mime_type, stage=stage),
+                prompt,
+            ],
+            types.GenerateContentConfig(
+                temperature=STYLE_TEMPERATURE,
             ),
-            prompt,
-        ],
-        config=types.GenerateContentConfig(
-            temperature=1.0,
+            stage=stage,
         )
+        return _extract_image_bytes(response)
+
+    return cached_call(
+        model_name,
+        img_bytes,
+        prompt,
+        {"temperature": STYLE_TEMPERATURE},
+        _call,
+        use_cache=use_cache,
     )
 
+
+def _extract_image_bytes(response) -> bytes:
+    """응답에서 첫 번째 이미지 파트를 찾아 바이트로 돌려준다. 없으면 RuntimeError."""
     # 3. 응답에서 이미지 파트 찾기
     image_bytes = None
 
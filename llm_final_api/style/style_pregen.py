@@ -0,0 +1,272 @@
+"""
+리포트 직후 '고를 가능성이 높은 스타일'의 스타일 변경 이미지를 미리 생성해 두는 선행 생성 단계.
+
+사용자는 대부분 드롭박스에서 "AI 추천"(recommended_styles[0] 또는 general_style)이나
+자주 쓰는 몇 가지 스타일을 고른다. parsed_report.json 이 만들어지자마자 그 스타일들을
+백그라운드에서 생성해 두면, main_new_looks 는 선택이 맞을 때 기다림 없이 결과를 바로 쓸 수 있다.
+
+저장 위치: <워크스페이스>/pregen/
+    <키>.png      생성 결과 (키 = sha256(기준 이미지 해시 + 스타일 + 모델))
+    <키>.json     메타데이터 (스타일, 모델, 기준 이미지 해시, 소요 시간)
+    <키>.pending  생성 중 표시 (main_new_looks 는 이 파일이 있으면 잠시 기다린다)
+
+실행 (main_report 가 PREGEN_ENABLED 일 때 백그라운드 프로세스로 자동 실행):
+    python -m style.style_pregen --workspace sessions/user42
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import config
+from common.metrics import record as record_metric
+from common.workspace import Workspace
+from style.style_client import run_style_model_bytes
+from style.style_prompt import generate_style_prompt
+
+PREGEN_DIR = "pregen"
+PARSED_REPORT_PATH = "parsed_report.json"
+ORG_IMAGE_PATH = "img4new3r_org.png"
+TARGET_OBJECTS = "모든 가구와 데코 요소"  # main_new_looks 와 같은 대상 (프롬프트가 같아야 결과를 그대로 쓸 수 있음)
+FALLBACK_STYLE = "모던 (Modern Interior)"
+
+
+def predict_styles(parsed_report: dict, limit: Optional[int] = None) -> List[str]:
+    """
+    사용자가 고를 가능성이 높은 순서대로 스타일 목록을 만든다. (중복 제거, 최대 limit개)
+
+    1) "AI 추천" 으로 결정될 스타일 (decide_target_style 과 같은 규칙: recommended_styles[0] → general_style)
+    2) 나머지 recommended_styles
+    3) config.PREGEN_POPULAR_STYLES
+    """
+    limit = config.PREGEN_MAX_STYLES if limit is None else limit
+
+    recommended = [
+        (item.get("style") or "").strip()
+        for item in parsed_report.get("recommended_styles") or []
+    ]
+    general = (parsed_report.get("general_style") or "").strip()
+    ai_style = (recommended[0] if recommended else "") or general or FALLBACK_STYLE
+
+    styles = []
+    for style in [ai_style, *recommended, *config.PREGEN_POPULAR_STYLES]:
+        if style and style not in styles:
+            styles.append(style)
+    return styles[:limit]
+
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def pregen_key(base_hash: str, target_style: str, model_name: str) -> str:
+    h = hashlib.sha256()
+    for part in (base_hash, target_style, model_name):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+def read_base_image(workspace: Workspace) -> Optional[bytes]:
+    """main_new_looks.resolve_base_image 와 같은 기준 이미지(최종본 → 선택 이미지)를 읽는다."""
+    for name in (ORG_IMAGE_PATH, config.SELECTED_IMAGE_PATH):
+        if workspace.exists(name):
+            with open(workspace.path(name), "rb") as f:
+                return f.read()
+    return None
+
+
+class PregenStore:
+    """워크스페이스의 pregen/ 디렉토리에 선행 생성 결과를 저장/조회한다."""
+
+    def __init__(self, workspace: Workspace):
+        self.workspace = workspace
+        os.makedirs(workspace.path(PREGEN_DIR), exist_ok=True)
+
+    def _name(self, key: str, ext: str) -> str:
+        return os.path.join(PREGEN_DIR, f"{key}.{ext}")
+
+    def is_pending(self, key: str) -> bool:
+        """생성 중 표시가 있고, 오래되지 않았으면 True. (프로세스가 죽어 남은 표시는 무시)"""
+        path = self.workspace.path(self._name(key, "pending"))
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return False
+        return age < config.PREGEN_PENDING_TTL
+
+    def mark_pending(self, key: str, target_style: str) -> None:
+        self.workspace.write_text(self._name(key, "pending"), target_style, label="pregen_pending")
+
+    def clear_pending(self, key: str) -> None:
+        try:
+            os.remove(self.workspace.path(self._name(key, "pending")))
+        except OSError:
+            pass
+
+    def save(self, key: str, image_bytes: bytes, meta: Dict) -> None:
+        # 이미지를 먼저 쓰고 메타데이터를 나중에 쓴다. (메타데이터가 있으면 이미지는 항상 완성본)
+        self.workspace.write_bytes(self._name(key, "png"), image_bytes, label="pregen_image")
+        self.workspace.write_json(self._name(key, "json"), meta, label="pregen_meta")
+
+    def load(self, key: str) -> Optional[bytes]:
+        if not self.workspace.exists(self._name(key, "json")):
+            return None
+        try:
+            with open(self.workspace.path(self._name(key, "png")), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def take(self, key: str, wait_seconds: float = 0.0) -> Optional[bytes]:
+        """
+        결과가 있으면 꺼내서(파일 삭제) 반환한다.
+        생성 중이면 최대 wait_seconds 동안 기다리고, 그래도 없으면 None.
+        (temperature=1.0 결과라 같은 선택을 다시 하면 새로 생성하도록 한 번만 사용)
+        """
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            data = self.load(key)
+            if data is not None:
+                for ext in ("json", "png"):
+                    try:
+                        os.remove(self.workspace.path(self._name(key, ext)))
+                    except OSError:
+                        pass
+                return data
+            if not self.is_pending(key) or time.monotonic() >= deadline:
+                return None
+            time.sleep(0.2)
+
+
+def _render(store: PregenStore, api_key: str, model_name: str, base_bytes: bytes, base_hash: str, target_style: str) -> bool:
+    key = pregen_key(base_hash, target_style, model_name)
+    if store.load(key) is not None or store.is_pending(key):
+        return False
+
+    store.mark_pending(key, target_style)
+    start = time.perf_counter()
+    try:
+        image_bytes = run_style_model_bytes(
+            api_key=api_key,
+            model_name=model_name,
+            image_bytes=base_bytes,
+            prompt=generate_style_prompt(target_style=target_style, target_objects=TARGET_OBJECTS),
+            stage="pregen",
+        )
+        store.save(key, image_bytes, {
+            "target_style": target_style,
+            "model": model_name,
+            "base_hash": base_hash,
+            "seconds": time.perf_counter() - start,
+            "created_at": time.time(),
+        })
+        print(f"[pregen] '{target_style}' 선행 생성 완료 ({time.perf_counter() - start:.1f}s)")
+        return True
+    except Exception as e:
+        print(f"[pregen] '{target_style}' 선행 생성 실패: {e}")
+        return False
+    finally:
+        store.clear_pending(key)
+
+
+def pregenerate(parsed_report: dict, workspace: Workspace, styles: Optional[List[str]] = None) -> List[str]:
+    """
+    예상 스타일들을 동시에 생성해 저장한다. (최대 config.PREGEN_MAX_STYLES 개)
+
+    Returns:
+        list: 새로 생성한 스타일 목록
+    """
+    base_bytes = read_base_image(workspace)
+    if base_bytes is None:
+        print("[pregen] 기준 이미지가 없어 선행 생성을 건너뜁니다.")
+        return []
+
+    styles = predict_styles(parsed_report) if styles is None else styles[:config.PREGEN_MAX_STYLES]
+    if not styles:
+        return []
+
+    store = PregenStore(workspace)
+    base_hash = image_hash(base_bytes)
+    print(f"[pregen] 선행 생성 대상: {', '.join(styles)}")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(styles), config.PREGEN_MAX_CONCURRENCY))) as executor:
+        done = list(executor.map(
+            lambda style: _render(store, config.API_KEY, config.STYLE_MODEL, base_bytes, base_hash, style),
+            styles,
+        ))
+    return [style for style, ok in zip(styles, done) if ok]
+
+
+def start_pregeneration(parsed_report: dict, workspace: Workspace) -> threading.Thread:
+    """같은 프로세스 안(main_service 등)에서 백그라운드 스레드로 선행 생성을 시작한다."""
+    thread = threading.Thread(target=pregenerate, args=(parsed_report, workspace), daemon=True)
+    thread.start()
+    return thread
+
+
+def launch_pregeneration_process(workspace: Workspace) -> subprocess.Popen:
+    """
+    main_report 처럼 곧 끝나는 스크립트에서 호출: 선행 생성을 별도 프로세스로 띄우고 바로 반환한다.
+    로그는 <워크스페이스>/pregen/pregen.log 에 남는다.
+    """
+    os.makedirs(workspace.path(PREGEN_DIR), exist_ok=True)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(workspace.path(os.path.join(PREGEN_DIR, "pregen.log")), "ab") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "style.style_pregen", "--workspace", os.path.abspath(workspace.root)],
+            cwd=package_root,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,  # 부모 스크립트가 끝나도 계속 실행
+        )
+
+
+def take_pregenerated(workspace: Workspace, base_bytes: bytes, target_style: str, model_name: str) -> Optional[bytes]:
+    """
+    (기준 이미지, 스타일, 모델)이 같은 선행 생성 결과가 있으면 꺼내서 반환한다.
+    생성 중이면 config.PREGEN_WAIT_SECONDS 까지 기다린다. (새로 호출하는 것보다 대개 빠름)
+    """
+    if not workspace.exists(PREGEN_DIR):
+        return None
+    key = pregen_key(image_hash(base_bytes), target_style, model_name)
+    start = time.perf_counter()
+    data = PregenStore(workspace).take(key, wait_seconds=config.PREGEN_WAIT_SECONDS)
+    record_metric(
+        "pregen",
+        "new_look",
+        model=model_name,
+        latency=time.perf_counter() - start,
+        download_bytes=len(data) if data else 0,
+        outcome="hit" if data else "miss",
+        session=workspace.session_id,
+    )
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="예상 스타일의 스타일 변경 이미지를 미리 생성")
+    parser.add_argument("--workspace", default=".", help="parsed_report.json 이 있는 워크스페이스 디렉토리")
+    parser.add_argument("--style", dest="styles", action="append", default=None, help="생성할 스타일 (생략 시 리포트로 예측)")
+    args = parser.parse_args()
+
+    workspace = Workspace(args.workspace, session_id=os.path.basename(os.path.abspath(args.workspace)))
+    try:
+        parsed_report = workspace.read_json(PARSED_REPORT_PATH)
+    except Exception as e:
+        print(f"[pregen] parsed_report.json 로드 실패: {e}")
+        return
+
+    try:
+        pregenerate(parsed_report, workspace, styles=args.styles)
+    finally:
+        workspace.save_metrics()
+
+
+if __name__ == "__main__":
+    main()